@@ -0,0 +1,145 @@
+# coding: utf-8
+from django.conf import settings
+from django.db.models import Max
+from tastypie.exceptions import BadRequest
+from tastypie.paginator import Paginator
+
+from journalmanager import changesfeed
+
+
+CHANGES_FEED_MAX_WAIT = getattr(settings, 'API_CHANGES_FEED_MAX_WAIT', 30)
+# waiting holds the worker, so long-polling is only for servers that
+# wait cooperatively, e.g. gevent with monkeypatching.
+CHANGES_FEED_LONG_POLL = getattr(settings, 'API_CHANGES_FEED_LONG_POLL', False)
+CHANGES_FEED_RETRY_AFTER = getattr(settings, 'API_CHANGES_FEED_RETRY_AFTER', 10)
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset based pagination for append-only resources.
+
+    Instead of ``limit`` & ``offset``, clients send the ``since`` cursor
+    (inclusive) they got as ``meta.next_since`` in the previous response.
+    The batch size is chosen by the server and the total count is never
+    computed, so the cost of a page depends only on the number of
+    objects returned.
+
+    ``objects`` must be a QuerySet. It is ordered by ``pk`` and sliced
+    from the ``since`` cursor here.
+    """
+    def get_limit(self):
+        return self.limit
+
+    def get_since(self):
+        try:
+            since = int(self.request_data.get('since', 0))
+        except ValueError:
+            raise BadRequest("Invalid since '%s' provided. Please provide an integer." % self.request_data['since'])
+
+        if since < 0:
+            raise BadRequest("Invalid since '%s' provided. Please provide a positive integer >= 0." % since)
+
+        return since
+
+    def _generate_cursor_uri(self, since):
+        if self.resource_uri is None:
+            return None
+
+        request_params = self.request_data.copy()
+        for param in ['since', 'limit', 'offset']:
+            if param in request_params:
+                del request_params[param]
+        request_params['since'] = since
+
+        return '%s?%s' % (self.resource_uri, request_params.urlencode())
+
+    def get_batch(self, since, limit):
+        return list(self.objects.filter(pk__gte=since).order_by('pk')[:limit])
+
+    def get_next_since(self, since, objects):
+        return objects[-1].pk + 1 if objects else since
+
+    def page(self):
+        limit = self.get_limit()
+        since = self.get_since()
+        objects = self.get_batch(since, limit)
+
+        next_since = self.get_next_since(since, objects)
+        meta = {
+            'limit': limit,
+            'since': since,
+            'next_since': next_since,
+            'next': self._generate_cursor_uri(next_since),
+        }
+
+        return {
+            self.collection_name: objects,
+            'meta': meta,
+        }
+
+
+class ChangesFeedPaginator(CursorPaginator):
+    """
+    CursorPaginator for the changes feed.
+
+    When there are no events from the ``since`` cursor, the response
+    is returned right away with ``meta.retry_after``, the seconds
+    (``API_CHANGES_FEED_RETRY_AFTER``) the client should wait before
+    polling again, also sent as the ``Retry-After`` header.
+
+    If ``API_CHANGES_FEED_LONG_POLL`` is set, and ``wait`` (in seconds,
+    up to ``API_CHANGES_FEED_MAX_WAIT``) is given, the request is held
+    instead, until a DataChangeEvent newer than the ones known on arrival
+    is published, or the time is over, and then the batch is read again.
+
+    Empty batches move the cursor past the last event scanned, so events
+    filtered out (e.g. by ``collection``) or gaps left by rolled back
+    transactions are not waited for again.
+    """
+    _scanned_seq = 0
+
+    def get_wait(self):
+        try:
+            wait = int(self.request_data.get('wait', 0))
+        except ValueError:
+            raise BadRequest("Invalid wait '%s' provided. Please provide an integer." % self.request_data['wait'])
+
+        if wait < 0:
+            raise BadRequest("Invalid wait '%s' provided. Please provide a positive integer >= 0." % wait)
+
+        if not CHANGES_FEED_LONG_POLL:
+            return 0
+
+        return min(wait, CHANGES_FEED_MAX_WAIT)
+
+    def _read_batch(self, since, limit):
+        # read before the batch, so that no event up to it is missed.
+        self._scanned_seq = self.objects.model._default_manager.aggregate(
+            Max('pk'))['pk__max'] or 0
+
+        return super(ChangesFeedPaginator, self).get_batch(since, limit)
+
+    def get_batch(self, since, limit):
+        known_seq = changesfeed.latest_seq()
+        objects = self._read_batch(since, limit)
+        wait = self.get_wait()
+
+        if not objects and wait and changesfeed.wait_for(
+                max(since, known_seq + 1, 1), wait):
+            objects = self._read_batch(since, limit)
+
+        return objects
+
+    def get_next_since(self, since, objects):
+        if objects:
+            return super(ChangesFeedPaginator, self).get_next_since(since, objects)
+
+        return max(since, self._scanned_seq + 1)
+
+    def page(self):
+        page = super(ChangesFeedPaginator, self).page()
+
+        if not page[self.collection_name] and not self.get_wait():
+            page['meta']['retry_after'] = CHANGES_FEED_RETRY_AFTER
+
+        return page
@@ -1,6 +1,7 @@
 # coding: utf-8
 import logging
 
+from django.conf import settings
 from django.db.models import Q
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
@@ -34,8 +35,31 @@ from articletrack.models import (
     Comment
 )
 
+from .paginators import ChangesFeedPaginator
+
 logger = logging.getLogger(__name__)
 
+CHANGES_BATCH_SIZE = getattr(settings, 'API_CHANGES_BATCH_SIZE', 100)
+
+# Relations loaded alongside each page of journals. See
+# ``JournalResource.get_object_list``.
+JOURNAL_SELECT_RELATED = (
+    'creator',
+    'use_license',
+    'collection',
+    'previous_title',
+)
+JOURNAL_PREFETCH_RELATED = (
+    'missions__language',
+    'other_titles',
+    'languages',
+    'status_history',
+    'study_areas',
+    'sponsor',
+    'issue_set',
+    'section_set',
+)
+
 class ApiKeyAuthMeta:
     authentication = ApiKeyAuthentication()
     authorization = DjangoAuthorization()
@@ -52,7 +76,7 @@ class SectionResource(ModelResource):
         queryset = Section.objects.all()
         resource_name = 'sections'
         allowed_methods = ['get']
-        excludes = ['legacy_code']
+        excludes = ['legacy_code', 'display_title', 'sort_key']
         filtering = {
             "journal": ('exact'),
         }
@@ -195,6 +219,18 @@ class JournalResource(ModelResource):
             'print_issn': ('exact',),
         }
 
+    def get_object_list(self, request):
+        """
+        Eager-loads every relation touched while dehydrating a journal.
+
+        The related sets are fetched once for the whole page, so the
+        dehydrate_* hooks and the related URIs are fed from memory and
+        the cost of a page does not grow with the number of journals.
+        """
+        objects = super(JournalResource, self).get_object_list(request)
+        return objects.select_related(*JOURNAL_SELECT_RELATED).prefetch_related(
+            *JOURNAL_PREFETCH_RELATED)
+
     def build_filters(self, filters=None):
         """
         Custom filter that retrieves data by the collection's name_slug.
@@ -236,49 +272,18 @@ class JournalResource(ModelResource):
             for language in bundle.obj.languages.all()]
 
     def dehydrate_pub_status_history(self, bundle):
+        # sorted in python to take advantage of the prefetched events.
+        events = sorted(bundle.obj.status_history.all(),
+            key=lambda event: event.created_at, reverse=True)
         return [{'date': event.created_at,
                 'status': event.status}
-            for event in bundle.obj.status_history.order_by('-created_at').all()]
+            for event in events]
 
     def dehydrate_study_areas(self, bundle):
         return [area.study_area
             for area in bundle.obj.study_areas.all()]
 
 
-class DataChangeEventResource(ModelResource):
-    collection_uri = fields.ForeignKey(CollectionResource, 'collection')
-    seq = fields.IntegerField(attribute='pk', readonly=True)
-    object_uri = GenericForeignKeyField({
-        Journal: JournalResource,
-        Issue: IssueResource,
-    }, 'content_object')
-
-    class Meta(ApiKeyAuthMeta):
-        resource_name = 'changes'
-        queryset = DataChangeEvent.objects.all()
-        excludes = [
-            'object_id',
-            'id',
-        ]
-        allowed_methods = ['get', ]
-
-    def build_filters(self, filters=None):
-        """
-        Custom filter that retrieves data by the collection's name_slug.
-        """
-        if filters is None:
-            filters = {}
-
-        orm_filters = super(DataChangeEventResource, self).build_filters(filters)
-
-        if 'since' in filters:
-            events = DataChangeEvent.objects.filter(
-                pk__gte=int(filters['since']))
-            orm_filters['pk__in'] = events
-
-        return orm_filters
-
-
 class PressReleaseTranslationResource(ModelResource):
     language = fields.CharField(readonly=True)
 
@@ -389,12 +394,64 @@ class AheadPressReleaseResource(ModelResource):
         return orm_filters
 
 
+class DataChangeEventResource(ModelResource):
+    collection_uri = fields.ForeignKey(CollectionResource, 'collection')
+    seq = fields.IntegerField(attribute='pk', readonly=True)
+    object_uri = GenericForeignKeyField({
+        Journal: JournalResource,
+        Issue: IssueResource,
+        Section: SectionResource,
+        RegularPressRelease: PressReleaseResource,
+        AheadPressRelease: AheadPressReleaseResource,
+    }, 'content_object')
+
+    class Meta(ApiKeyAuthMeta):
+        resource_name = 'changes'
+        queryset = DataChangeEvent.objects.select_related('collection')
+        excludes = [
+            'object_id',
+            'id',
+        ]
+        allowed_methods = ['get', ]
+        # the ``since`` cursor and the polling hints are handled by the
+        # paginator, and the batch size is not negotiable.
+        paginator_class = ChangesFeedPaginator
+        limit = CHANGES_BATCH_SIZE
+        max_limit = CHANGES_BATCH_SIZE
+
+    def build_filters(self, filters=None):
+        """
+        Custom filter that retrieves data by the collection's name_slug.
+        """
+        if filters is None:
+            filters = {}
+
+        orm_filters = super(DataChangeEventResource, self).build_filters(filters)
+
+        if 'collection' in filters:
+            orm_filters['collection__name_slug'] = filters['collection']
+
+        return orm_filters
+
+    def create_response(self, request, data, *args, **kwargs):
+        response = super(DataChangeEventResource, self).create_response(
+            request, data, *args, **kwargs)
+
+        retry_after = isinstance(data, dict) and data.get('meta', {}).get('retry_after')
+        if retry_after:
+            response['Retry-After'] = str(retry_after)
+
+        return response
+
+
 class CheckinResource(ModelResource):
     article = fields.ForeignKey('api.resources.CheckinArticleResource', 'article')
 
     class Meta(ApiKeyAuthMeta):
         queryset = Checkin.objects.all()
         resource_name = 'checkins'
+        # maintained from the notices
+        excludes = ['error_count', 'warning_count', 'error_level']
         default_format = "application/json"
         allowed_methods = ['get', 'post', 'put']
 
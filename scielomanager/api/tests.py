@@ -31,6 +31,11 @@ from scielomanager.utils.modelmanagers.helpers import (
     )
 
 
+# Queries spent to list journals: authentication, counting, the page itself
+# and one query per eager-loaded relation.
+JOURNAL_INDEX_QUERIES = 15
+
+
 def _make_auth_environ(username, token):
     return {'HTTP_AUTHORIZATION': 'ApiKey {0}:{1}'.format(username, token)}
 
@@ -267,6 +272,141 @@ class JournalRestAPITest(WebTest):
         self.assertEqual(json.loads(response.content)['objects'][0]['eletronic_issn'], '1234-1234')
 
 
+class JournalRestAPIQueryCountTest(WebTest):
+
+    def setUp(self):
+        self.user = auth.UserF(is_active=True)
+        self.extra_environ = _make_auth_environ(self.user.username,
+            self.user.api_key.key)
+        _makeUseLicense()
+        self.collection = modelfactories.CollectionFactory.create()
+
+    def _make_journal(self):
+        from journalmanager import models
+
+        language = modelfactories.LanguageFactory.create()
+        journal = modelfactories.JournalFactory.create(
+            collection=self.collection)
+        journal.languages.add(language)
+        journal.study_areas.add(modelfactories.StudyAreaFactory.create())
+        journal.sponsor.add(modelfactories.SponsorFactory.create())
+        models.JournalMission.objects.create(journal=journal,
+            description=u'Mission', language=language)
+        models.JournalTitle.objects.create(journal=journal,
+            title=u'Other title', category=u'other')
+        modelfactories.IssueFactory.create(journal=journal)
+        modelfactories.SectionFactory.create(journal=journal)
+
+        return journal
+
+    def test_journal_index_query_count_does_not_depend_on_page_size(self):
+        for i in range(5):
+            self._make_journal()
+
+        with self.assertNumQueries(JOURNAL_INDEX_QUERIES):
+            response = self.app.get(
+                '/api/v1/journals/?collection=%s' % self.collection.name_slug,
+                extra_environ=self.extra_environ)
+
+        self.assertEqual(len(response.json['objects']), 5)
+
+    def test_journal_index_with_a_single_journal(self):
+        self._make_journal()
+
+        with self.assertNumQueries(JOURNAL_INDEX_QUERIES):
+            response = self.app.get(
+                '/api/v1/journals/?collection=%s' % self.collection.name_slug,
+                extra_environ=self.extra_environ)
+
+        self.assertEqual(len(response.json['objects']), 1)
+
+    def test_eager_loaded_data_is_dehydrated(self):
+        journal = self._make_journal()
+        response = self.app.get('/api/v1/journals/%s/' % journal.pk,
+            extra_environ=self.extra_environ)
+
+        self.assertEqual(response.json['missions'], [[u'pt', u'Mission']])
+        self.assertEqual(response.json['other_titles'], [[u'other', u'Other title']])
+        self.assertEqual(response.json['languages'], [u'pt'])
+        self.assertEqual(response.json['study_areas'], [u'Health Sciences'])
+        self.assertEqual(len(response.json['issues']), 1)
+        self.assertEqual(len(response.json['sections']), 1)
+        self.assertEqual(len(response.json['sponsors']), 1)
+        self.assertEqual(len(response.json['pub_status_history']), 1)
+
+
+class BulkExportTest(WebTest):
+
+    def setUp(self):
+        self.user = auth.UserF(is_active=True)
+        self.extra_environ = _make_auth_environ(self.user.username,
+            self.user.api_key.key)
+        _makeUseLicense()
+
+    def _get_lines(self, url):
+        response = self.app.get(url, extra_environ=self.extra_environ)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('application/x-ndjson'))
+
+        return [json.loads(line) for line in response.body.splitlines()]
+
+    def test_access_denied_for_unauthenticated_users(self):
+        response = self.app.get('/api/v1/bulk/journals/', status=401)
+        self.assertEqual(response.status_code, 401)
+
+    def test_unknown_resources_are_not_found(self):
+        response = self.app.get('/api/v1/bulk/users/',
+            extra_environ=self.extra_environ, status=404)
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_is_not_allowed(self):
+        response = self.app.post('/api/v1/bulk/journals/',
+            extra_environ=self.extra_environ, status=405)
+        self.assertEqual(response.status_code, 405)
+
+    def test_journals_are_exported_one_per_line(self):
+        journals = [modelfactories.JournalFactory.create() for i in range(3)]
+        lines = self._get_lines('/api/v1/bulk/journals/')
+
+        self.assertEqual([line['id'] for line in lines],
+                         [journal.pk for journal in journals])
+        self.assertEqual(lines[0]['resource_uri'],
+                         '/api/v1/journals/%s/' % journals[0].pk)
+
+    def test_journals_filtered_by_collection(self):
+        journal = modelfactories.JournalFactory.create()
+        modelfactories.JournalFactory.create()
+        lines = self._get_lines(
+            '/api/v1/bulk/journals/?collection=%s' % journal.collection.name_slug)
+
+        self.assertEqual([line['id'] for line in lines], [journal.pk])
+
+    def test_issues_filtered_by_collection(self):
+        issue = modelfactories.IssueFactory.create()
+        modelfactories.IssueFactory.create()
+        lines = self._get_lines(
+            '/api/v1/bulk/issues/?collection=%s' % issue.journal.collection.name_slug)
+
+        self.assertEqual([line['id'] for line in lines], [issue.pk])
+
+    def test_sections_filtered_by_collection(self):
+        section = modelfactories.SectionFactory.create()
+        modelfactories.SectionFactory.create()
+        lines = self._get_lines(
+            '/api/v1/bulk/sections/?collection=%s' % section.journal.collection.name_slug)
+
+        self.assertEqual([line['id'] for line in lines], [section.pk])
+
+    def test_iterate_by_pk_walks_through_all_chunks(self):
+        from journalmanager.models import Journal
+        from api.views import iterate_by_pk
+
+        journals = [modelfactories.JournalFactory.create() for i in range(5)]
+
+        self.assertEqual([j.pk for j in iterate_by_pk(Journal.objects.all(), chunk_size=2)],
+                         [j.pk for j in journals])
+
+
 class CollectionRestAPITest(WebTest):
 
     def setUp(self):
@@ -548,6 +688,13 @@ class ChangesRestAPITest(WebTest):
         self.user = auth.UserF(is_active=True)
         self.extra_environ = _make_auth_environ(self.user.username,
             self.user.api_key.key)
+        # saving a journal records its own event, so the events under
+        # test share a single journal to keep their seqs contiguous.
+        self.journal = modelfactories.JournalFactory.create()
+
+    def _create_events(self, count):
+        return [modelfactories.DataChangeEventFactory.create(content_object=self.journal)
+                for i in range(count)]
 
     def test_changes_index(self):
         event = modelfactories.DataChangeEventFactory.create()
@@ -558,10 +705,7 @@ class ChangesRestAPITest(WebTest):
         self.assertTrue('objects' in response.content)
 
     def test_since_filter(self):
-        seqs = []
-        for i in range(5):
-            event = modelfactories.DataChangeEventFactory.create()
-            seqs.append(event.pk)
+        seqs = [event.pk for event in self._create_events(5)]
 
         response = self.app.get('/api/v1/changes/?since=%s' % seqs[1],
             extra_environ=self.extra_environ)
@@ -570,6 +714,215 @@ class ChangesRestAPITest(WebTest):
         self.assertTrue('objects' in response.content)
         self.assertEqual(len(json.loads(response.content)['objects']), 4)
 
+    def test_since_cursor_is_inclusive(self):
+        events = self._create_events(3)
+
+        response = self.app.get('/api/v1/changes/?since=%s' % events[1].pk,
+            extra_environ=self.extra_environ)
+
+        self.assertEqual([obj['seq'] for obj in response.json['objects']],
+                         [events[1].pk, events[2].pk])
+
+    def test_next_cursor_points_after_the_last_event(self):
+        events = self._create_events(3)
+
+        response = self.app.get('/api/v1/changes/',
+            extra_environ=self.extra_environ)
+        meta = response.json['meta']
+
+        self.assertEqual(meta['next_since'], events[-1].pk + 1)
+        self.assertEqual(meta['next'],
+                         '/api/v1/changes/?since=%s' % (events[-1].pk + 1))
+        self.assertFalse('total_count' in meta)
+
+    def test_next_cursor_is_kept_when_there_are_no_new_events(self):
+        event = modelfactories.DataChangeEventFactory.create()
+
+        response = self.app.get('/api/v1/changes/?since=%s' % (event.pk + 1),
+            extra_environ=self.extra_environ)
+
+        self.assertEqual(response.json['objects'], [])
+        self.assertEqual(response.json['meta']['next_since'], event.pk + 1)
+
+    def test_batch_size_is_chosen_by_the_server(self):
+        from api.paginators import CursorPaginator
+        from journalmanager.models import DataChangeEvent
+
+        events = self._create_events(3)
+        paginator = CursorPaginator({'since': events[0].pk, 'limit': 3},
+                                    DataChangeEvent.objects.all(), limit=2)
+        page = paginator.page()
+
+        self.assertEqual(page['objects'], events[:2])
+        self.assertEqual(page['meta']['limit'], 2)
+        self.assertEqual(page['meta']['next_since'], events[1].pk + 1)
+
+    def test_following_next_cursors_walks_through_all_events(self):
+        from api.paginators import CursorPaginator
+        from journalmanager.models import DataChangeEvent
+
+        events = self._create_events(5)
+        seen = []
+        since = events[0].pk
+        while True:
+            page = CursorPaginator({'since': since},
+                                   DataChangeEvent.objects.all(), limit=2).page()
+            if not page['objects']:
+                break
+            seen.extend(page['objects'])
+            since = page['meta']['next_since']
+
+        self.assertEqual(seen, events)
+
+    def test_long_poll_reads_the_batch_again_when_woken(self):
+        from api import paginators
+
+        event = modelfactories.DataChangeEventFactory.create()
+        new_events = []
+
+        def fake_wait_for(seq, timeout):
+            new_events.append(modelfactories.DataChangeEventFactory.create())
+            return True
+
+        original_wait_for = paginators.changesfeed.wait_for
+        paginators.CHANGES_FEED_LONG_POLL = True
+        paginators.changesfeed.wait_for = fake_wait_for
+        try:
+            response = self.app.get('/api/v1/changes/?since=%s&wait=10' % (event.pk + 1),
+                extra_environ=self.extra_environ)
+        finally:
+            paginators.changesfeed.wait_for = original_wait_for
+            paginators.CHANGES_FEED_LONG_POLL = False
+
+        self.assertEqual([obj['seq'] for obj in response.json['objects']],
+                         [new_events[0].pk])
+        next_uri = response.json['meta']['next']
+        self.assertTrue('wait=10' in next_uri)
+        self.assertTrue('since=%s' % (new_events[0].pk + 1) in next_uri)
+
+    def test_long_poll_is_not_held_when_there_are_events(self):
+        from api import paginators
+
+        event = modelfactories.DataChangeEventFactory.create()
+        waits = []
+
+        original_wait_for = paginators.changesfeed.wait_for
+        paginators.CHANGES_FEED_LONG_POLL = True
+        paginators.changesfeed.wait_for = lambda seq, timeout: waits.append(seq)
+        try:
+            response = self.app.get('/api/v1/changes/?since=%s&wait=10' % event.pk,
+                extra_environ=self.extra_environ)
+        finally:
+            paginators.changesfeed.wait_for = original_wait_for
+            paginators.CHANGES_FEED_LONG_POLL = False
+
+        self.assertEqual(len(response.json['objects']), 1)
+        self.assertEqual(waits, [])
+
+    def test_long_poll_wait_is_bounded(self):
+        from api import paginators
+
+        event = modelfactories.DataChangeEventFactory.create()
+        seq = max(event.pk, paginators.changesfeed.latest_seq()) + 1
+        waits = []
+
+        def fake_wait_for(seq, timeout):
+            waits.append((seq, timeout))
+            return False
+
+        original_wait_for = paginators.changesfeed.wait_for
+        paginators.CHANGES_FEED_LONG_POLL = True
+        paginators.changesfeed.wait_for = fake_wait_for
+        try:
+            response = self.app.get('/api/v1/changes/?since=%s&wait=3600' % (event.pk + 1),
+                extra_environ=self.extra_environ)
+        finally:
+            paginators.changesfeed.wait_for = original_wait_for
+            paginators.CHANGES_FEED_LONG_POLL = False
+
+        self.assertEqual(response.json['objects'], [])
+        self.assertEqual(waits, [(seq, paginators.CHANGES_FEED_MAX_WAIT)])
+
+    def test_long_poll_waits_for_events_newer_than_the_known_ones(self):
+        from api import paginators
+
+        event = modelfactories.DataChangeEventFactory.create()
+        paginators.changesfeed.publish(event.pk + 10)
+        waits = []
+
+        def fake_wait_for(seq, timeout):
+            waits.append(seq)
+            return False
+
+        original_wait_for = paginators.changesfeed.wait_for
+        paginators.CHANGES_FEED_LONG_POLL = True
+        paginators.changesfeed.wait_for = fake_wait_for
+        try:
+            self.app.get('/api/v1/changes/?since=%s&wait=10' % (event.pk + 1),
+                extra_environ=self.extra_environ)
+        finally:
+            paginators.changesfeed.wait_for = original_wait_for
+            paginators.CHANGES_FEED_LONG_POLL = False
+
+        self.assertEqual(len(waits), 1)
+        self.assertTrue(waits[0] > event.pk + 10)
+
+    def test_filtered_out_events_move_the_next_cursor(self):
+        event = modelfactories.DataChangeEventFactory.create()
+        other = modelfactories.DataChangeEventFactory.create()
+
+        response = self.app.get(
+            '/api/v1/changes/?since=%s&collection=%s' % (
+                event.pk + 1, event.collection.name_slug),
+            extra_environ=self.extra_environ)
+
+        self.assertEqual(response.json['objects'], [])
+        self.assertEqual(response.json['meta']['next_since'], other.pk + 1)
+
+    def test_empty_batches_are_answered_right_away_with_a_retry_hint(self):
+        from api import paginators
+
+        event = modelfactories.DataChangeEventFactory.create()
+        waits = []
+
+        original_wait_for = paginators.changesfeed.wait_for
+        paginators.changesfeed.wait_for = lambda seq, timeout: waits.append(seq)
+        try:
+            response = self.app.get('/api/v1/changes/?since=%s&wait=10' % (event.pk + 1),
+                extra_environ=self.extra_environ)
+        finally:
+            paginators.changesfeed.wait_for = original_wait_for
+
+        self.assertEqual(waits, [])
+        self.assertEqual(response.json['objects'], [])
+        self.assertEqual(response.json['meta']['retry_after'],
+                         paginators.CHANGES_FEED_RETRY_AFTER)
+        self.assertEqual(response.headers['Retry-After'],
+                         str(paginators.CHANGES_FEED_RETRY_AFTER))
+
+    def test_invalid_wait(self):
+        response = self.app.get('/api/v1/changes/?wait=foo',
+            extra_environ=self.extra_environ, status=400)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_since_cursor(self):
+        response = self.app.get('/api/v1/changes/?since=foo',
+            extra_environ=self.extra_environ, status=400)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_collection_filter(self):
+        event = modelfactories.DataChangeEventFactory.create()
+        modelfactories.DataChangeEventFactory.create()
+
+        response = self.app.get(
+            '/api/v1/changes/?collection=%s' % event.collection.name_slug,
+            extra_environ=self.extra_environ)
+
+        self.assertEqual([obj['seq'] for obj in response.json['objects']],
+                         [event.pk])
+
     def test_post_data(self):
         event = modelfactories.DataChangeEventFactory.create()
         response = self.app.post('/api/v1/changes/',
@@ -1023,6 +1376,30 @@ class NoticeRestAPITest(WebTest):
         # 201 stands for CREATED Http status
         self.assertEqual(response.status_code, 201)
 
+    def test_posted_notices_are_counted(self):
+        from articletrack import models
+
+        checkin = articletrack_modelfactories.CheckinFactory.create()
+
+        perm = _makePermission(perm='add_notice', model='notice', app_label='articletrack')
+        self.user.user_permissions.add(perm)
+
+        att = {u'checkin': u'/api/v1/checkins/%s/' % checkin.pk,
+               u'checkpoint': u'Validation',
+               u'message': u'The reference of xyz is not OK',
+               u'stage': u'Reference',
+               u'status': u'warning'
+               }
+
+        self.app.post_json('/api/v1/notices/',
+                           att,
+                           extra_environ=self.extra_environ,
+                           status=201)
+
+        checkin = models.Checkin.objects.get(pk=checkin.pk)
+        self.assertEqual(checkin.warning_count, 1)
+        self.assertEqual(checkin.error_level, 'warning')
+
     def test_put_data(self):
         from articletrack import models
 
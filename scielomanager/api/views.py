@@ -0,0 +1,79 @@
+# coding: utf-8
+"""
+Bulk export of the API resources, as newline-delimited JSON.
+
+Each line is the same representation served by the v1 API, so
+harvesters can fetch a whole collection in a single request instead of
+paginating through the tastypie resources.
+"""
+from django.conf import settings
+from django.http import HttpResponse, Http404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from tastypie.authentication import ApiKeyAuthentication
+
+from . import resources
+
+
+BULK_EXPORT_CHUNK_SIZE = getattr(settings, 'API_BULK_EXPORT_CHUNK_SIZE', 500)
+
+# resource_name: (resource class, lookup to filter by collection's name_slug)
+BULK_EXPORT_RESOURCES = {
+    'journals': (resources.JournalResource, 'collection__name_slug'),
+    'issues': (resources.IssueResource, 'journal__collection__name_slug'),
+    'sections': (resources.SectionResource, 'journal__collection__name_slug'),
+}
+
+
+def iterate_by_pk(queryset, chunk_size=BULK_EXPORT_CHUNK_SIZE):
+    """
+    Iterates over ``queryset`` ordered by primary key.
+
+    The objects are fetched in chunks of ``chunk_size``, each one starting
+    after the last ``pk`` seen (keyset pagination), so every query is an
+    index range scan and at most one chunk is held in memory.
+    """
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+        if not chunk:
+            break
+
+        for obj in chunk:
+            yield obj
+
+        last_pk = chunk[-1].pk
+
+
+def _ndjson_lines(resource, objects, request):
+    for obj in objects:
+        bundle = resource.full_dehydrate(resource.build_bundle(obj=obj, request=request))
+        yield resource._meta.serializer.to_json(bundle).encode('utf-8') + '\n'
+
+
+@csrf_exempt
+@require_GET
+def bulk_export(request, resource_name):
+    """
+    Streams all the objects of ``resource_name``, optionally filtered by
+    the collection's name_slug, as newline-delimited JSON.
+
+    Authentication is the same used by the v1 API.
+    """
+    try:
+        resource_class, collection_lookup = BULK_EXPORT_RESOURCES[resource_name]
+    except KeyError:
+        raise Http404()
+
+    auth_result = ApiKeyAuthentication().is_authenticated(request)
+    if auth_result is not True:
+        return auth_result
+
+    resource = resource_class(api_name='v1')
+    objects = resource.get_object_list(request).no_cache()
+
+    if 'collection' in request.GET:
+        objects = objects.filter(**{collection_lookup: request.GET['collection']})
+
+    return HttpResponse(_ndjson_lines(resource, iterate_by_pk(objects), request),
+                        content_type='application/x-ndjson; charset=utf-8')
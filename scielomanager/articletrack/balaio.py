@@ -1,13 +1,195 @@
 # coding: utf-8
 import json
+import time
 import socket
-import urllib2
+import httplib
+import urlparse
+import threading
 import xmlrpclib
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 
 
+API_BALAIO_POOL_SIZE = getattr(settings, 'API_BALAIO_POOL_SIZE', 4)
+API_BALAIO_FAILURE_THRESHOLD = getattr(settings, 'API_BALAIO_FAILURE_THRESHOLD', 5)
+API_BALAIO_RESET_TIMEOUT = getattr(settings, 'API_BALAIO_RESET_TIMEOUT', 30)
+# the files of an attempt never change once it is uploaded.
+API_BALAIO_FILES_CACHE_TIMEOUT = getattr(settings, 'API_BALAIO_FILES_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+API_BALAIO_FILES_NEGATIVE_CACHE_TIMEOUT = getattr(settings, 'API_BALAIO_FILES_NEGATIVE_CACHE_TIMEOUT', 60)
+FILES_CACHE_KEY = 'articletrack:balaio:files:%s:%s:%s'
+API_BALAIO_RPC_RETRIES = getattr(settings, 'API_BALAIO_RPC_RETRIES', 1)
+
+_pools = {}
+_breakers = {}
+_registry_lock = threading.Lock()
+# xmlrpclib transports are not thread-safe.
+_rpc_transports = threading.local()
+
+
+class BalaioUnavailable(ValueError):
+    """
+    Raised without touching the network while the circuit is open.
+    """
+
+
+class ConnectionPool(object):
+    """
+    Keeps up to ``maxsize`` idle keep-alive connections to a host, to be
+    reused by the next requests.
+    """
+    def __init__(self, scheme, host, port, timeout, maxsize=API_BALAIO_POOL_SIZE):
+        self.scheme = scheme
+        self.host = host
+        self.port = int(port)
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _new_connection(self):
+        if self.scheme == 'https':
+            return httplib.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return httplib.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _get(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+
+        return self._new_connection(), False
+
+    def release(self, conn):
+        """
+        Puts back a connection whose last response was read to the end.
+        """
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(conn)
+                return None
+
+        conn.close()
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for conn in idle:
+            conn.close()
+
+    def request(self, method, path, headers=None):
+        """
+        Sends the request and returns ``(connection, response)``. The
+        connection must be given back with ``release`` once the response
+        is read, or closed.
+        """
+        headers = headers or {}
+        conn, reused = self._get()
+        try:
+            conn.request(method, path, headers=headers)
+            return conn, conn.getresponse()
+        except (httplib.HTTPException, socket.error) as e:
+            conn.close()
+            # idle connections may have been closed by the server meanwhile.
+            if not reused or isinstance(e, socket.timeout):
+                raise
+
+        conn = self._new_connection()
+        try:
+            conn.request(method, path, headers=headers)
+            return conn, conn.getresponse()
+        except:
+            conn.close()
+            raise
+
+
+class CircuitBreaker(object):
+    """
+    Fails fast after ``failure_threshold`` consecutive failures.
+
+    The circuit is ``closed`` while the service works. Once opened, the
+    calls are rejected for ``reset_timeout`` seconds, and then a single
+    trial call is let through (``half-open``): its success closes the
+    circuit, its failure opens it again.
+    """
+    def __init__(self, failure_threshold=API_BALAIO_FAILURE_THRESHOLD,
+                 reset_timeout=API_BALAIO_RESET_TIMEOUT, clock=time.time):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.latency = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Returns ``True`` if a call may be made now.
+        """
+        with self._lock:
+            if self.state == 'open' and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = 'half-open'
+                return True
+
+            if self.state == 'closed':
+                return True
+
+            self.rejected += 1
+            return False
+
+    def success(self, latency):
+        with self._lock:
+            self.requests += 1
+            self.latency += latency
+            self.consecutive_failures = 0
+            self.state = 'closed'
+
+    def failure(self, latency):
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.latency += latency
+            self.consecutive_failures += 1
+
+            if self.state == 'half-open' or self.consecutive_failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = self.clock()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'requests': self.requests,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'average_latency': self.latency / self.requests if self.requests else 0.0,
+            }
+
+
+def get_pool(conf):
+    key = (conf['PROTOCOL'], conf['HOST'], conf['PORT'])
+    with _registry_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(conf['PROTOCOL'], conf['HOST'], conf['PORT'],
+                                         timeout=settings.API_BALAIO_DEFAULT_TIMEOUT)
+        return _pools[key]
+
+
+def get_breaker(conf):
+    key = (conf['PROTOCOL'], conf['HOST'], conf['PORT'])
+    with _registry_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker()
+        return _breakers[key]
+
+
 class SettingsMixin(object):
     def validate_settings(self, using):
         if not using in settings.API_BALAIO.keys():
@@ -32,11 +214,21 @@ class SettingsMixin(object):
 
 
 class BalaioAPI(SettingsMixin):
+    """
+    Client of the Balaio HTTP API.
+
+    Connections are pooled and kept alive among the instances that use
+    the same host, which also share a circuit breaker: while Balaio is
+    failing, the calls raise ``BalaioUnavailable`` right away instead of
+    waiting for ``API_BALAIO_DEFAULT_TIMEOUT``.
+    """
 
     def __init__(self, using='default'):
         self.using = using
         self.validate_settings(self.using)
         self.conf =  settings.API_BALAIO[self.using]
+        self.pool = get_pool(self.conf)
+        self.breaker = get_breaker(self.conf)
 
     def get_hostname(self):
         return '%s://%s:%s/' % (self.conf['PROTOCOL'], self.conf['HOST'], self.conf['PORT'])
@@ -50,11 +242,14 @@ class BalaioAPI(SettingsMixin):
     def is_up(self):
         url = self.get_hostname() + 'status/'
         try:
-            response = urllib2.urlopen(url, timeout=settings.API_BALAIO_DEFAULT_TIMEOUT)
-            return response.getcode() == 200
-        except urllib2.URLError:
+            conn, response = self._request(url)
+        except ValueError:
             return False
 
+        response.read()
+        self._release(conn, response)
+        return response.status == 200
+
     def _response_is_json(response):
         response_headers = response.info()
         for header in response_headers:
@@ -62,21 +257,87 @@ class BalaioAPI(SettingsMixin):
                 return True
         return False
 
-    def _open(self, url):
+    def _request(self, url, headers=None):
+        """
+        Sends a GET request for ``url`` through the pool, and returns
+        ``(connection, response)`` as soon as the headers arrive.
+
+        Connection errors, timeouts, server errors and any other exception
+        count as failures of the circuit breaker, so a failed half-open
+        trial always opens it again. Raises ValueError on failures.
+        """
+        if not self.breaker.allow():
+            raise BalaioUnavailable('Balaio is unavailable')
+
+        parts = urlparse.urlsplit(url)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+
+        start = time.time()
+        failed = True
         try:
-            response = urllib2.urlopen(url, timeout=settings.API_BALAIO_DEFAULT_TIMEOUT)
-        except urllib2.URLError as e:
-            raise ValueError(e)
+            try:
+                conn, response = self.pool.request('GET', path, headers=headers)
+            except (httplib.HTTPException, socket.error) as e:
+                raise ValueError(e)
 
-        if response.getcode() != 200:
-            raise ValueError('Error HTTP Not 200')
+            failed = response.status >= 500
+        finally:
+            if failed:
+                self.breaker.failure(time.time() - start)
+            else:
+                self.breaker.success(time.time() - start)
 
-        while True:
-            response_chunk = response.read(settings.API_BALAIO_DEFAULT_CHUNK_SIZE)
-            if response_chunk:
-                yield response_chunk
+        return conn, response
+
+    def _release(self, conn, response):
+        if response.will_close:
+            conn.close()
+        else:
+            self.pool.release(conn)
+
+    def _iter_body(self, conn, response, chunk_size):
+        completed = False
+        try:
+            while True:
+                try:
+                    response_chunk = response.read(chunk_size)
+                except (httplib.HTTPException, socket.error) as e:
+                    raise ValueError(e)
+
+                if response_chunk:
+                    yield response_chunk
+                else:
+                    completed = True
+                    break
+        finally:
+            # abandoned responses leave unread data behind.
+            if completed:
+                self._release(conn, response)
             else:
-                raise StopIteration()
+                conn.close()
+
+    def open_stream(self, url, headers=None, statuses=(200,), chunk_size=None):
+        """
+        Requests ``url`` right away and returns ``(response, chunks)``,
+        where ``response`` gives the status and the headers and ``chunks``
+        iterates over the body.
+
+        Raises ValueError if Balaio is unavailable or if the status is
+        not one of ``statuses``.
+        """
+        conn, response = self._request(url, headers=headers)
+        if response.status not in statuses:
+            response.read()
+            self._release(conn, response)
+            raise ValueError('Error HTTP Not 200')
+
+        chunk_size = chunk_size or settings.API_BALAIO_DEFAULT_CHUNK_SIZE
+        return response, self._iter_body(conn, response, chunk_size)
+
+    def _open(self, url):
+        response, chunks = self.open_stream(url)
+        for response_chunk in chunks:
+            yield response_chunk
 
     def _process_response_as_json(self, iterable):
 
@@ -89,24 +350,147 @@ class BalaioAPI(SettingsMixin):
             json_response['error'] = False
         return json_response
 
+    def _files_cache_key(self, attempt_id):
+        return FILES_CACHE_KEY % (self.conf['HOST'], self.conf['PORT'], attempt_id)
+
     def list_files_members_by_attempt(self, attempt_id):
+        """
+        Lists the files of the attempt package, by extension.
+
+        Listings are cached by attempt. Failures are cached too, for a
+        shorter time, so an unavailable Balaio is not asked again at
+        every page view.
+        """
+        key = self._files_cache_key(attempt_id)
+        files = cache.get(key)
+        if files is not None:
+            return files
+
         url = self.get_fullpath() + 'files/%s/' % str(attempt_id)
         response = self._open(url)
-        return self._process_response_as_json(response)
+        files = self._process_response_as_json(response)
+
+        if files['error']:
+            cache.set(key, files, API_BALAIO_FILES_NEGATIVE_CACHE_TIMEOUT)
+        else:
+            cache.set(key, files, API_BALAIO_FILES_CACHE_TIMEOUT)
+
+        return files
+
+    def purge_files_members_by_attempt(self, attempt_id):
+        """
+        Drops the cached listing of the attempt files.
+        """
+        cache.delete(self._files_cache_key(attempt_id))
+
+    def get_file_member_by_attempt_url(self, attempt_id, target_name, file_member):
+        return self.get_fullpath() + 'files/%s/%s.zip/?file=%s' % (attempt_id, target_name, file_member)
 
     def get_file_member_by_attempt(self, attempt_id, target_name, file_member):
-        url = self.get_fullpath() + 'files/%s/%s.zip/?file=%s' % (attempt_id, target_name, file_member)
+        url = self.get_file_member_by_attempt_url(attempt_id, target_name, file_member)
         return self._open(url)
 
+    def get_files_members_by_attempt_url(self, attempt_id, target_name, files_members):
+        files_members = '&file='.join(files_members)
+        return self.get_file_member_by_attempt_url(attempt_id, target_name, files_members)
+
     def get_files_members_by_attempt(self, attempt_id, target_name, files_members):
         files_members = '&file='.join(files_members)
         return self.get_file_member_by_attempt(attempt_id, target_name, files_members)
 
+    def get_full_package_url(self, attempt_id, target_name):
+        return self.get_fullpath() + 'files/%s/%s.zip/?full=true' % (attempt_id, target_name)
+
     def get_full_package(self, attempt_id, target_name):
-        url = self.get_fullpath() + 'files/%s/%s.zip/?full=true' % (attempt_id, target_name)
+        url = self.get_full_package_url(attempt_id, target_name)
         return self._open(url)
 
 
+class KeepAliveTransport(xmlrpclib.Transport):
+    """
+    XML-RPC transport that keeps its connection alive among requests,
+    with a timeout. Requests that fail for connection errors, e.g. when
+    the server has closed the idle connection, are sent again up to
+    ``retries`` times, as long as they had not been sent yet or call
+    one of the read-only ``idempotent_methods``: the server may have
+    run the others. Timeouts are not retried.
+
+    The other methods are always sent on a fresh connection, so they do
+    not fail on one the server has closed meanwhile.
+    """
+    idempotent_methods = ('status',)
+
+    def __init__(self, scheme, timeout, retries=API_BALAIO_RPC_RETRIES, use_datetime=0):
+        xmlrpclib.Transport.__init__(self, use_datetime=use_datetime)
+        self.scheme = scheme
+        self.timeout = timeout
+        self.retries = retries
+        self._sent = False
+
+    def make_connection(self, host):
+        if self._connection and host == self._connection[0]:
+            return self._connection[1]
+
+        chost, self._extra_headers, x509 = self.get_host_info(host)
+        if self.scheme == 'https':
+            conn = httplib.HTTPSConnection(chost, None, timeout=self.timeout, **(x509 or {}))
+        else:
+            conn = httplib.HTTPConnection(chost, timeout=self.timeout)
+
+        self._connection = host, conn
+        return conn
+
+    def send_content(self, connection, request_body):
+        xmlrpclib.Transport.send_content(self, connection, request_body)
+        self._sent = True
+
+    def is_idempotent(self, request_body):
+        try:
+            method = xmlrpclib.loads(request_body)[1]
+        except Exception:
+            return False
+
+        return method in self.idempotent_methods
+
+    def request(self, host, handler, request_body, verbose=0):
+        # ``xmlrpclib.Transport.request`` would retry regardless of the
+        # method, so the requests are sent by ``single_request``.
+        if not self.is_idempotent(request_body):
+            self.close()
+
+        attempt = 0
+        while True:
+            self._sent = False
+            try:
+                return self.single_request(host, handler, request_body, verbose)
+            except socket.timeout:
+                self.close()
+                raise
+            except (socket.error, httplib.HTTPException):
+                self.close()
+                if attempt >= self.retries:
+                    raise
+                if self._sent and not self.is_idempotent(request_body):
+                    raise
+                attempt += 1
+
+
+def get_rpc_transport(conf):
+    """
+    Returns the transport of the current thread to the host of ``conf``.
+    """
+    key = (conf['PROTOCOL'], conf['HOST'], conf['PORT'])
+    transports = getattr(_rpc_transports, 'transports', None)
+    if transports is None:
+        transports = _rpc_transports.transports = {}
+
+    if key not in transports:
+        transports[key] = KeepAliveTransport(conf['PROTOCOL'],
+            timeout=settings.API_BALAIO_DEFAULT_TIMEOUT)
+
+    return transports[key]
+
+
 class BalaioRPC(SettingsMixin):
     _xmlrpclib = xmlrpclib
 
@@ -121,11 +505,11 @@ class BalaioRPC(SettingsMixin):
         """
         try:
             return self.call('status')
-        except xmlrpclib.Error:
+        except (xmlrpclib.Error, httplib.HTTPException, socket.error):
             return False
 
     def get_server(self, uri):
-        return self._xmlrpclib.ServerProxy(uri)
+        return self._xmlrpclib.ServerProxy(uri, transport=get_rpc_transport(self.conf))
 
     def _fullpath(self):
         return '%s://%s:%s/%s/_rpc/' % (self.conf['PROTOCOL'], self.conf['HOST'].strip('/'),
@@ -143,3 +527,37 @@ class BalaioRPC(SettingsMixin):
 
         return getattr(rpc_server, method)(*args)
 
+    def multicall(self, calls):
+        """
+        Calls many remote procedures in a single round trip, through
+        ``system.multicall``.
+
+        Returns the results in the order of ``calls``. The calls that
+        failed on the server have a ``xmlrpclib.Fault`` as result,
+        instead of raising it.
+
+        ::param calls: collection of ``(method, args)``
+        """
+        rpc_server = self.get_server(self.server_path)
+        multicall = self._xmlrpclib.MultiCall(rpc_server)
+        for method, args in calls:
+            getattr(multicall, method)(*args)
+
+        results = []
+        for result in multicall().results:
+            if isinstance(result, dict):
+                results.append(xmlrpclib.Fault(result['faultCode'], result['faultString']))
+            else:
+                results.append(result[0])
+
+        return results
+
+    def proceed_to_checkout(self, attempt_ids):
+        """
+        Marks the attempts to the checkout process, at once. Returns
+        a dict mapping each attempt id to the outcome.
+        """
+        results = self.multicall([('proceed_to_checkout', [attempt_id])
+                                  for attempt_id in attempt_ids])
+        return dict((attempt_id, not isinstance(result, xmlrpclib.Fault) and bool(result))
+                    for attempt_id, result in zip(attempt_ids, results))
@@ -0,0 +1,237 @@
+# coding: utf-8
+"""
+Streaming proxy for the packages served by Balaio.
+
+Packages are relayed to the client as they arrive, along with their
+Content-Length and ETag. Range requests are honoured, so interrupted
+downloads can be resumed.
+
+If ``settings.API_BALAIO_PACKAGES_CACHE_DIR`` is set, the packages
+received in full are also kept there, up to
+``API_BALAIO_PACKAGES_CACHE_MAX_SIZE`` bytes, and later requests are
+served from the local disk. The least recently used ones are removed
+first.
+"""
+import os
+import re
+import glob
+import hashlib
+import tempfile
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from scielomanager.utils.files import collect_garbage
+
+
+DOWNLOAD_CHUNK_SIZE = getattr(settings, 'API_BALAIO_DOWNLOAD_CHUNK_SIZE', 64 * 1024)
+PACKAGES_CACHE_DIR = getattr(settings, 'API_BALAIO_PACKAGES_CACHE_DIR', None)
+PACKAGES_CACHE_MAX_SIZE = getattr(settings, 'API_BALAIO_PACKAGES_CACHE_MAX_SIZE', 1024 * 1024 * 1024)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Returns the ``(first, last)`` byte positions asked by the Range
+    ``header`` for a resource of ``size`` bytes, or ``None`` if the whole
+    resource must be served: no header, multiple or malformed ranges.
+
+    Raises RangeNotSatisfiable if the range is out of the resource.
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # the last bytes of the resource
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        raise RangeNotSatisfiable()
+
+    last = min(int(last), size - 1) if last else size - 1
+    return first, last
+
+
+def iter_file(fileobj, first, last, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    Iterates over the bytes ``first`` to ``last`` of ``fileobj``, and
+    closes it.
+    """
+    try:
+        fileobj.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = fileobj.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+class PackageCache(object):
+    """
+    Size-bounded LRU of packages on local disk. Each package is stored
+    along with its ETag.
+    """
+    def __init__(self, directory, max_size=PACKAGES_CACHE_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key).hexdigest() + '.zip')
+
+    def open(self, key):
+        """
+        Returns ``(fileobj, etag)`` for the package ``key``, marking it as
+        recently used, or ``None`` if it is not stored.
+        """
+        path = self._path(key)
+        try:
+            fileobj = open(path, 'rb')
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+
+        try:
+            with open(path + '.etag') as f:
+                etag = f.read()
+        except IOError:
+            etag = None
+
+        return fileobj, etag
+
+    def store(self, key, chunks, size=None, etag=None):
+        """
+        Yields ``chunks`` while writing them to the disk. The package is
+        stored only if it is received in full.
+        """
+        try:
+            os.makedirs(self.directory)
+        except OSError:
+            pass  # already exists
+
+        fd, partial = tempfile.mkstemp(suffix='.part', dir=self.directory)
+        completed = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            completed = size is None or os.path.getsize(partial) == size
+        finally:
+            if completed:
+                self._commit(key, partial, etag)
+            else:
+                os.remove(partial)
+
+    def _commit(self, key, partial, etag):
+        path = self._path(key)
+        if etag:
+            with open(path + '.etag', 'w') as f:
+                f.write(etag)
+        os.rename(partial, path)
+
+        collect_garbage(self.directory, self.max_size, pattern='*.zip', keep=[path])
+        for etag_path in glob.glob(os.path.join(self.directory, '*.zip.etag')):
+            if not os.path.exists(etag_path[:-len('.etag')]):
+                try:
+                    os.remove(etag_path)
+                except OSError:
+                    pass
+
+
+def get_package_cache():
+    if PACKAGES_CACHE_DIR:
+        return PackageCache(PACKAGES_CACHE_DIR)
+
+
+def _attachment(response, filename):
+    response['Content-Disposition'] = 'attachment; filename="%s.ZIP"' % filename
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _serve_file(request, fileobj, etag, filename):
+    size = os.fstat(fileobj.fileno()).st_size
+    if etag is None:
+        etag = '"%s"' % size
+
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        fileobj.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = 'bytes */%s' % size
+        return _attachment(response, filename)
+
+    if byte_range is None:
+        first, last = 0, size - 1
+        response = HttpResponse(iter_file(fileobj, first, last), content_type='application/zip')
+    else:
+        first, last = byte_range
+        response = HttpResponse(iter_file(fileobj, first, last), status=206,
+                                content_type='application/zip')
+        response['Content-Range'] = 'bytes %s-%s/%s' % (first, last, size)
+
+    response['Content-Length'] = str(last - first + 1)
+    response['ETag'] = etag
+    return _attachment(response, filename)
+
+
+def serve(request, balaio_api, url, key, filename, cache=None):
+    """
+    Returns a response streaming the package at ``url``, identified by
+    ``key`` in the disk cache.
+
+    Raises ValueError if Balaio is unavailable.
+    """
+    cache = cache or get_package_cache()
+    if cache is not None:
+        cached = cache.open(key)
+        if cached is not None:
+            fileobj, etag = cached
+            return _serve_file(request, fileobj, etag, filename)
+
+    headers = {}
+    for meta, header in [('HTTP_RANGE', 'Range'), ('HTTP_IF_RANGE', 'If-Range')]:
+        if meta in request.META:
+            headers[header] = request.META[meta]
+
+    upstream, chunks = balaio_api.open_stream(url, headers=headers,
+        statuses=(200, 206, 416), chunk_size=DOWNLOAD_CHUNK_SIZE)
+
+    size = upstream.getheader('content-length')
+    etag = upstream.getheader('etag')
+
+    if cache is not None and upstream.status == 200:
+        chunks = cache.store(key, chunks, size=int(size) if size else None, etag=etag)
+
+    response = HttpResponse(chunks, status=upstream.status, content_type='application/zip')
+    for header in ['Content-Length', 'Content-Range', 'ETag']:
+        value = upstream.getheader(header)
+        if value is not None:
+            response[header] = value
+
+    return _attachment(response, filename)
@@ -0,0 +1,142 @@
+# coding: utf-8
+"""
+Health monitoring of Balaio.
+
+The ``balaio_health_monitor`` command probes the HTTP API and the RPC
+server of Balaio every ``API_BALAIO_HEALTH_CHECK_INTERVAL`` seconds and
+publishes a snapshot of their status, with the latency history, to the
+cache. The status views answer from that snapshot, so the browsers
+polling them do not reach Balaio. Without a snapshot, the status of
+the services is unknown (``is_up`` is ``None``).
+"""
+import time
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .balaio import BalaioAPI, BalaioRPC
+
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL = getattr(settings, 'API_BALAIO_HEALTH_CHECK_INTERVAL', 30)
+HEALTH_HISTORY_SIZE = getattr(settings, 'API_BALAIO_HEALTH_HISTORY_SIZE', 20)
+# snapshots not refreshed for a few intervals are gone, e.g. when the
+# monitor is stopped.
+HEALTH_STATUS_TIMEOUT = getattr(settings, 'API_BALAIO_HEALTH_STATUS_TIMEOUT',
+                                HEALTH_CHECK_INTERVAL * 4)
+STATUS_CACHE_KEY = 'articletrack:balaio:health:%s'
+SERVICES = ('api', 'rpc')
+
+
+def probe(check):
+    """
+    Runs ``check`` and returns ``(is_up, latency in seconds)``. Checks
+    raising exceptions are taken as down.
+    """
+    start = time.time()
+    try:
+        is_up = bool(check())
+    except Exception:
+        logger.exception('Balaio health check has failed')
+        is_up = False
+
+    return is_up, time.time() - start
+
+
+class HealthMonitor(object):
+    """
+    Probes the services of the Balaio set at ``settings.API_BALAIO[using]``.
+    """
+    def __init__(self, using='default', history_size=HEALTH_HISTORY_SIZE,
+                 timeout=HEALTH_STATUS_TIMEOUT):
+        self.using = using
+        self.history_size = history_size
+        self.timeout = timeout
+
+    def get_probes(self):
+        return {
+            'api': BalaioAPI(using=self.using).is_up,
+            'rpc': BalaioRPC(using=self.using).is_up,
+        }
+
+    def check(self):
+        """
+        Probes each service and publishes the snapshot, which is returned.
+
+        The snapshot maps each service to its current status, latency,
+        and the ``[checked_at, is_up, latency]`` of the last checks.
+        """
+        previous = get_status(self.using) or {}
+        checked_at = time.time()
+
+        snapshot = {'checked_at': checked_at}
+        for name, check in self.get_probes().items():
+            is_up, latency = probe(check)
+
+            history = previous.get(name, {}).get('history', [])
+            history = (history + [[checked_at, is_up, latency]])[-self.history_size:]
+            latencies = [entry[2] for entry in history]
+
+            snapshot[name] = {
+                'is_up': is_up,
+                'latency': latency,
+                'latency_avg': sum(latencies) / len(latencies),
+                'uptime': len([entry for entry in history if entry[1]]) / float(len(history)),
+                'history': history,
+            }
+
+        cache.set(STATUS_CACHE_KEY % self.using, snapshot, self.timeout)
+        return snapshot
+
+    def run(self, once=False, interval=HEALTH_CHECK_INTERVAL):
+        """
+        Checks the services every ``interval`` seconds. If ``once`` is
+        ``True``, returns after the first check.
+        """
+        while True:
+            start = time.time()
+            self.check()
+
+            if once:
+                return None
+
+            time.sleep(max(interval - (time.time() - start), 0))
+
+
+def get_status(using='default'):
+    """
+    Returns the last published snapshot, or ``None``.
+    """
+    return cache.get(STATUS_CACHE_KEY % using)
+
+
+def unknown_status():
+    """
+    Returns a snapshot of services whose status is not known.
+    """
+    status = {'checked_at': None}
+    for name in SERVICES:
+        status[name] = {
+            'is_up': None,
+            'latency': None,
+            'latency_avg': None,
+            'uptime': None,
+            'history': [],
+        }
+
+    return status
+
+
+def current_status(using='default'):
+    """
+    Returns the last published snapshot. When there is none, e.g. the
+    monitor is not running, the status is unknown: Balaio is never
+    reached from here.
+    """
+    status = get_status(using)
+    if status is None:
+        status = unknown_status()
+
+    return status
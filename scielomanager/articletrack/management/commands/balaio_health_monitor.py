@@ -0,0 +1,32 @@
+"""
+Command to monitor the health of Balaio.
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from articletrack import health
+
+
+class Command(BaseCommand):
+    help = 'probes the Balaio services periodically, publishing their status to the cache'
+    option_list = BaseCommand.option_list + (
+        make_option('--once',
+            action='store_true',
+            dest='once',
+            default=False,
+            help='exit after the first check'),
+        make_option('--interval',
+            type='float',
+            dest='interval',
+            default=health.HEALTH_CHECK_INTERVAL,
+            help='seconds between checks'),
+        make_option('--using',
+            dest='using',
+            default='default',
+            help='the API_BALAIO settings entry to monitor'),
+    )
+
+    def handle(self, *args, **options):
+        monitor = health.HealthMonitor(using=options['using'])
+        monitor.run(once=options['once'], interval=options['interval'])
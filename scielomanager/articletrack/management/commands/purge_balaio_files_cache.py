@@ -0,0 +1,29 @@
+"""
+Command to drop the cached listings of the files of Balaio attempts.
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from articletrack.balaio import BalaioAPI
+
+
+class Command(BaseCommand):
+    args = '<attempt_id attempt_id ...>'
+    help = 'drops the cached listings of the files of the given attempts, e.g. after they are reprocessed'
+    option_list = BaseCommand.option_list + (
+        make_option('--using',
+            dest='using',
+            default='default',
+            help='the API_BALAIO settings entry the attempts belong to'),
+    )
+
+    def handle(self, *args, **options):
+        if not args:
+            raise CommandError('at least one attempt id is required')
+
+        balaio = BalaioAPI(using=options['using'])
+        for attempt_id in args:
+            balaio.purge_files_members_by_attempt(attempt_id)
+
+        self.stdout.write('%s listings purged\n' % len(args))
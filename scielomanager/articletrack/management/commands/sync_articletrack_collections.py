@@ -0,0 +1,124 @@
+"""
+Command to fill again the denormalized collection of articles, checkins
+and tickets, and to compare the user context querysets built on it with
+the ones joining the journals.
+
+The existing rows are filled by migration 0008; this is for re-syncs.
+"""
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from journalmanager.models import Collection
+from articletrack import models
+
+
+CHUNK_SIZE = 500
+
+# the user context filters as they were before the denormalization.
+LEGACY_FILTERS = (
+    (models.Article, 'journals__collection'),
+    (models.Checkin, 'article__journals__collection'),
+    (models.Ticket, 'article__journals__collection'),
+    (models.Comment, 'ticket__article__journals__collection'),
+)
+
+FILTERS = (
+    (models.Article, 'collection'),
+    (models.Checkin, 'collection'),
+    (models.Ticket, 'collection'),
+    (models.Comment, 'ticket__collection'),
+)
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def backfill():
+    """
+    Sets the collection of every article, checkin and ticket, with a few
+    bulk updates per collection. Returns the number of articles bound to
+    each collection id.
+    """
+    # the collection of the first journal wins, as in Article.sync_collection
+    bindings = models.Article.journals.through.objects.order_by(
+        '-journal').values_list('article', 'journal__collection')
+    article_collection = dict(bindings)
+
+    by_collection = {}
+    for article_id, collection_id in article_collection.items():
+        by_collection.setdefault(collection_id, []).append(article_id)
+
+    models.Article.objects.exclude(pk__in=article_collection.keys()).update(collection=None)
+
+    for collection_id, article_ids in by_collection.items():
+        for chunk in _chunks(article_ids):
+            models.Article.objects.filter(pk__in=chunk).update(collection=collection_id)
+            models.Checkin.objects.filter(article__in=chunk).update(collection=collection_id)
+            models.Ticket.objects.filter(article__in=chunk).update(collection=collection_id)
+
+    models.Checkin.objects.filter(article=None).update(collection=None)
+
+    return dict((collection_id, len(article_ids))
+                for collection_id, article_ids in by_collection.items())
+
+
+def _timeit(queryset, repeat):
+    timings = []
+    for i in range(repeat):
+        start = time.time()
+        list(queryset.values_list('pk', flat=True))
+        timings.append(time.time() - start)
+
+    return min(timings)
+
+
+def benchmark(collection, repeat=5):
+    """
+    Returns ``(model name, legacy seconds, seconds)`` for each user context
+    queryset of ``collection``, taking the best of ``repeat`` runs.
+    """
+    results = []
+    for (model, legacy_lookup), (_, lookup) in zip(LEGACY_FILTERS, FILTERS):
+        legacy = model.objects.filter(**{legacy_lookup: collection}).distinct()
+        current = model.objects.filter(**{lookup: collection})
+
+        results.append((model.__name__,
+                        _timeit(legacy, repeat),
+                        _timeit(current, repeat)))
+
+    return results
+
+
+class Command(BaseCommand):
+    help = ('fills again the denormalized collection of articles, checkins and '
+            'tickets. with --benchmark, times the user context querysets too')
+    option_list = BaseCommand.option_list + (
+        make_option('--benchmark',
+            action='store_true',
+            dest='benchmark',
+            default=False,
+            help='compare the querysets joining the journals with the denormalized ones'),
+        make_option('--repeat',
+            dest='repeat',
+            type='int',
+            default=5,
+            help='runs of each benchmarked queryset'),
+    )
+
+    def handle(self, *args, **options):
+        counts = backfill()
+        self.stdout.write('%s articles bound to %s collections\n' % (
+            sum(counts.values()), len(counts)))
+
+        if not options['benchmark']:
+            return None
+
+        for collection in Collection.objects.filter(pk__in=counts.keys()).order_by('name'):
+            self.stdout.write('%s (%s articles)\n' % (collection.name_slug, counts[collection.pk]))
+            for name, legacy, current in benchmark(collection, options['repeat']):
+                self.stdout.write('  %-8s join+distinct: %8.2fms  denormalized: %8.2fms\n' % (
+                    name, legacy * 1000, current * 1000))
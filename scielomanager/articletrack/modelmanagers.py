@@ -11,11 +11,14 @@ class CheckinQuerySet(UserObjectQuerySet):
 
     def all(self, get_all_collections=user_request_context.get_current_user_collections):
         return self.filter(
-            article__journals__collection__in=get_all_collections()).distinct()
+            collection__in=get_all_collections())
 
     def active(self, get_active_collection=user_request_context.get_current_user_active_collection):
         return self.filter(
-            article__journals__collection=get_active_collection()).distinct()
+            collection=get_active_collection())
+
+    def error_level(self, level):
+        return self.filter(error_level=level)
 
 
 class CheckinManager(UserObjectManager):
@@ -29,11 +32,11 @@ class CheckinManager(UserObjectManager):
 class ArticleQuerySet(UserObjectQuerySet):
     def all(self, get_all_collections=user_request_context.get_current_user_collections):
         return self.filter(
-            journals__collection__in=get_all_collections()).distinct()
+            collection__in=get_all_collections())
 
     def active(self, get_active_collection=user_request_context.get_current_user_active_collection):
         return self.filter(
-            journals__collection=get_active_collection()).distinct()
+            collection=get_active_collection())
 
 
 class ArticleManager(UserObjectManager):
@@ -45,11 +48,11 @@ class ArticleManager(UserObjectManager):
 class TicketQuerySet(UserObjectQuerySet):
     def all(self, get_all_collections=user_request_context.get_current_user_collections):
         return self.filter(
-            article__journals__collection__in=get_all_collections()).distinct()
+            collection__in=get_all_collections())
 
     def active(self, get_active_collection=user_request_context.get_current_user_active_collection):
         return self.filter(
-            article__journals__collection=get_active_collection()).distinct()
+            collection=get_active_collection())
 
 
 class TicketManager(UserObjectManager):
@@ -62,11 +65,11 @@ class TicketManager(UserObjectManager):
 class CommentQuerySet(UserObjectQuerySet):
     def all(self, get_all_collections=user_request_context.get_current_user_collections):
         return self.filter(
-            ticket__article__journals__collection__in=get_all_collections()).distinct()
+            ticket__collection__in=get_all_collections())
 
     def active(self, get_active_collection=user_request_context.get_current_user_active_collection):
         return self.filter(
-            ticket__article__journals__collection=get_active_collection()).distinct()
+            ticket__collection=get_active_collection())
 
 
 class CommentManager(UserObjectManager):
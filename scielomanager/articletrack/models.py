@@ -3,16 +3,32 @@ import datetime
 import logging
 
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models import F, Count
+from django.db.models.signals import post_save, pre_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth.models import User
 
 from articletrack import modelmanagers
-from journalmanager.models import Journal
+from journalmanager.models import Journal, Collection
 
 logger = logging.getLogger(__name__)
 
+ERROR_LEVELS = (
+    ('ok', 'ok'),
+    ('warning', 'warning'),
+    ('error', 'error'),
+)
+
+
+def get_error_level(error_count, warning_count):
+    if error_count:
+        return 'error'
+    elif warning_count:
+        return 'warning'
+    else:
+        return 'ok'
+
 
 class Notice(caching.base.CachingMixin, models.Model):
 
@@ -44,6 +60,15 @@ class Checkin(caching.base.CachingMixin, models.Model):
     accepted_at = models.DateTimeField(null=True)
 
     article = models.ForeignKey('Article', related_name='checkins', null=True)
+    # denormalized from article.collection
+    collection = models.ForeignKey(Collection, null=True, blank=True,
+                                   related_name='+')
+
+    # denormalized from notices, see `update_notice_counters`
+    error_count = models.PositiveIntegerField(default=0)
+    warning_count = models.PositiveIntegerField(default=0)
+    error_level = models.CharField(max_length=8, choices=ERROR_LEVELS,
+                                   default='ok', db_index=True)
 
     class Meta:
         ordering = ['-created_at']
@@ -51,12 +76,25 @@ class Checkin(caching.base.CachingMixin, models.Model):
 
     @property
     def get_error_level(self):
-        if self.notices.filter(status__iexact="error").count() > 0:
-            return "error"
-        elif self.notices.filter(status__iexact="warning").count() > 0:
-            return "warning"
-        else:
-            return "ok"
+        return self.error_level
+
+    def update_notice_counters(self):
+        """
+        Counts the error and warning notices of the checkin again, with
+        a single query, and stores the counters and the error level.
+        """
+        counts = {'error': 0, 'warning': 0}
+        for status, count in self.notices.values_list('status').annotate(Count('pk')):
+            status = status.lower()
+            if status in counts:
+                counts[status] += count
+
+        self.error_count = counts['error']
+        self.warning_count = counts['warning']
+        self.error_level = get_error_level(self.error_count, self.warning_count)
+        Checkin.objects.filter(pk=self.pk).update(error_count=self.error_count,
+            warning_count=self.warning_count, error_level=self.error_level)
+        Checkin.userobjects.invalidate(self)
 
     def is_accepted(self):
         """
@@ -80,7 +118,10 @@ class Checkin(caching.base.CachingMixin, models.Model):
         else:
             self.accepted_by = responsible
             self.accepted_at = datetime.datetime.now()
-            self.save()
+            # the notice counters may have changed since self was loaded.
+            Checkin.objects.filter(pk=self.pk).update(
+                accepted_by=self.accepted_by, accepted_at=self.accepted_at)
+            Checkin.userobjects.invalidate(self)
 
 
 class Article(caching.base.CachingMixin, models.Model):
@@ -96,12 +137,32 @@ class Article(caching.base.CachingMixin, models.Model):
     issue_label = models.CharField(max_length=64)
     pissn = models.CharField(max_length=9, default='')
     eissn = models.CharField(max_length=9, default='')
+    # denormalized from journals, see `sync_collection`
+    collection = models.ForeignKey(Collection, null=True, blank=True,
+                                   related_name='+')
 
     class Meta:
         verbose_name = _('Article')
         verbose_name_plural = _('Articles')
         permissions = (("list_article", "Can list Article"),)
 
+    def sync_collection(self):
+        """
+        Copies the collection of the journals the article is bound to,
+        to the article itself and to its checkins and tickets, so they
+        can be filtered by collection without joining the journals.
+
+        Articles are bound to journals of a single collection. If that
+        is not the case, the collection of the first journal is taken.
+        """
+        collections = self.journals.order_by('pk').values_list('collection', flat=True)
+        collection_id = collections[0] if collections else None
+
+        self.collection_id = collection_id
+        Article.objects.filter(pk=self.pk).update(collection=collection_id)
+        self.checkins.update(collection=collection_id)
+        self.tickets.update(collection=collection_id)
+
 
     def is_accepted(self):
         """
@@ -125,6 +186,9 @@ class Ticket(caching.base.CachingMixin, models.Model):
     title = models.CharField(_("Title"), max_length=256)
     message = models.TextField(_("Message"))
     article = models.ForeignKey(Article, related_name='tickets')
+    # denormalized from article.collection
+    collection = models.ForeignKey(Collection, null=True, blank=True,
+                                   related_name='+')
 
     class Meta:
         verbose_name = _(u'Ticket')
@@ -162,3 +226,88 @@ class Comment(caching.base.CachingMixin, models.Model):
 
     def __unicode__(self):
         return u"%s (ticket: %s)" % (self.pk, self.ticket)
+
+
+@receiver(pre_save, sender=Checkin, dispatch_uid='articletrack.models.checkin_collection_pre_save')
+@receiver(pre_save, sender=Ticket, dispatch_uid='articletrack.models.ticket_collection_pre_save')
+def copy_article_collection(sender, instance, **kwargs):
+    """
+    Keeps the denormalized collection of checkins and tickets.
+    """
+    collections = Article.objects.filter(
+        pk=instance.article_id).values_list('collection', flat=True)
+    instance.collection_id = collections[0] if collections else None
+
+
+@receiver(m2m_changed, sender=Article.journals.through, dispatch_uid='articletrack.models.article_journals_m2m_changed')
+def sync_article_collection(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keeps the denormalized collection of articles as journals are
+    bound to them.
+    """
+    if action == 'pre_clear' and reverse:
+        instance._cleared_article_ids = list(
+            instance.checkin_articles.values_list('pk', flat=True))
+        return None
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return None
+
+    if not reverse:
+        instance.sync_collection()
+    else:
+        article_ids = pk_set if pk_set is not None else instance.__dict__.pop(
+            '_cleared_article_ids', [])
+        for article in Article.objects.filter(pk__in=article_ids):
+            article.sync_collection()
+
+
+@receiver(post_save, sender=Journal, dispatch_uid='articletrack.models.journal_collection_post_save')
+def sync_journal_articles_collection(sender, instance, created, **kwargs):
+    """
+    Keeps the denormalized collection of articles when their journal
+    is moved to another collection.
+    """
+    if created:
+        return None
+
+    for article in Article.objects.filter(journals=instance).exclude(
+            collection=instance.collection_id):
+        article.sync_collection()
+
+
+@receiver(post_save, sender=Notice, dispatch_uid='articletrack.models.notice_post_save')
+def count_notice(sender, instance, created, **kwargs):
+    """
+    Keeps the notice counters and the error level of the checkin.
+
+    New notices are counted incrementally, while changed ones make the
+    checkin notices to be counted again.
+    """
+    if not created:
+        instance.checkin.update_notice_counters()
+        return None
+
+    status = instance.status.lower()
+    checkins = Checkin.objects.filter(pk=instance.checkin_id)
+    if status == 'error':
+        checkins.update(error_count=F('error_count') + 1, error_level='error')
+    elif status == 'warning':
+        checkins.update(warning_count=F('warning_count') + 1)
+        checkins.filter(error_level='ok').update(error_level='warning')
+    else:
+        return None
+
+    # updates skip the invalidation of the cached checkin.
+    Checkin.userobjects.invalidate(Checkin(pk=instance.checkin_id))
+
+
+@receiver(post_delete, sender=Notice, dispatch_uid='articletrack.models.notice_post_delete')
+def uncount_notice(sender, instance, **kwargs):
+    try:
+        checkin = Checkin.objects.get(pk=instance.checkin_id)
+    except Checkin.DoesNotExist:
+        # the checkin is being deleted along with its notices.
+        return None
+
+    checkin.update_notice_counters()
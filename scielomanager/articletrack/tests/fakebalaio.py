@@ -0,0 +1,134 @@
+# coding: utf-8
+"""
+Local HTTP and XML-RPC servers standing for Balaio in the tests.
+"""
+import time
+import threading
+import SocketServer
+import BaseHTTPServer
+import SimpleXMLRPCServer
+
+
+class FakeBalaioHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.server.request_headers.append(self.headers)
+
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        status, headers, body = self.server.routes.get(
+            self.path, (404, {}, 'not found'))
+        if callable(body):
+            body = body(self)
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ServerMixin(object):
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # connections dropped by the clients are expected
+        pass
+
+    def settings(self):
+        return {
+            'PROTOCOL': 'http',
+            'HOST': '127.0.0.1',
+            'PORT': str(self.port),
+            'PATH': '/api/v1/',
+        }
+
+
+class FakeBalaio(ServerMixin, SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Serves the ``routes`` mapping paths (with the querystring) to
+    ``(status, headers, body)``, after sleeping ``delay`` seconds.
+    Connections are kept alive.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), FakeBalaioHandler)
+        self.routes = {}
+        self.delay = 0
+        self.connections = 0
+        self.requests = []
+        self.request_headers = []
+
+
+class FakeBalaioRPCHandler(SimpleXMLRPCServer.SimpleXMLRPCRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # methods are served at /<PATH>/_rpc/<method>/ as well
+    rpc_paths = ()
+
+    def setup(self):
+        SimpleXMLRPCServer.SimpleXMLRPCRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeBalaioRPC(ServerMixin, SocketServer.ThreadingMixIn, SimpleXMLRPCServer.SimpleXMLRPCServer):
+    """
+    XML-RPC server with ``status`` and ``proceed_to_checkout``, which
+    fails for odd attempt ids. Calls are recorded at ``calls``; requests
+    at ``requests`` and can be delayed by ``delay`` seconds.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        SimpleXMLRPCServer.SimpleXMLRPCServer.__init__(self, ('127.0.0.1', 0),
+            requestHandler=FakeBalaioRPCHandler, logRequests=False)
+        self.connections = 0
+        self.requests = 0
+        self.delay = 0
+        self.calls = []
+
+        self.register_function(self.status, 'status')
+        self.register_function(self.proceed_to_checkout, 'proceed_to_checkout')
+        self.register_multicall_functions()
+
+    def _marshaled_dispatch(self, *args, **kwargs):
+        self.requests += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return SimpleXMLRPCServer.SimpleXMLRPCServer._marshaled_dispatch(self, *args, **kwargs)
+
+    def status(self):
+        self.calls.append(('status', ()))
+        return True
+
+    def proceed_to_checkout(self, attempt_id):
+        self.calls.append(('proceed_to_checkout', (attempt_id,)))
+        if int(attempt_id) % 2:
+            raise ValueError('attempt %s is not ready' % attempt_id)
+        return True
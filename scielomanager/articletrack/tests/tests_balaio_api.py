@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import unittest
 import json
+import socket
 import urlparse
 
 from django.conf import settings
@@ -8,6 +9,7 @@ from django.core.exceptions import ImproperlyConfigured
 import mocker
 
 from articletrack.balaio import BalaioAPI, BalaioRPC, SettingsMixin
+from .fakebalaio import FakeBalaio, FakeBalaioRPC
 
 
 class BalaioCheckSettingsTests(unittest.TestCase):
@@ -94,26 +96,56 @@ class SettingsMixinTests(unittest.TestCase):
             lambda: SettingsMixin().validate_settings('nonexisting'))
 
 
-class BalaioRequestsTests(mocker.MockerTestCase):
+class BalaioRequestsTests(unittest.TestCase):
 
-    def test_is_up(self):
-        balaio_api = BalaioAPI()
-        # response
-        mock_response = self.mocker.mock()
-        mock_response.getcode()
-        self.mocker.result(200)
+    def setUp(self):
+        from articletrack import balaio
 
-        # request
-        mock_request = self.mocker.replace('urllib2')
-        mock_request.urlopen("%sstatus/" % balaio_api.get_hostname(), timeout=mocker.ANY)
-        self.mocker.result(mock_response)
+        self.server = FakeBalaio()
+        self.server.start()
+        settings.API_BALAIO['fake'] = self.server.settings()
 
-        self.mocker.replay()
+        self._original_timeout = settings.API_BALAIO_DEFAULT_TIMEOUT
+        settings.API_BALAIO_DEFAULT_TIMEOUT = 0.5
+
+        balaio._pools.clear()
+        balaio._breakers.clear()
+
+    def tearDown(self):
+        from articletrack import balaio
+
+        for pool in balaio._pools.values():
+            pool.clear()
+        balaio._pools.clear()
+        balaio._breakers.clear()
+
+        settings.API_BALAIO_DEFAULT_TIMEOUT = self._original_timeout
+        del settings.API_BALAIO['fake']
+        self.server.stop()
+
+    def _make_client(self, failure_threshold=2, reset_timeout=30):
+        from articletrack import balaio
+
+        self.now = 1000.0
+        balaio_api = BalaioAPI(using='fake')
+        balaio_api.breaker = balaio.CircuitBreaker(failure_threshold, reset_timeout,
+                                                   clock=lambda: self.now)
+        return balaio_api
+
+    def test_is_up(self):
+        balaio_api = self._make_client()
+        self.server.routes['/status/'] = (200, {}, 'ok')
 
         self.assertTrue(balaio_api.is_up())
 
+    def test_is_up_when_server_is_down(self):
+        balaio_api = self._make_client()
+        self.server.stop()
+
+        self.assertFalse(balaio_api.is_up())
+
     def test_list_files_members_by_attempt(self):
-        balaio_api = BalaioAPI()
+        balaio_api = self._make_client()
         attempt_id = 25
         expected_json_response = {
             "xml": [
@@ -128,25 +160,8 @@ class BalaioRequestsTests(mocker.MockerTestCase):
             ],
             'error': False
         }
-
-        # response
-        mock_response = self.mocker.mock()
-
-        mock_response.getcode()
-        self.mocker.result(200)
-
-        mock_response.read(settings.API_BALAIO_DEFAULT_CHUNK_SIZE)
-        self.mocker.result(json.dumps(expected_json_response))
-
-        mock_response.read(settings.API_BALAIO_DEFAULT_CHUNK_SIZE)
-        self.mocker.result('')
-
-        # request
-        mock_request = self.mocker.replace('urllib2')
-        mock_request.urlopen('%sfiles/%s/' % (balaio_api.get_fullpath(), str(attempt_id)), timeout=mocker.ANY)
-        self.mocker.result(mock_response)
-
-        self.mocker.replay()
+        self.server.routes['/api/v1/files/%s/' % attempt_id] = (
+            200, {'Content-Type': 'application/json'}, json.dumps(expected_json_response))
 
         self.assertEqual(
             balaio_api.list_files_members_by_attempt(attempt_id),
@@ -154,28 +169,207 @@ class BalaioRequestsTests(mocker.MockerTestCase):
         )
 
     def test_list_files_unexistent_attempt_raise_error(self):
-        balaio_api = BalaioAPI()
+        balaio_api = self._make_client()
         invalid_attempt_id = 0
         expected_json_response = {'message': u'Error HTTP Not 200', 'error': True}
 
-        # response
-        mock_response = self.mocker.mock()
-
-        mock_response.getcode()
-        self.mocker.result(404)
-
-        # request
-        mock_request = self.mocker.replace('urllib2')
-        mock_request.urlopen('%sfiles/%s/' % (balaio_api.get_fullpath(), str(invalid_attempt_id)), timeout=mocker.ANY)
-        self.mocker.result(mock_response)
-
-        self.mocker.replay()
-
         self.assertEqual(
             balaio_api.list_files_members_by_attempt(invalid_attempt_id),
             expected_json_response
         )
 
+    def test_connections_are_reused(self):
+        balaio_api = self._make_client()
+        self.server.routes['/api/v1/files/1/'] = (200, {}, '{}')
+        self.server.routes['/api/v1/files/1/pkg.zip/?full=true'] = (200, {}, 'x' * 5000)
+
+        for i in range(3):
+            balaio_api.list_files_members_by_attempt(1)
+            self.assertEqual(''.join(balaio_api.get_full_package(1, 'pkg')), 'x' * 5000)
+        BalaioAPI(using='fake').list_files_members_by_attempt(1)
+
+        self.assertEqual(len(self.server.requests), 7)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_abandoned_responses_do_not_return_to_the_pool(self):
+        balaio_api = self._make_client()
+        self.server.routes['/api/v1/files/1/pkg.zip/?full=true'] = (200, {}, 'x' * 5000)
+
+        response = balaio_api.get_full_package(1, 'pkg')
+        response.next()
+        response.close()
+
+        self.assertEqual(''.join(balaio_api.get_full_package(1, 'pkg')), 'x' * 5000)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_circuit_opens_after_repeated_failures(self):
+        balaio_api = self._make_client(failure_threshold=2)
+        self.server.routes['/status/'] = (503, {}, 'down')
+
+        self.assertFalse(balaio_api.is_up())
+        self.assertEqual(balaio_api.breaker.state, 'closed')
+        self.assertFalse(balaio_api.is_up())
+        self.assertEqual(balaio_api.breaker.state, 'open')
+
+        # fails fast, without reaching the server
+        self.assertEqual(balaio_api.list_files_members_by_attempt(1)['message'],
+                         u'Balaio is unavailable')
+        self.assertEqual(len(self.server.requests), 2)
+
+        stats = balaio_api.breaker.stats()
+        self.assertEqual((stats['requests'], stats['failures'], stats['rejected']),
+                         (2, 2, 1))
+
+    def test_timeouts_count_as_failures(self):
+        balaio_api = self._make_client(failure_threshold=1)
+        self.server.routes['/status/'] = (200, {}, 'ok')
+        self.server.delay = 1
+
+        self.assertFalse(balaio_api.is_up())
+        self.assertEqual(balaio_api.breaker.state, 'open')
+
+    def test_half_open_circuit_lets_a_single_call_through(self):
+        balaio_api = self._make_client(failure_threshold=1, reset_timeout=30)
+        self.server.routes['/status/'] = (503, {}, 'down')
+        balaio_api.is_up()
+
+        self.now += 31
+
+        self.assertTrue(balaio_api.breaker.allow())
+        self.assertEqual(balaio_api.breaker.state, 'half-open')
+        self.assertFalse(balaio_api.breaker.allow())
+
+    def test_half_open_circuit_closes_on_success(self):
+        balaio_api = self._make_client(failure_threshold=1, reset_timeout=30)
+        self.server.routes['/status/'] = (503, {}, 'down')
+        balaio_api.is_up()
+
+        self.now += 31
+        self.server.routes['/status/'] = (200, {}, 'ok')
+
+        self.assertTrue(balaio_api.is_up())
+        self.assertEqual(balaio_api.breaker.state, 'closed')
+
+    def test_half_open_circuit_opens_again_on_failure(self):
+        balaio_api = self._make_client(failure_threshold=1, reset_timeout=30)
+        self.server.routes['/status/'] = (503, {}, 'down')
+        balaio_api.is_up()
+
+        self.now += 10
+        self.assertFalse(balaio_api.is_up())
+        self.assertEqual(len(self.server.requests), 1)
+
+        self.now += 21
+        self.assertFalse(balaio_api.is_up())
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(balaio_api.breaker.state, 'open')
+
+        self.now += 10
+        self.assertFalse(balaio_api.is_up())
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_half_open_circuit_opens_again_on_any_exception(self):
+        balaio_api = self._make_client(failure_threshold=1, reset_timeout=30)
+        self.server.routes['/status/'] = (503, {}, 'down')
+        balaio_api.is_up()
+
+        self.now += 31
+
+        def broken_request(*args, **kwargs):
+            raise RuntimeError('unexpected')
+
+        original_request = balaio_api.pool.request
+        balaio_api.pool.request = broken_request
+        try:
+            self.assertRaises(RuntimeError, balaio_api.is_up)
+        finally:
+            balaio_api.pool.request = original_request
+
+        self.assertEqual(balaio_api.breaker.state, 'open')
+
+
+class BalaioFilesCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        from django.core.cache.backends.locmem import LocMemCache
+        from articletrack import balaio
+
+        self.server = FakeBalaio()
+        self.server.start()
+        settings.API_BALAIO['fake'] = self.server.settings()
+        self.server.routes['/api/v1/files/25/'] = (200, {}, json.dumps({'xml': ['a.xml']}))
+
+        self._original_cache = balaio.cache
+        balaio.cache = LocMemCache('balaio', {})
+        balaio.cache.clear()
+
+        balaio._pools.clear()
+        balaio._breakers.clear()
+
+    def tearDown(self):
+        from articletrack import balaio
+
+        balaio.cache = self._original_cache
+        for pool in balaio._pools.values():
+            pool.clear()
+        balaio._pools.clear()
+        balaio._breakers.clear()
+
+        del settings.API_BALAIO['fake']
+        self.server.stop()
+
+    def test_listings_are_fetched_once(self):
+        for i in range(3):
+            files = BalaioAPI(using='fake').list_files_members_by_attempt(25)
+
+        self.assertEqual(files, {'xml': ['a.xml'], 'error': False})
+        self.assertEqual(self.server.requests, ['/api/v1/files/25/'])
+
+    def test_failures_are_cached_for_a_short_time(self):
+        from articletrack import balaio
+
+        BalaioAPI(using='fake').list_files_members_by_attempt(0)
+        files = BalaioAPI(using='fake').list_files_members_by_attempt(0)
+
+        self.assertTrue(files['error'])
+        self.assertEqual(len(self.server.requests), 1)
+
+        timeouts = []
+        original_set = balaio.cache.set
+        balaio.cache.set = lambda key, value, timeout: timeouts.append(timeout)
+        try:
+            balaio_api = BalaioAPI(using='fake')
+            balaio_api.purge_files_members_by_attempt(0)
+            balaio_api.list_files_members_by_attempt(0)
+            balaio_api.list_files_members_by_attempt(25)
+        finally:
+            balaio.cache.set = original_set
+
+        self.assertEqual(timeouts, [balaio.API_BALAIO_FILES_NEGATIVE_CACHE_TIMEOUT,
+                                    balaio.API_BALAIO_FILES_CACHE_TIMEOUT])
+
+    def test_purge(self):
+        balaio_api = BalaioAPI(using='fake')
+        balaio_api.list_files_members_by_attempt(25)
+
+        balaio_api.purge_files_members_by_attempt(25)
+        balaio_api.list_files_members_by_attempt(25)
+
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_purge_command(self):
+        import StringIO
+        from django.core.management import call_command
+
+        balaio_api = BalaioAPI(using='fake')
+        balaio_api.list_files_members_by_attempt(25)
+
+        call_command('purge_balaio_files_cache', '25', using='fake',
+                     stdout=StringIO.StringIO())
+        balaio_api.list_files_members_by_attempt(25)
+
+        self.assertEqual(len(self.server.requests), 2)
+
 
 class BalaioAPIRequestsTests(mocker.MockerTestCase):
     def test_valid_remote_call_without_args(self):
@@ -189,7 +383,7 @@ class BalaioAPIRequestsTests(mocker.MockerTestCase):
         mock_client.server_path
         self.mocker.result('http://domain.com:8086/api/v1/_rpc/')
 
-        mock_client._xmlrpclib.ServerProxy('http://domain.com:8086/api/v1/_rpc/foo/')
+        mock_client._xmlrpclib.ServerProxy('http://domain.com:8086/api/v1/_rpc/foo/', transport=mocker.ANY)
         self.mocker.result(mock_serverproxy)
 
         self.mocker.replay()
@@ -207,7 +401,7 @@ class BalaioAPIRequestsTests(mocker.MockerTestCase):
         mock_client.server_path
         self.mocker.result('http://domain.com:8086/api/v1/_rpc/')
 
-        mock_client._xmlrpclib.ServerProxy('http://domain.com:8086/api/v1/_rpc/foo/')
+        mock_client._xmlrpclib.ServerProxy('http://domain.com:8086/api/v1/_rpc/foo/', transport=mocker.ANY)
         self.mocker.result(mock_serverproxy)
 
         self.mocker.replay()
@@ -260,3 +454,108 @@ class BalaioAPIRequestsTests(mocker.MockerTestCase):
 
         self.assertFalse(client.is_up())
 
+
+class BalaioRPCTransportTests(unittest.TestCase):
+
+    def setUp(self):
+        from articletrack import balaio
+
+        self.server = FakeBalaioRPC()
+        self.server.start()
+        settings.API_BALAIO['fake'] = self.server.settings()
+
+        self._original_timeout = settings.API_BALAIO_DEFAULT_TIMEOUT
+        settings.API_BALAIO_DEFAULT_TIMEOUT = 0.5
+        balaio._rpc_transports.transports = {}
+
+    def tearDown(self):
+        from articletrack import balaio
+
+        for transport in balaio._rpc_transports.transports.values():
+            transport.close()
+        balaio._rpc_transports.transports = {}
+
+        settings.API_BALAIO_DEFAULT_TIMEOUT = self._original_timeout
+        del settings.API_BALAIO['fake']
+        self.server.stop()
+
+    def test_connection_is_kept_alive(self):
+        for i in range(3):
+            self.assertTrue(BalaioRPC(using='fake').is_up())
+
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_non_idempotent_calls_use_a_fresh_connection(self):
+        client = BalaioRPC(using='fake')
+        client.is_up()
+        client.call('proceed_to_checkout', [2])
+        client.is_up()
+
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_closed_connections_are_retried(self):
+        from articletrack import balaio
+
+        client = BalaioRPC(using='fake')
+        client.is_up()
+        # the server drops the idle connection
+        transport = balaio.get_rpc_transport(client.conf)
+        transport._connection[1].sock.shutdown(socket.SHUT_RDWR)
+
+        self.assertTrue(client.is_up())
+        self.assertEqual(self.server.connections, 2)
+
+    def test_sent_requests_are_only_retried_for_idempotent_methods(self):
+        import httplib
+        import xmlrpclib
+        from articletrack import balaio
+
+        class DroppingTransport(balaio.KeepAliveTransport):
+            # the connection is dropped once the request is sent.
+            def single_request(self, host, handler, request_body, verbose=0):
+                self.requests.append(xmlrpclib.loads(request_body)[1])
+                self._sent = True
+                raise httplib.BadStatusLine('')
+
+        transport = DroppingTransport('http', timeout=0.5, retries=1)
+        transport.requests = []
+
+        for method in ['proceed_to_checkout', 'status']:
+            self.assertRaises(httplib.HTTPException, transport.request,
+                '127.0.0.1', '/', xmlrpclib.dumps((2,), method))
+
+        self.assertEqual(transport.requests,
+                         ['proceed_to_checkout', 'status', 'status'])
+
+    def test_timeouts(self):
+        self.server.delay = 1
+
+        self.assertFalse(BalaioRPC(using='fake').is_up())
+
+    def test_is_up_when_server_is_down(self):
+        self.server.stop()
+        self.server.stop = lambda: None
+
+        self.assertFalse(BalaioRPC(using='fake').is_up())
+
+    def test_multicall_is_a_single_round_trip(self):
+        import xmlrpclib
+
+        results = BalaioRPC(using='fake').multicall([
+            ('status', []),
+            ('proceed_to_checkout', [2]),
+            ('proceed_to_checkout', [3]),
+        ])
+
+        self.assertEqual(results[:2], [True, True])
+        self.assertTrue(isinstance(results[2], xmlrpclib.Fault))
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(len(self.server.calls), 3)
+
+    def test_proceed_to_checkout(self):
+        outcomes = BalaioRPC(using='fake').proceed_to_checkout([2, 3, 4])
+
+        self.assertEqual(outcomes, {2: True, 3: False, 4: True})
+        self.assertEqual(self.server.requests, 1)
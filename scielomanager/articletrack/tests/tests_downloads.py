@@ -0,0 +1,160 @@
+# coding: utf-8
+import os
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+from django.conf import settings
+from django.test.client import RequestFactory
+
+from articletrack import balaio, downloads
+from articletrack.balaio import BalaioAPI
+from .fakebalaio import FakeBalaio
+
+
+PACKAGE = ''.join(chr(i % 256) for i in range(10000))
+PACKAGE_PATH = '/api/v1/files/1/pkg.zip/?full=true'
+
+
+class ParseRangeTests(unittest.TestCase):
+
+    def test_no_range(self):
+        self.assertIsNone(downloads.parse_range(None, 100))
+
+    def test_closed_range(self):
+        self.assertEqual(downloads.parse_range('bytes=10-19', 100), (10, 19))
+
+    def test_open_range(self):
+        self.assertEqual(downloads.parse_range('bytes=10-', 100), (10, 99))
+
+    def test_suffix_range(self):
+        self.assertEqual(downloads.parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(downloads.parse_range('bytes=-1000', 100), (0, 99))
+
+    def test_range_beyond_the_end_is_truncated(self):
+        self.assertEqual(downloads.parse_range('bytes=90-1000', 100), (90, 99))
+
+    def test_unsupported_ranges_are_ignored(self):
+        for header in ['bytes=0-1,5-6', 'items=0-1', 'bytes=5-1', 'bytes=-']:
+            self.assertIsNone(downloads.parse_range(header, 100))
+
+    def test_unsatisfiable_ranges(self):
+        for header in ['bytes=100-', 'bytes=-0']:
+            self.assertRaises(downloads.RangeNotSatisfiable,
+                              downloads.parse_range, header, 100)
+
+
+class ServeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeBalaio()
+        self.server.start()
+        self.server.routes[PACKAGE_PATH] = (200, {'ETag': '"v1"'}, PACKAGE)
+        settings.API_BALAIO['fake'] = self.server.settings()
+
+        balaio._pools.clear()
+        balaio._breakers.clear()
+
+        self.directory = tempfile.mkdtemp()
+        self.cache = downloads.PackageCache(self.directory, max_size=25000)
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        for pool in balaio._pools.values():
+            pool.clear()
+        balaio._pools.clear()
+        balaio._breakers.clear()
+
+        del settings.API_BALAIO['fake']
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def _serve(self, cache=None, key='full:1:pkg', **headers):
+        balaio_api = BalaioAPI(using='fake')
+        url = balaio_api.get_full_package_url(1, 'pkg')
+        request = self.factory.get('/', **headers)
+        return downloads.serve(request, balaio_api, url, key, 'pkg', cache=cache)
+
+    def test_content_length_and_etag_are_forwarded(self):
+        response = self._serve()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], '10000')
+        self.assertEqual(response['ETag'], '"v1"')
+        self.assertEqual(response.content, PACKAGE)
+
+    def test_ranges_are_forwarded(self):
+        self.server.routes[PACKAGE_PATH] = (206,
+            {'Content-Range': 'bytes 100-199/10000'}, PACKAGE[100:200])
+
+        response = self._serve(HTTP_RANGE='bytes=100-199', HTTP_IF_RANGE='"v1"')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/10000')
+        self.assertEqual(response.content, PACKAGE[100:200])
+        self.assertEqual(self.server.request_headers[0]['Range'], 'bytes=100-199')
+        self.assertEqual(self.server.request_headers[0]['If-Range'], '"v1"')
+
+    def test_unavailable_balaio(self):
+        self.server.stop()
+        self.assertRaises(ValueError, self._serve)
+        # the server is stopped only once
+        self.server.stop = lambda: None
+
+    def test_complete_packages_are_served_from_the_disk(self):
+        self.assertEqual(self._serve(cache=self.cache).content, PACKAGE)
+
+        response = self._serve(cache=self.cache)
+
+        self.assertEqual(response.content, PACKAGE)
+        self.assertEqual(response['Content-Length'], '10000')
+        self.assertEqual(response['ETag'], '"v1"')
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_ranges_of_stored_packages(self):
+        self._serve(cache=self.cache).content
+
+        response = self._serve(cache=self.cache, HTTP_RANGE='bytes=9000-')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 9000-9999/10000')
+        self.assertEqual(response['Content-Length'], '1000')
+        self.assertEqual(response.content, PACKAGE[9000:])
+
+    def test_stale_if_range_gets_the_whole_package(self):
+        self._serve(cache=self.cache).content
+
+        response = self._serve(cache=self.cache, HTTP_RANGE='bytes=9000-',
+                               HTTP_IF_RANGE='"v0"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, PACKAGE)
+
+    def test_unsatisfiable_range_of_stored_packages(self):
+        self._serve(cache=self.cache).content
+
+        response = self._serve(cache=self.cache, HTTP_RANGE='bytes=10000-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10000')
+
+    def test_interrupted_downloads_are_not_stored(self):
+        response = self._serve(cache=self.cache)
+        chunks = iter(response)
+        chunks.next()
+        chunks.close()
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_least_recently_used_packages_are_removed(self):
+        for key in ['a', 'b', 'c']:
+            self._serve(cache=self.cache, key=key).content
+            os.utime(self.cache._path(key), (0, {'a': 100, 'b': 300, 'c': 200}[key]))
+
+        self._serve(cache=self.cache, key='d').content
+
+        stored = sorted(name for name in os.listdir(self.directory) if name.endswith('.zip'))
+        self.assertEqual(stored, sorted(hashlib.sha1(key).hexdigest() + '.zip'
+                                        for key in ['b', 'd']))
+        self.assertEqual(len(os.listdir(self.directory)), 4)
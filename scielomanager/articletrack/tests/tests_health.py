@@ -0,0 +1,138 @@
+# coding: utf-8
+import json
+import unittest
+
+from waffle import Flag
+from django_webtest import WebTest
+from django_factory_boy import auth
+from django.core.urlresolvers import reverse
+from django.core.cache.backends.locmem import LocMemCache
+
+from articletrack import health
+from .tests_pages import _makePermission
+
+
+class FakeMonitor(health.HealthMonitor):
+
+    def __init__(self, outcomes, **kwargs):
+        super(FakeMonitor, self).__init__(**kwargs)
+        self.outcomes = outcomes
+        self.checks = 0
+
+    def get_probes(self):
+        self.checks += 1
+
+        def check(name):
+            outcome = self.outcomes[name]
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        return dict((name, lambda name=name: check(name)) for name in self.outcomes)
+
+
+class HealthMonitorTests(unittest.TestCase):
+
+    def setUp(self):
+        self._original_cache = health.cache
+        health.cache = LocMemCache('health', {})
+        health.cache.clear()
+
+    def tearDown(self):
+        health.cache = self._original_cache
+
+    def test_check_publishes_the_snapshot(self):
+        monitor = FakeMonitor({'api': True, 'rpc': False})
+        snapshot = monitor.check()
+
+        self.assertEqual(health.get_status(), snapshot)
+        self.assertTrue(snapshot['api']['is_up'])
+        self.assertFalse(snapshot['rpc']['is_up'])
+        self.assertEqual(len(snapshot['api']['history']), 1)
+
+    def test_exceptions_are_taken_as_down(self):
+        monitor = FakeMonitor({'api': IOError(), 'rpc': True})
+
+        self.assertFalse(monitor.check()['api']['is_up'])
+
+    def test_history_is_bounded(self):
+        monitor = FakeMonitor({'api': True, 'rpc': True}, history_size=3)
+        for i in range(3):
+            monitor.check()
+        monitor.outcomes['api'] = False
+        snapshot = monitor.check()
+
+        self.assertEqual([entry[1] for entry in snapshot['api']['history']],
+                         [True, True, False])
+        self.assertAlmostEqual(snapshot['api']['uptime'], 2 / 3.0)
+
+    def test_run_once(self):
+        monitor = FakeMonitor({'api': True, 'rpc': True})
+        monitor.run(once=True)
+
+        self.assertEqual(monitor.checks, 1)
+        self.assertIsNotNone(health.get_status())
+
+    def test_current_status_does_not_check_when_there_is_a_snapshot(self):
+        FakeMonitor({'api': True, 'rpc': True}).check()
+        original_check = health.HealthMonitor.check
+        health.HealthMonitor.check = lambda self: self.fail('checked')
+        try:
+            self.assertTrue(health.current_status()['api']['is_up'])
+        finally:
+            health.HealthMonitor.check = original_check
+
+    def test_current_status_is_unknown_without_a_snapshot(self):
+        original_check = health.HealthMonitor.check
+        health.HealthMonitor.check = lambda self: self.fail('checked')
+        try:
+            status = health.current_status()
+        finally:
+            health.HealthMonitor.check = original_check
+
+        self.assertIsNone(status['checked_at'])
+        self.assertIsNone(status['api']['is_up'])
+        self.assertIsNone(status['rpc']['is_up'])
+
+
+class BalaioStatusViewsTests(WebTest):
+
+    def setUp(self):
+        self._original_cache = health.cache
+        health.cache = LocMemCache('health', {})
+        health.cache.clear()
+        FakeMonitor({'api': True, 'rpc': False}).check()
+
+        Flag.objects.create(name='articletrack', authenticated=True)
+        self.user = auth.UserF(is_active=True)
+        self.user.user_permissions.add(
+            _makePermission(perm='list_ticket', model='ticket'))
+
+    def tearDown(self):
+        health.cache = self._original_cache
+
+    def test_api_status_comes_from_the_snapshot(self):
+        response = self.app.get(reverse('get_balaio_api_is_up'), user=self.user,
+                                headers={'X-Requested-With': 'XMLHttpRequest'})
+
+        self.assertEqual(json.loads(response.body), {'is_up': True})
+
+    def test_rpc_status_comes_from_the_snapshot(self):
+        response = self.app.get(reverse('ajx.ajx_verify_status_rpc'), user=self.user,
+                                headers={'X-Requested-With': 'XMLHttpRequest'})
+
+        self.assertEqual(json.loads(response.body), {'rpc_status': False})
+
+    def test_api_status_is_unknown_without_a_snapshot(self):
+        health.cache.clear()
+        response = self.app.get(reverse('get_balaio_api_is_up'), user=self.user,
+                                headers={'X-Requested-With': 'XMLHttpRequest'})
+
+        self.assertEqual(json.loads(response.body), {'is_up': None})
+
+    def test_health(self):
+        response = self.app.get(reverse('get_balaio_health'), user=self.user)
+        status = json.loads(response.body)
+
+        self.assertTrue(status['api']['is_up'])
+        self.assertEqual(len(status['rpc']['history']), 1)
@@ -61,6 +61,88 @@ class CheckinTests(TestCase):
         self.assertFalse(checkin.is_accepted())
 
 
+class CheckinNoticeCountersTests(TestCase):
+
+    def _get_checkin(self, checkin):
+        return models.Checkin.objects.get(pk=checkin.pk)
+
+    def test_new_checkins_are_ok(self):
+        checkin = modelfactories.CheckinFactory()
+
+        self.assertEqual(self._get_checkin(checkin).get_error_level, 'ok')
+
+    def test_notices_are_counted_as_they_are_created(self):
+        checkin = modelfactories.CheckinFactory()
+
+        modelfactories.NoticeFactory(checkin=checkin, status='WARNING')
+        self.assertEqual(self._get_checkin(checkin).get_error_level, 'warning')
+
+        modelfactories.NoticeFactory(checkin=checkin, status='error')
+        modelfactories.NoticeFactory(checkin=checkin, status='Warning')
+        modelfactories.NoticeFactory(checkin=checkin, status='ok')
+
+        checkin = self._get_checkin(checkin)
+        self.assertEqual(checkin.error_count, 1)
+        self.assertEqual(checkin.warning_count, 2)
+        self.assertEqual(checkin.get_error_level, 'error')
+
+    def test_notices_are_counted_again_when_changed_or_deleted(self):
+        checkin = modelfactories.CheckinFactory()
+        error = modelfactories.NoticeFactory(checkin=checkin, status='error')
+        modelfactories.NoticeFactory(checkin=checkin, status='warning')
+
+        error.status = 'ok'
+        error.save()
+        self.assertEqual(self._get_checkin(checkin).get_error_level, 'warning')
+
+        checkin.notices.all().delete()
+        self.assertEqual(self._get_checkin(checkin).get_error_level, 'ok')
+
+    def test_error_level_costs_no_queries(self):
+        checkin = modelfactories.CheckinFactory()
+        modelfactories.NoticeFactory(checkin=checkin, status='error')
+        checkin = self._get_checkin(checkin)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(checkin.get_error_level, 'error')
+
+    def test_filtering_by_error_level(self):
+        checkin = modelfactories.CheckinFactory()
+        modelfactories.CheckinFactory(article=checkin.article)
+        modelfactories.NoticeFactory(checkin=checkin, status='error')
+        collection = checkin.article.journals.all()[0].collection
+
+        checkins = models.Checkin.userobjects.active(
+            get_active_collection=lambda: collection).error_level('error')
+
+        self.assertEqual(list(checkins), [checkin])
+
+    def test_cached_checkins_are_invalidated(self):
+        checkin = modelfactories.CheckinFactory()
+        invalidated = []
+
+        original_invalidate = models.Checkin.userobjects.invalidate
+        models.Checkin.userobjects.invalidate = lambda *objects: invalidated.extend(
+            obj.pk for obj in objects)
+        try:
+            notice = modelfactories.NoticeFactory(checkin=checkin, status='error')
+            notice.status = 'ok'
+            notice.save()
+            checkin.accept(auth.UserF(is_active=True))
+        finally:
+            models.Checkin.userobjects.invalidate = original_invalidate
+
+        self.assertEqual(invalidated, [checkin.pk] * 3)
+
+    def test_accepting_keeps_the_counters(self):
+        checkin = modelfactories.CheckinFactory()
+        modelfactories.NoticeFactory(checkin=checkin, status='warning')
+
+        checkin.accept(auth.UserF(is_active=True))
+
+        self.assertEqual(self._get_checkin(checkin).warning_count, 1)
+
+
 class ArticleTests(TestCase):
 
     def test_is_accepted_method_with_accepted_checkins(self):
@@ -81,3 +163,73 @@ class ArticleTests(TestCase):
 
         self.assertFalse(article.is_accepted())
 
+
+
+class ArticleCollectionTests(TestCase):
+
+    def test_binding_a_journal_sets_the_collection(self):
+        article = modelfactories.ArticleFactory.create()
+        journal = article.journals.all()[0]
+
+        self.assertEqual(models.Article.objects.get(pk=article.pk).collection,
+                         journal.collection)
+
+    def test_checkins_and_tickets_take_the_article_collection(self):
+        checkin = modelfactories.CheckinFactory.create()
+        ticket = modelfactories.TicketFactory.create(article=checkin.article)
+        collection = checkin.article.journals.all()[0].collection
+
+        self.assertEqual(models.Checkin.objects.get(pk=checkin.pk).collection, collection)
+        self.assertEqual(models.Ticket.objects.get(pk=ticket.pk).collection, collection)
+
+    def test_unbinding_journals_clears_the_collection(self):
+        checkin = modelfactories.CheckinFactory.create()
+
+        checkin.article.journals.clear()
+
+        self.assertIsNone(models.Article.objects.get(pk=checkin.article.pk).collection)
+        self.assertIsNone(models.Checkin.objects.get(pk=checkin.pk).collection)
+
+    def test_binding_from_the_journal_side(self):
+        from journalmanager.tests.modelfactories import JournalFactory
+
+        checkin = modelfactories.CheckinFactory.create()
+        checkin.article.journals.clear()
+        journal = JournalFactory.create()
+
+        journal.checkin_articles.add(checkin.article)
+
+        self.assertEqual(models.Checkin.objects.get(pk=checkin.pk).collection,
+                         journal.collection)
+
+    def test_moving_the_journal_to_another_collection(self):
+        from journalmanager.tests.modelfactories import CollectionFactory
+
+        checkin = modelfactories.CheckinFactory.create()
+        journal = checkin.article.journals.all()[0]
+        collection = CollectionFactory.create()
+
+        journal.collection = collection
+        journal.save()
+
+        self.assertEqual(models.Checkin.objects.get(pk=checkin.pk).collection, collection)
+
+    def test_backfill_command(self):
+        import StringIO
+        from django.core.management import call_command
+
+        checkin = modelfactories.CheckinFactory.create()
+        ticket = modelfactories.TicketFactory.create(article=checkin.article)
+        collection = checkin.article.journals.all()[0].collection
+        models.Article.objects.update(collection=None)
+        models.Checkin.objects.update(collection=None)
+        models.Ticket.objects.update(collection=None)
+
+        stdout = StringIO.StringIO()
+        call_command('sync_articletrack_collections', benchmark=True, repeat=1,
+                     stdout=stdout)
+
+        self.assertEqual(models.Article.objects.get(pk=checkin.article.pk).collection, collection)
+        self.assertEqual(models.Checkin.objects.get(pk=checkin.pk).collection, collection)
+        self.assertEqual(models.Ticket.objects.get(pk=ticket.pk).collection, collection)
+        self.assertIn('join+distinct', stdout.getvalue())
@@ -182,3 +182,35 @@ class NoticeListTests(WebTest):
         #response.mustcontain('<a href="/arttrack/">List of check ins</a>')
         response.mustcontain('<a href="/arttrack/"><i class="icon-chevron-left"></i> List of Articles in submission</a>')
 
+
+
+class CheckoutAjaxTests(WebTest):
+
+    def setUp(self):
+        Flag.objects.create(name='articletrack', authenticated=True)
+        self.user = auth.UserF(is_active=True)
+
+    def test_invalid_checkin_ids(self):
+        response = self.app.get(
+            reverse('ajx.ajx_set_attempts_proceed_to_checkout') + '?checkin=1&checkin=foo',
+            user=self.user, headers={'X-Requested-With': 'XMLHttpRequest'}, status=400)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_rpc_errors_are_answered_as_json(self):
+        import socket
+        from articletrack import views
+
+        def failing_call(self, method, args=()):
+            raise socket.error('connection reset by peer')
+
+        original_call = views.BalaioRPC.call
+        views.BalaioRPC.call = failing_call
+        try:
+            response = self.app.get(
+                reverse('ajx.ajx_set_attempt_proceed_to_checkout', args=[2, 1]),
+                user=self.user, headers={'X-Requested-With': 'XMLHttpRequest'}, status=503)
+        finally:
+            views.BalaioRPC.call = original_call
+
+        self.assertTrue(response.json['error'])
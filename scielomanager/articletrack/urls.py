@@ -18,6 +18,7 @@ urlpatterns = patterns('',
 
     # BALAIO API
     url(r'^balaio_api/is_up/$', views.get_balaio_api_is_up, name="get_balaio_api_is_up"),
+    url(r'^balaio_api/health/$', views.get_balaio_health, name="get_balaio_health"),
     url(r'^balaio_api/full_package/(?P<attempt_id>\d+)/(?P<target_name>.+)/$',
     	views.get_balaio_api_full_package,
     	name="get_balaio_api_full_package"
@@ -32,4 +33,6 @@ urlpatterns = patterns('',
         name="ajx.ajx_set_attempt_proceed_to_checkout"),
    url(r'^ajx/ajx2/$', views.ajx_verify_status_rpc,
         name="ajx.ajx_verify_status_rpc"),
+   url(r'^ajx/ajx3/$', views.ajx_set_attempts_proceed_to_checkout,
+        name="ajx.ajx_set_attempts_proceed_to_checkout"),
 )
@@ -1,6 +1,9 @@
 import datetime
 import json
+import socket
+import httplib
 import logging
+import xmlrpclib
 
 from waffle.decorators import waffle_flag
 from django.shortcuts import render_to_response, get_object_or_404
@@ -16,6 +19,8 @@ from django.template.defaultfilters import slugify
 
 from scielomanager.tools import get_paginated, get_referer_view
 from . import models
+from . import downloads
+from . import health
 from .forms import CommentMessageForm, TicketForm
 from .balaio import BalaioAPI, BalaioRPC
 
@@ -96,8 +101,9 @@ def notice_detail(request, checkin_id):
 
         files = balaio.list_files_members_by_attempt(checkin.attempt_ref)
         if files and not files['error']:
-            del files['error']
             for file_extension in files.keys():
+                if file_extension == 'error':
+                    continue
                 files_list += [{'ext': file_extension, 'name': f} for f in files[file_extension]]
 
     except ValueError:
@@ -284,10 +290,9 @@ def comment_edit(request, comment_id, template_name='articletrack/comment_edit.h
 @permission_required('articletrack.list_ticket', login_url=AUTHZ_REDIRECT_URL)
 def get_balaio_api_is_up(request):
 
-    balaio = BalaioAPI()
-    is_up = balaio.is_up()
+    status = health.current_status()
     context = {
-        'is_up': is_up,
+        'is_up': status['api']['is_up'],
     }
 
     if request.is_ajax():
@@ -301,14 +306,12 @@ def get_balaio_api_is_up(request):
 @permission_required('articletrack.list_ticket', login_url=AUTHZ_REDIRECT_URL)
 def get_balaio_api_full_package(request, attempt_id, target_name):
     balaio = BalaioAPI()
+    url = balaio.get_full_package_url(attempt_id, target_name)
+    key = (u'full:%s:%s' % (attempt_id, target_name)).encode('utf-8')
     try:
-        balaio_response = balaio.get_full_package(attempt_id, target_name)
+        return downloads.serve(request, balaio, url, key, target_name)
     except ValueError:
-        return HttpResponse(status_code=503)
-    else:
-        view_response = HttpResponse(balaio_response, content_type='application/zip')
-        view_response['Content-Disposition'] = 'attachment; filename="%s.ZIP"' % target_name
-        return view_response
+        return HttpResponse(status=503)
 
 
 @waffle_flag('articletrack')
@@ -318,18 +321,22 @@ def get_balaio_api_files_members(request, attempt_id, target_name):
 
     qs_files = request.GET.getlist('file')
     if qs_files:
+        url = balaio.get_files_members_by_attempt_url(attempt_id, target_name, qs_files)
+        key = u'files:%s:%s:%s' % (attempt_id, target_name, '&'.join(sorted(qs_files)))
         try:
-            balaio_response = balaio.get_files_members_by_attempt(attempt_id, target_name, qs_files)
+            return downloads.serve(request, balaio, url, key.encode('utf-8'), target_name)
         except ValueError:
-            return HttpResponse(status_code=503)
-        else:
-            view_response = HttpResponse(balaio_response, content_type='application/zip')
-            view_response['Content-Disposition'] = 'attachment; filename="%s.ZIP"' % target_name
-            return view_response
+            return HttpResponse(status=503)
     else:
         return HttpResponseBadRequest()
 
 
+def _rpc_error_response(error):
+    logger.error('Balaio RPC call has failed: %s' % error)
+    return HttpResponse(json.dumps({'error': True, 'message': unicode(error)}),
+                        status=503, mimetype="application/json")
+
+
 @waffle_flag('articletrack')
 @login_required
 def ajx_set_attempt_proceed_to_checkout(request, attempt_id, checkin_id):
@@ -340,7 +347,10 @@ def ajx_set_attempt_proceed_to_checkout(request, attempt_id, checkin_id):
         return HttpResponse(status=400)
 
     rpc_client = BalaioRPC()
-    rpc_response = rpc_client.call('proceed_to_checkout', [attempt_id,])
+    try:
+        rpc_response = rpc_client.call('proceed_to_checkout', [attempt_id,])
+    except (socket.error, httplib.HTTPException, xmlrpclib.Error) as e:
+        return _rpc_error_response(e)
 
     #if the response is True, the checkin must be marked as accepted
     if rpc_response:
@@ -354,6 +364,49 @@ def ajx_set_attempt_proceed_to_checkout(request, attempt_id, checkin_id):
     return HttpResponse(json.dumps(rpc_response), mimetype="application/json")
 
 
+@waffle_flag('articletrack')
+@login_required
+def ajx_set_attempts_proceed_to_checkout(request):
+    """
+    View function responsible for mark the attempts of many checkins to
+    checkout process, with a single remote call. The checkins are given
+    by the ``checkin`` querystring parameter, repeated.
+    """
+    if not request.is_ajax():
+        return HttpResponse(status=400)
+
+    try:
+        checkin_ids = [int(checkin_id) for checkin_id in request.GET.getlist('checkin')]
+    except ValueError:
+        return HttpResponse(status=400)
+
+    checkins = models.Checkin.userobjects.active().filter(
+        pk__in=checkin_ids).select_related('article')
+    if len(checkins) != len(set(checkin_ids)):
+        raise Http404
+
+    rpc_client = BalaioRPC()
+    try:
+        outcomes = rpc_client.proceed_to_checkout(
+            [checkin.attempt_ref for checkin in checkins])
+    except (socket.error, httplib.HTTPException, xmlrpclib.Error) as e:
+        return _rpc_error_response(e)
+
+    accepted = {}
+    for checkin in checkins:
+        accepted[checkin.pk] = outcomes[checkin.attempt_ref]
+        if not accepted[checkin.pk]:
+            continue
+
+        try:
+            checkin.accept(request.user)
+        except ValueError as e:
+            logger.info('Could not mark %s as accepted. Traceback: %s' % (checkin, e))
+            accepted[checkin.pk] = False
+
+    return HttpResponse(json.dumps(accepted), mimetype="application/json")
+
+
 @waffle_flag('articletrack')
 @login_required
 def ajx_verify_status_rpc(request):
@@ -363,7 +416,18 @@ def ajx_verify_status_rpc(request):
     if not request.is_ajax():
         return HttpResponse(status=400)
 
-    rpc_client = BalaioRPC()
-    return HttpResponse(json.dumps({'rpc_status': rpc_client.is_up()}),
+    status = health.current_status()
+    return HttpResponse(json.dumps({'rpc_status': status['rpc']['is_up']}),
         mimetype="application/json")
 
+
+@waffle_flag('articletrack')
+@permission_required('articletrack.list_ticket', login_url=AUTHZ_REDIRECT_URL)
+def get_balaio_health(request):
+    """
+    View function responsible for the last status of the Balaio services,
+    with their latency history.
+    """
+    return HttpResponse(json.dumps(health.current_status()),
+        content_type='application/json; charset=UTF-8')
+
@@ -0,0 +1,128 @@
+# coding: utf-8
+"""
+Batch generation of markup files bundles, for the issues of a collection
+or of some journals, within a range of publication years.
+"""
+import os
+import json
+import time
+import itertools
+import multiprocessing
+from datetime import datetime
+
+from django.db import connection
+from django.core.cache import cache
+from caching import invalidation
+
+from journalmanager import models as jm_models
+from . import bundle, markupfile
+
+
+def select_issues(collection=None, journals=None, year_from=None, year_to=None):
+    """
+    Returns the available issues to be exported.
+    """
+    issues = jm_models.Issue.objects.available().select_related('journal')
+
+    if collection is not None:
+        issues = issues.filter(journal__collection=collection)
+
+    if journals is not None:
+        issues = issues.filter(journal__in=journals)
+
+    if year_from:
+        issues = issues.filter(publication_year__gte=year_from)
+
+    if year_to:
+        issues = issues.filter(publication_year__lte=year_to)
+
+    return issues.order_by('journal__title', 'publication_year', 'order')
+
+
+def export_issue(issue_pk):
+    """
+    Generates the bundle of the issue ``issue_pk``, and returns its entry
+    on the manifest.
+    """
+    start = time.time()
+    entry = {'issue': issue_pk, 'bundle_url': None, 'error': None}
+
+    try:
+        issue = jm_models.Issue.objects.select_related('journal').get(pk=issue_pk)
+        entry['journal'] = issue.journal.pk
+        entry['label'] = u'%s %s %s' % (issue.journal.acronym,
+                                        issue.publication_year, issue.label)
+        entry['bundle_url'] = markupfile.generate(issue.journal, issue)
+    except Exception as exc:
+        entry['error'] = unicode(exc)
+
+    entry['seconds'] = round(time.time() - start, 3)
+    return entry
+
+
+def reset_connections():
+    """
+    Closes the database and cache connections, so that they are not
+    shared between the processes of the pool, which open their own.
+    """
+    connection.close()
+
+    for backend in set([cache, invalidation.cache]):
+        if hasattr(backend, 'close'):
+            backend.close()
+
+
+def export_issues(issue_pks, processes=None, callback=None):
+    """
+    Generates the bundles of ``issue_pks`` in a pool of ``processes``
+    (the number of CPUs by default) and returns the manifest entries,
+    in the order they are done.
+
+    ``callback(entry, done, total)`` is called as each issue is done.
+    With ``processes=1`` the bundles are generated in this process.
+    """
+    issue_pks = list(issue_pks)
+    pool = None
+
+    if processes == 1:
+        entries = itertools.imap(export_issue, issue_pks)
+    else:
+        # the forked workers must open their own database and cache
+        # connections.
+        reset_connections()
+        pool = multiprocessing.Pool(processes, initializer=reset_connections)
+        entries = pool.imap_unordered(export_issue, issue_pks)
+
+    manifest = []
+    try:
+        for entry in entries:
+            manifest.append(entry)
+            if callback is not None:
+                callback(entry, len(manifest), len(issue_pks))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return manifest
+
+
+def write_manifest(manifest, target=None):
+    """
+    Writes ``manifest`` as JSON to ``target``, or to a new file at
+    ``markupfile.MEDIA_ROOT``. Returns the path of the manifest.
+    """
+    if target is None:
+        if not os.path.exists(markupfile.MEDIA_ROOT):
+            os.makedirs(markupfile.MEDIA_ROOT, 0755)
+
+        target = markupfile.MEDIA_ROOT + bundle.generate_filename(
+            'markupfiles-batch', filetype='json')
+
+    with open(target, 'w') as f:
+        json.dump({
+            'generated_at': datetime.now().isoformat(),
+            'issues': manifest,
+        }, f, indent=2)
+
+    return target
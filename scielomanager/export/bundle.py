@@ -3,10 +3,35 @@ import os
 import tarfile
 import zipfile
 import StringIO
-import tempfile
 from datetime import datetime
 
 
+class _ChunkBuffer(object):
+    """
+    Write-only file-like object that keeps what was written until it is
+    drained. ``tell`` reports the total amount of bytes written, as
+    required by ``zipfile``.
+    """
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(data)
+        self._position += len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = ''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
 class Bundle(object):
     def __init__(self, *args, **kwargs):
         """
@@ -16,58 +41,89 @@ class Bundle(object):
         """
         self._data = dict(args)
 
-    def _tar(self):
+    def _members(self):
+        for name, data in self._data.items():
+            yield name, data.encode('cp1252', 'replace')
+
+    def _tar(self, fileobj):
         """
-        Generate a tarball containing the data passed at init time.
+        Generates a tarball containing the data passed at init time.
 
-        Returns a file handler.
+        Yields after each member is written to ``fileobj``.
         """
-        tmp = tempfile.NamedTemporaryFile(delete=True)
-        out = tarfile.open(tmp.name, 'w')
+        out = tarfile.open(fileobj=fileobj, mode='w|')
 
         try:
-            for name, data in self._data.items():
+            for name, data in self._members():
                 info = tarfile.TarInfo(name)
                 info.size = len(data)
-                out.addfile(info, StringIO.StringIO(data.encode('cp1252', 'replace')))
+                out.addfile(info, StringIO.StringIO(data))
+                yield
         finally:
             out.close()
 
-        tmp.seek(0)
-        return tmp
+        yield
+
+    def _zip(self, fileobj):
+        """
+        Generates a zip archive containing the data passed at init time.
 
-    def _zip(self):
-        tmp = tempfile.NamedTemporaryFile(delete=True)
-        out = zipfile.ZipFile(tmp.name, mode='w')
+        Yields after each member is written to ``fileobj``.
+        """
+        out = zipfile.ZipFile(fileobj, mode='w')
 
         try:
-            for name, data in self._data.items():
+            for name, data in self._members():
                 info = zipfile.ZipInfo(name)
                 info.file_size = len(data)
                 info.compress_type = zipfile.ZIP_DEFLATED
                 info.create_system = 0  # 0 = windows, 3 = unix
-                out.writestr(info, data.encode('cp1252', 'replace'))
+                out.writestr(info, data)
+                yield
         finally:
             out.close()
 
-        tmp.seek(0)
-        return tmp
-
-    def deploy(self, target):
+        yield
 
-        if target.endswith('tar'):
-            data = self._tar()
+    def _archive(self, fileobj, filetype):
+        if filetype == 'tar':
+            return self._tar(fileobj)
         else:
-            data = self._zip()
+            return self._zip(fileobj)
+
+    def write(self, fileobj, filetype='zip'):
+        """
+        Writes the archive to ``fileobj``, member by member.
+        """
+        for step in self._archive(fileobj, filetype):
+            pass
+
+    def iter_chunks(self, filetype='zip'):
+        """
+        Iterates over the archive as chunks of bytes, one per member
+        (and the archive's trailer), suitable for streaming responses.
+        Only the current member is held in memory.
+        """
+        buff = _ChunkBuffer()
+
+        for step in self._archive(buff, filetype):
+            chunk = buff.drain()
+            if chunk:
+                yield chunk
+
+    def deploy(self, target):
+        """
+        Writes the archive straight to ``target``. The filetype is tar
+        if ``target`` ends with `tar`, zip otherwise.
+        """
+        filetype = 'tar' if target.endswith('tar') else 'zip'
 
         base_path = os.path.split(os.path.splitext(target)[-2])[0]
         if not os.path.exists(base_path):
             os.makedirs(base_path, 0755)
 
-        with open(target, 'w') as f:
-            f.write(data.read())
-
-        data.close()
+        with open(target, 'wb') as f:
+            self.write(f, filetype=filetype)
 
 
 def generate_filename(prefix,
@@ -27,3 +27,23 @@ class MarkupFilesForm(forms.Form):
 
         if user:
             self.fields['journal'].queryset = jm_models.Journal.objects.all_by_user(user)
+
+
+class MarkupFilesBatchForm(forms.Form):
+    journals = forms.ModelMultipleChoiceField(
+        queryset=jm_models.Journal.objects.none(), required=False)
+    year_from = forms.IntegerField(required=False)
+    year_to = forms.IntegerField(required=False)
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super(MarkupFilesBatchForm, self).__init__(*args, **kwargs)
+
+        if user:
+            self.fields['journals'].queryset = jm_models.Journal.objects.all_by_user(user)
+
+    def get_journals(self):
+        """
+        The selected journals, or all the journals the user can export.
+        """
+        return self.cleaned_data['journals'] or self.fields['journals'].queryset
@@ -0,0 +1,143 @@
+# coding: utf-8
+"""
+Background generation of markup files bundles.
+
+Each request is stored as a MarkupFilesJob and handed to the executor
+set at ``settings.EXPORT_JOBS_EXECUTOR``:
+
+* ``QueueExecutor`` (the default) leaves the job pending, to be taken by
+  a ``markupfiles_worker`` process;
+* ``InProcessExecutor`` runs the job right away, in the calling thread.
+"""
+import time
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.importlib import import_module
+
+from . import markupfile
+from .models import MarkupFilesJob
+
+
+logger = logging.getLogger(__name__)
+
+EXPORT_JOBS_EXECUTOR = getattr(settings, 'EXPORT_JOBS_EXECUTOR',
+                               'export.jobs.QueueExecutor')
+WORKER_POLL_INTERVAL = getattr(settings, 'EXPORT_JOBS_POLL_INTERVAL', 2)
+# running jobs not finished in this many seconds are taken as failed.
+JOB_TIMEOUT = getattr(settings, 'EXPORT_JOBS_TIMEOUT', 1800)
+
+
+def claim(job):
+    """
+    Marks ``job`` as running, if it is still pending.
+
+    Returns ``False`` if the job was already taken by another worker.
+    """
+    started_at = datetime.now()
+    claimed = MarkupFilesJob.objects.filter(
+        pk=job.pk, status='pending').update(status='running', started_at=started_at)
+
+    if claimed:
+        job.status = 'running'
+        job.started_at = started_at
+
+    return bool(claimed)
+
+
+def fail_stale(timeout=JOB_TIMEOUT):
+    """
+    Marks as failed the jobs running for more than ``timeout`` seconds,
+    e.g. left behind by a worker that was killed.
+
+    Returns the number of jobs marked.
+    """
+    deadline = datetime.now() - timedelta(seconds=timeout)
+
+    return MarkupFilesJob.objects.filter(
+        status='running', started_at__lt=deadline).update(
+        status='failed', error=u'timed out after %s seconds' % timeout)
+
+
+def claim_next():
+    """
+    Claims the oldest pending job, if any, after failing the stale ones.
+    """
+    fail_stale()
+
+    for job in MarkupFilesJob.objects.filter(status='pending').order_by('pk')[:10]:
+        if claim(job):
+            return job
+
+
+def run(job):
+    """
+    Generates the bundle of a claimed ``job`` and stores the outcome.
+    """
+    try:
+        if job.issue_id is None:
+            bundle_url = markupfile.generate_ahead(job.journal_id, job.ahead_year)
+        else:
+            bundle_url = markupfile.generate(job.journal, job.issue)
+    except Exception as exc:
+        logger.exception('markup files job %s has failed' % job.pk)
+        job.mark_failed(unicode(exc))
+    else:
+        job.mark_done(bundle_url)
+
+
+def work(once=False, poll_interval=WORKER_POLL_INTERVAL):
+    """
+    Runs the pending jobs, waiting ``poll_interval`` seconds for new ones
+    when the queue is empty. If ``once`` is ``True``, returns instead.
+    """
+    while True:
+        job = claim_next()
+
+        if job is not None:
+            run(job)
+        elif once:
+            return None
+        else:
+            time.sleep(poll_interval)
+
+
+class QueueExecutor(object):
+    """
+    Leaves the jobs to be run by ``markupfiles_worker``.
+    """
+    def submit(self, job):
+        pass
+
+
+class InProcessExecutor(object):
+    """
+    Runs the jobs as they are submitted. Meant for tests and development.
+    """
+    def submit(self, job):
+        if claim(job):
+            run(job)
+
+
+def get_executor(import_path=EXPORT_JOBS_EXECUTOR):
+    module, attr = import_path.rsplit('.', 1)
+    try:
+        mod = import_module(module)
+    except ImportError as e:
+        raise ImproperlyConfigured('Error importing module %s: "%s"' %
+                                   (module, e))
+    try:
+        Executor = getattr(mod, attr)
+    except AttributeError:
+        raise ImproperlyConfigured('Module "%s" does not define a "%s" '
+                                   'class.' % (module, attr))
+    return Executor()
+
+
+def submit(job):
+    """
+    Hands ``job`` to the configured executor.
+    """
+    get_executor().submit(job)
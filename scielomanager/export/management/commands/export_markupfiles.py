@@ -0,0 +1,74 @@
+"""
+Command to generate the markup files bundles of many issues at once.
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.encoding import smart_str
+
+from journalmanager import models as jm_models
+from export import batch
+
+
+class Command(BaseCommand):
+    help = ('generates the markup files bundles of the issues of a collection '
+            'or of some journals, and writes a manifest of them')
+    option_list = BaseCommand.option_list + (
+        make_option('--collection',
+            dest='collection',
+            help='name_slug of the collection'),
+        make_option('--journal',
+            action='append',
+            dest='journals',
+            type='int',
+            help='journal id. may be repeated'),
+        make_option('--from-year',
+            dest='year_from',
+            type='int',
+            help='first publication year'),
+        make_option('--to-year',
+            dest='year_to',
+            type='int',
+            help='last publication year'),
+        make_option('--processes',
+            dest='processes',
+            type='int',
+            help='number of worker processes. defaults to the number of CPUs'),
+        make_option('--manifest',
+            dest='manifest',
+            help='path of the manifest file'),
+    )
+
+    def handle(self, *args, **options):
+        if not options['collection'] and not options['journals']:
+            raise CommandError('a collection or at least one journal must be given')
+
+        collection = None
+        if options['collection']:
+            try:
+                collection = jm_models.Collection.objects.get(
+                    name_slug=options['collection'])
+            except jm_models.Collection.DoesNotExist:
+                raise CommandError('unknown collection: %s' % options['collection'])
+
+        issues = batch.select_issues(collection=collection,
+                                     journals=options['journals'],
+                                     year_from=options['year_from'],
+                                     year_to=options['year_to'])
+        issue_pks = list(issues.values_list('pk', flat=True))
+
+        self.stdout.write('exporting %s issues\n' % len(issue_pks))
+
+        manifest = batch.export_issues(issue_pks,
+                                       processes=options['processes'],
+                                       callback=self._report)
+        target = batch.write_manifest(manifest, target=options['manifest'])
+
+        failures = len([entry for entry in manifest if entry['error']])
+        self.stdout.write('done: %s bundles, %s failures. manifest: %s\n' % (
+            len(manifest) - failures, failures, target))
+
+    def _report(self, entry, done, total):
+        outcome = entry['error'] and 'FAILED: %s' % entry['error'] or entry['bundle_url']
+        self.stdout.write(smart_str(u'[%s/%s] %s (%.3fs) %s\n' % (
+            done, total, entry.get('label', entry['issue']), entry['seconds'], outcome)))
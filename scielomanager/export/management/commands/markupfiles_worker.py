@@ -0,0 +1,27 @@
+"""
+Command to run the markup files bundle jobs.
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from export import jobs
+
+
+class Command(BaseCommand):
+    help = 'runs the pending markup files jobs, waiting for new ones'
+    option_list = BaseCommand.option_list + (
+        make_option('--once',
+            action='store_true',
+            dest='once',
+            default=False,
+            help='exit when there are no pending jobs'),
+        make_option('--poll-interval',
+            type='float',
+            dest='poll_interval',
+            default=jobs.WORKER_POLL_INTERVAL,
+            help='seconds to wait between checks for new jobs'),
+    )
+
+    def handle(self, *args, **options):
+        jobs.work(once=options['once'], poll_interval=options['poll_interval'])
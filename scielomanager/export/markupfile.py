@@ -1,11 +1,24 @@
 # coding: utf-8
+import os
+import hashlib
+
 from django.conf import settings
+from django.utils.functional import cached_property
+
+from scielomanager.utils.files import collect_garbage
 
 from . import bundle
 
 MEDIA_ROOT = settings.MEDIA_ROOT + '/export/'
 MEDIA_URL = settings.MEDIA_URL + '/export/'
 
+# max size, in bytes, of the bundles kept at MEDIA_ROOT.
+BUNDLES_MAX_SIZE = getattr(settings, 'EXPORT_BUNDLES_MAX_SIZE', 256 * 1024 * 1024)
+
+# must be incremented whenever the contents of the bundles change,
+# so the ones already generated are not reused.
+BUNDLE_VERSION = 1
+
 standards = {
     'iso690': ('icitat', 'iso', u'iso 690/87 - international standard organization'),
     'nbr6023': ('acitat', 'abnt', u'nbr 6023/89 - associação nacional de normas técnicas'),
@@ -30,6 +43,35 @@ class GenerationError(Exception):
         super(GenerationError, self).__init__(*args, **kwargs)
 
 
+class RenderContext(object):
+    """
+    Data shared by the documents of a bundle, fetched once no matter how
+    many documents use it.
+    """
+    def __init__(self, journal, issue=None):
+        self.journal = journal
+        self.issue = issue
+
+        if issue is not None and issue.journal_id == journal.pk:
+            # the documents reach the journal through the issue
+            issue.journal = journal
+
+    @cached_property
+    def sections(self):
+        return list(self.issue.section.available(True).all())
+
+    @cached_property
+    def section_titles(self):
+        """
+        The titles of each section, as in ``unicode(section)``.
+        """
+        return [section.display_title for section in self.sections]
+
+    @cached_property
+    def study_areas(self):
+        return [area.study_area for area in self.journal.study_areas.all()]
+
+
 class Automata(object):
     """
     Represents the automata.mds file
@@ -125,10 +167,23 @@ class Issue(object):
 
 class L10nIssue(Automata, Issue):
 
-    def __init__(self, journal, issue, language):
+    def __init__(self, journal, issue, language, context=None):
         self._journal = journal
         self._issue = issue
         self._language = language
+        self._context = context
+
+    def _get_sections(self):
+        if self._context is not None:
+            return self._context.sections
+
+        return self._issue.section.available(True).all()
+
+    def _get_section_titles(self):
+        if self._context is not None:
+            return self._context.section_titles
+
+        return [unicode(section) for section in self._get_sections()]
 
     @property
     def abbrev_title(self):
@@ -191,12 +246,12 @@ class L10nIssue(Automata, Issue):
 
     @property
     def sections(self):
-        sections = ';'.join([unicode(section) for section in self._issue.section.available(True).all()])
+        sections = ';'.join(self._get_section_titles())
         return sections + u';' + L10ISSUEMGS[self._language][0] if sections else L10ISSUEMGS[self._language][0]
 
     @property
     def sections_ids(self):
-        ids = ';'.join([unicode(section.actual_code) for section in self._issue.section.available(True).all()])
+        ids = ';'.join([unicode(section.actual_code) for section in self._get_sections()])
         return ids + u';nd' if ids else u'nd'
 
     @property
@@ -224,9 +279,10 @@ class L10nIssue(Automata, Issue):
 
 class JournalStandard(L10nIssue):
 
-    def __init__(self, journal, issue):
+    def __init__(self, journal, issue, context=None):
         self._journal = journal
         self._issue = issue
+        self._context = context
 
     @property
     def pub_type(self):
@@ -239,6 +295,9 @@ class JournalStandard(L10nIssue):
 
     @property
     def study_area(self):
+        if self._context is not None:
+            return '/'.join(self._context.study_areas)
+
         return '/'.join((area.study_area for area in self._journal.study_areas.all()))
 
     @property
@@ -287,13 +346,81 @@ class JournalStandard(L10nIssue):
         return self.journal_meta
 
 
+def fingerprint(journal, issue=None, ahead_year=None, sections=None):
+    """
+    Returns a digest of the data used to generate the bundle of ``issue``,
+    or of the ahead of print articles of ``ahead_year``.
+
+    The modification time of the journal, the issue and its sections
+    stand for their contents. ``sections`` are the available sections of
+    ``issue``, if already fetched.
+    """
+    parts = [BUNDLE_VERSION, journal.pk, journal.updated]
+
+    if issue is not None:
+        if sections is None:
+            sections = issue.section.available(True)
+
+        parts.extend([issue.pk, issue.updated])
+        parts.extend(sorted((section.pk, section.updated) for section in sections))
+    else:
+        parts.extend(['ahead', ahead_year])
+
+    return hashlib.sha1(repr(parts)).hexdigest()
+
+
+def get_bundle_filename(journal, issue=None, ahead_year=None, sections=None):
+    return 'markupfiles-%s.zip' % fingerprint(journal, issue=issue,
+        ahead_year=ahead_year, sections=sections)
+
+
+def get_deployed(pkg_filename):
+    """
+    Returns the url of the bundle ``pkg_filename`` if it was already
+    deployed, and marks it as recently used.
+    """
+    try:
+        os.utime(MEDIA_ROOT + pkg_filename, None)
+    except OSError:
+        return None
+
+    return MEDIA_URL + pkg_filename
+
+
+def deploy(pkg, pkg_filename):
+    """
+    Deploys ``pkg`` as ``pkg_filename`` and removes the least recently
+    used bundles beyond ``BUNDLES_MAX_SIZE``.
+    """
+    target = MEDIA_ROOT + pkg_filename
+
+    # concurrent jobs may be generating the same bundle. they are renamed
+    # in place so a partially written bundle is never served.
+    partial = '%s.%s.part' % (target, os.getpid())
+    pkg.deploy(partial)
+    os.rename(partial, target)
+
+    collect_garbage(MEDIA_ROOT, BUNDLES_MAX_SIZE, pattern='markupfiles-*.zip',
+                    keep=[target])
+
+    return MEDIA_URL + pkg_filename
+
+
 def generate(journal, issue):
+    context = RenderContext(journal, issue)
+
+    pkg_filename = get_bundle_filename(journal, issue=issue,
+        sections=context.sections)
+    deployed_url = get_deployed(pkg_filename)
+    if deployed_url:
+        return deployed_url
+
     export_automata = Automata(journal)
     export_issue = Issue(issue)
-    export_l10n_issue_en = L10nIssue(journal, issue, 'en')
-    export_l10n_issue_pt = L10nIssue(journal, issue, 'pt')
-    export_l10n_issue_es = L10nIssue(journal, issue, 'es')
-    export_journal_standard = JournalStandard(journal, issue)
+    export_l10n_issue_en = L10nIssue(journal, issue, 'en', context=context)
+    export_l10n_issue_pt = L10nIssue(journal, issue, 'pt', context=context)
+    export_l10n_issue_es = L10nIssue(journal, issue, 'es', context=context)
+    export_journal_standard = JournalStandard(journal, issue, context=context)
 
     try:
         packmeta = [
@@ -309,10 +436,7 @@ def generate(journal, issue):
     else:
         pkg = bundle.Bundle(*packmeta)
 
-    pkg_filename = bundle.generate_filename('markupfiles', filetype='zip')
-
-    pkg.deploy(MEDIA_ROOT + pkg_filename)
-    return MEDIA_URL + pkg_filename
+    return deploy(pkg, pkg_filename)
 
 
 class Ahead(object):
@@ -517,6 +641,11 @@ def generate_ahead(journal_id, year):
     from journalmanager import models
     journal = models.Journal.objects.get(id=journal_id)
 
+    pkg_filename = get_bundle_filename(journal, ahead_year=year)
+    deployed_url = get_deployed(pkg_filename)
+    if deployed_url:
+        return deployed_url
+
     export_automata = Automata(journal)
     export_ahead = Ahead(journal, year)
     export_l10n_issue_en = L10nAhead(journal, year, 'en')
@@ -538,7 +667,4 @@ def generate_ahead(journal_id, year):
     else:
         pkg = bundle.Bundle(*packmeta)
 
-    pkg_filename = bundle.generate_filename('markupfiles', filetype='zip')
-
-    pkg.deploy(MEDIA_ROOT + pkg_filename)
-    return MEDIA_URL + pkg_filename
+    return deploy(pkg, pkg_filename)
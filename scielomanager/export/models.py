@@ -1,3 +1,83 @@
+# coding: utf-8
 from django.db import models
+from django.contrib.auth.models import User
+from django.utils.translation import ugettext_lazy as _
 
-# Create your models here.
+from journalmanager.models import Journal, Issue
+
+
+JOB_STATUSES = (
+    ('pending', _('Pending')),
+    ('running', _('Running')),
+    ('done', _('Done')),
+    ('failed', _('Failed')),
+)
+
+
+class MarkupFilesBatch(models.Model):
+    """
+    Groups the jobs of the issues exported at once.
+    """
+    user = models.ForeignKey(User, related_name='markupfiles_batches')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __unicode__(self):
+        return u'%s' % self.pk
+
+    @property
+    def is_finished(self):
+        return not self.jobs.exclude(status__in=('done', 'failed')).exists()
+
+    def manifest(self):
+        """
+        Returns the outcome of each job of the batch.
+        """
+        return [{
+            'issue': job.issue_id,
+            'journal': job.journal_id,
+            'label': u'%s %s %s' % (job.journal.acronym,
+                                    job.issue.publication_year, job.issue.label),
+            'status': job.status,
+            'bundle_url': job.bundle_url or None,
+            'error': job.error or None,
+        } for job in self.jobs.select_related('journal', 'issue').order_by('pk')]
+
+
+class MarkupFilesJob(models.Model):
+    """
+    Request for a markup files bundle, generated in background by
+    ``export.jobs``.
+
+    Bundles of ahead of print articles have no ``issue``, but the
+    ``ahead_year`` instead.
+    """
+    user = models.ForeignKey(User, related_name='markupfiles_jobs')
+    journal = models.ForeignKey(Journal)
+    issue = models.ForeignKey(Issue, null=True, blank=True)
+    ahead_year = models.CharField(max_length=4, blank=True)
+    batch = models.ForeignKey(MarkupFilesBatch, null=True, blank=True,
+                              related_name='jobs')
+    status = models.CharField(max_length=16, choices=JOB_STATUSES,
+                              default='pending', db_index=True)
+    bundle_url = models.CharField(max_length=256, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+
+    def __unicode__(self):
+        return u'%s (%s)' % (self.pk, self.status)
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
+
+    def mark_done(self, bundle_url):
+        self.status = 'done'
+        self.bundle_url = bundle_url
+        self.save()
+
+    def mark_failed(self, error):
+        self.status = 'failed'
+        self.error = error
+        self.save()
@@ -0,0 +1,112 @@
+# coding: utf-8
+import os
+import json
+import shutil
+import tempfile
+import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+
+from journalmanager.tests import modelfactories
+from export import batch
+
+
+class BatchExportTests(TestCase):
+
+    def setUp(self):
+        self.collection = modelfactories.CollectionFactory.create()
+        self.journal = modelfactories.JournalFactory.create(collection=self.collection)
+        self.issues = [modelfactories.IssueFactory.create(journal=self.journal,
+                                                          publication_year=year)
+                       for year in [2010, 2011, 2012]]
+
+        self.generated = []
+
+        def fake_generate(journal, issue):
+            self.generated.append(issue.pk)
+            return '/static/media/export/markupfiles-%s.zip' % issue.pk
+
+        self._original_generate = batch.markupfile.generate
+        batch.markupfile.generate = fake_generate
+
+    def tearDown(self):
+        batch.markupfile.generate = self._original_generate
+
+    def test_select_issues_by_collection(self):
+        modelfactories.IssueFactory.create()
+
+        self.assertEqual(list(batch.select_issues(collection=self.collection)),
+                         self.issues)
+
+    def test_select_issues_by_journals_and_years(self):
+        issues = batch.select_issues(journals=[self.journal],
+                                     year_from=2011, year_to=2011)
+
+        self.assertEqual(list(issues), [self.issues[1]])
+
+    def test_trashed_issues_are_not_selected(self):
+        modelfactories.IssueFactory.create(journal=self.journal, is_trashed=True)
+
+        self.assertEqual(list(batch.select_issues(journals=[self.journal])),
+                         self.issues)
+
+    def test_reset_connections_closes_the_cache(self):
+        closed = []
+
+        class FakeCache(object):
+            def close(self):
+                closed.append(self)
+
+        original_cache = batch.cache
+        batch.cache = FakeCache()
+        try:
+            batch.reset_connections()
+        finally:
+            batch.cache = original_cache
+
+        self.assertEqual(len(closed), 1)
+
+    def test_export_issues_reports_the_progress(self):
+        progress = []
+
+        manifest = batch.export_issues([issue.pk for issue in self.issues],
+            processes=1,
+            callback=lambda entry, done, total: progress.append((entry['issue'], done, total)))
+
+        self.assertEqual(progress, [(issue.pk, i + 1, 3) for i, issue in enumerate(self.issues)])
+        self.assertEqual([entry['bundle_url'] for entry in manifest],
+                         ['/static/media/export/markupfiles-%s.zip' % issue.pk
+                          for issue in self.issues])
+        self.assertTrue(all(entry['seconds'] >= 0 for entry in manifest))
+
+    def test_failures_do_not_stop_the_batch(self):
+        def fake_generate(journal, issue):
+            if issue.pk == self.issues[0].pk:
+                raise batch.markupfile.GenerationError('missing data')
+            return '/static/media/export/markupfiles.zip'
+        batch.markupfile.generate = fake_generate
+
+        manifest = batch.export_issues([issue.pk for issue in self.issues], processes=1)
+
+        self.assertEqual([entry['error'] for entry in manifest],
+                         ['missing data', None, None])
+
+    def test_command_writes_a_single_manifest(self):
+        target_dir = tempfile.mkdtemp()
+        try:
+            target = os.path.join(target_dir, 'manifest.json')
+            stdout = StringIO.StringIO()
+
+            call_command('export_markupfiles', collection=self.collection.name_slug,
+                         year_from=2011, processes=1, manifest=target, stdout=stdout)
+
+            with open(target) as f:
+                manifest = json.load(f)
+        finally:
+            shutil.rmtree(target_dir)
+
+        self.assertEqual([entry['issue'] for entry in manifest['issues']],
+                         [self.issues[1].pk, self.issues[2].pk])
+        self.assertTrue('[2/2]' in stdout.getvalue())
+        self.assertEqual(self.generated, [self.issues[1].pk, self.issues[2].pk])
@@ -0,0 +1,104 @@
+# coding: utf-8
+from datetime import datetime, timedelta
+
+from django.test import TestCase
+from django_factory_boy import auth
+
+from journalmanager.tests import modelfactories
+from export import jobs, markupfile
+from export.models import MarkupFilesJob
+
+
+class MarkupFilesJobsTests(TestCase):
+
+    def setUp(self):
+        self.user = auth.UserF(is_active=True)
+        self.issue = modelfactories.IssueFactory.create()
+        self.calls = []
+
+        def fake_generate(journal, issue):
+            self.calls.append(('generate', journal.pk, issue.pk))
+            return '/static/media/export/markupfiles.zip'
+
+        def fake_generate_ahead(journal_id, year):
+            self.calls.append(('generate_ahead', journal_id, year))
+            return '/static/media/export/markupfiles-ahead.zip'
+
+        self._original = (jobs.markupfile.generate, jobs.markupfile.generate_ahead)
+        jobs.markupfile.generate = fake_generate
+        jobs.markupfile.generate_ahead = fake_generate_ahead
+
+    def tearDown(self):
+        jobs.markupfile.generate, jobs.markupfile.generate_ahead = self._original
+
+    def _create_job(self, **kwargs):
+        params = {'user': self.user, 'journal': self.issue.journal, 'issue': self.issue}
+        params.update(kwargs)
+        return MarkupFilesJob.objects.create(**params)
+
+    def test_in_process_executor_runs_the_job(self):
+        job = self._create_job()
+
+        jobs.InProcessExecutor().submit(job)
+
+        job = MarkupFilesJob.objects.get(pk=job.pk)
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.bundle_url, '/static/media/export/markupfiles.zip')
+        self.assertEqual(self.calls, [('generate', self.issue.journal.pk, self.issue.pk)])
+
+    def test_queue_executor_leaves_the_job_pending(self):
+        job = self._create_job()
+
+        jobs.QueueExecutor().submit(job)
+
+        self.assertEqual(MarkupFilesJob.objects.get(pk=job.pk).status, 'pending')
+        self.assertEqual(self.calls, [])
+
+    def test_ahead_jobs(self):
+        job = self._create_job(issue=None, ahead_year='2013')
+
+        jobs.InProcessExecutor().submit(job)
+
+        self.assertEqual(MarkupFilesJob.objects.get(pk=job.pk).bundle_url,
+                         '/static/media/export/markupfiles-ahead.zip')
+        self.assertEqual(self.calls, [('generate_ahead', self.issue.journal.pk, '2013')])
+
+    def test_failures_are_stored(self):
+        def failing_generate(journal, issue):
+            raise markupfile.GenerationError('missing data')
+        jobs.markupfile.generate = failing_generate
+
+        job = self._create_job()
+        jobs.InProcessExecutor().submit(job)
+
+        job = MarkupFilesJob.objects.get(pk=job.pk)
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, 'missing data')
+
+    def test_jobs_are_claimed_once(self):
+        job = self._create_job()
+
+        self.assertTrue(jobs.claim(job))
+        self.assertFalse(jobs.claim(MarkupFilesJob.objects.get(pk=job.pk)))
+
+    def test_work_runs_the_pending_jobs_in_order(self):
+        first = self._create_job()
+        second = self._create_job(issue=None, ahead_year='2013')
+        self._create_job(status='done')
+
+        jobs.work(once=True)
+
+        self.assertEqual([call[0] for call in self.calls], ['generate', 'generate_ahead'])
+        self.assertEqual(MarkupFilesJob.objects.filter(status='done').count(), 3)
+
+    def test_stale_running_jobs_are_failed(self):
+        stale = self._create_job(status='running',
+            started_at=datetime.now() - timedelta(seconds=jobs.JOB_TIMEOUT + 60))
+        running = self._create_job(status='running', started_at=datetime.now())
+
+        self.assertIsNone(jobs.claim_next())
+
+        stale = MarkupFilesJob.objects.get(pk=stale.pk)
+        self.assertEqual(stale.status, 'failed')
+        self.assertTrue('timed out' in stale.error)
+        self.assertEqual(MarkupFilesJob.objects.get(pk=running.pk).status, 'running')
@@ -1,11 +1,18 @@
 # coding:utf-8
-# from django.test import TestCase
+import os
+import shutil
+import tempfile
+import datetime
+
+from django.test import TestCase
 from mocker import (
     MockerTestCase,
     # ANY,
     # KWARGS,
 )
 
+from journalmanager.tests import modelfactories
+
 
 class AutomataTests(MockerTestCase):
     def _makeOne(self, *args, **kwargs):
@@ -1390,3 +1397,221 @@ class JournalStandardAheadTests(MockerTestCase):
         """.strip()
         self.assertEqual(journal_meta, expected_journal_meta)
         self.assertIsInstance(journal_meta, unicode)
+
+
+class BundleCachingTests(TestCase):
+
+    def setUp(self):
+        from export import markupfile
+
+        self.media_root = tempfile.mkdtemp()
+        self._original_media_root = markupfile.MEDIA_ROOT
+        markupfile.MEDIA_ROOT = self.media_root + '/'
+
+    def tearDown(self):
+        from export import markupfile
+
+        markupfile.MEDIA_ROOT = self._original_media_root
+        shutil.rmtree(self.media_root)
+
+    def _bundles(self):
+        return sorted(os.listdir(self.media_root))
+
+    def _create_issue(self):
+        issue = modelfactories.IssueFactory.create()
+        # read by L10nIssue, but not Issue fields.
+        issue.suppl_volume = issue.suppl_number = u''
+        return issue
+
+    def test_unchanged_issues_reuse_the_bundle(self):
+        from export import markupfile
+        issue = self._create_issue()
+
+        first_url = markupfile.generate(issue.journal, issue)
+        second_url = markupfile.generate(issue.journal, issue)
+
+        self.assertEqual(first_url, second_url)
+        self.assertEqual(len(self._bundles()), 1)
+
+    def test_changed_issues_get_a_new_bundle(self):
+        from export import markupfile
+        issue = self._create_issue()
+
+        first_url = markupfile.generate(issue.journal, issue)
+        issue.updated = issue.updated + datetime.timedelta(seconds=1)
+        second_url = markupfile.generate(issue.journal, issue)
+
+        self.assertNotEqual(first_url, second_url)
+        self.assertEqual(len(self._bundles()), 2)
+
+    def test_fingerprint_changes_with_the_sections(self):
+        from export import markupfile
+        issue = modelfactories.IssueFactory.create()
+        before = markupfile.fingerprint(issue.journal, issue)
+
+        section = issue.section.all()[0]
+        section.updated = section.updated + datetime.timedelta(seconds=1)
+        section.save()
+
+        self.assertNotEqual(before, markupfile.fingerprint(issue.journal, issue))
+
+    def test_ahead_bundles_are_reused_by_year(self):
+        from export import markupfile
+        journal = modelfactories.JournalFactory.create()
+
+        first_url = markupfile.generate_ahead(journal.pk, '2013')
+        second_url = markupfile.generate_ahead(journal.pk, '2013')
+        other_year_url = markupfile.generate_ahead(journal.pk, '2014')
+
+        self.assertEqual(first_url, second_url)
+        self.assertNotEqual(first_url, other_year_url)
+
+    def test_least_recently_used_bundles_are_collected(self):
+        from scielomanager.utils.files import collect_garbage
+
+        for i, name in enumerate(['markupfiles-a.zip', 'markupfiles-b.zip',
+                                  'markupfiles-c.zip', 'other.zip']):
+            path = os.path.join(self.media_root, name)
+            with open(path, 'w') as f:
+                f.write('x' * 10)
+            os.utime(path, (1000 + i, 1000 + i))
+
+        # ``a`` was reused
+        os.utime(os.path.join(self.media_root, 'markupfiles-a.zip'), (2000, 2000))
+
+        collect_garbage(self.media_root, 20, pattern='markupfiles-*.zip')
+
+        self.assertEqual(self._bundles(),
+                         ['markupfiles-a.zip', 'markupfiles-c.zip', 'other.zip'])
+
+    def test_kept_bundles_are_not_collected(self):
+        from scielomanager.utils.files import collect_garbage
+
+        for i, name in enumerate(['markupfiles-a.zip', 'markupfiles-b.zip']):
+            path = os.path.join(self.media_root, name)
+            with open(path, 'w') as f:
+                f.write('x' * 10)
+            os.utime(path, (1000 + i, 1000 + i))
+
+        # ``a`` was just deployed, yet its mtime is older.
+        collect_garbage(self.media_root, 10, pattern='markupfiles-*.zip',
+            keep=[os.path.join(self.media_root, 'markupfiles-a.zip')])
+
+        self.assertEqual(self._bundles(), ['markupfiles-a.zip'])
+
+
+class BundleTests(TestCase):
+
+    def _makeOne(self):
+        from export import bundle
+        return bundle.Bundle(('automata.mds', u'1234-5678;icitat;foo.amd;tgiso.amd'),
+                             ('issue.mds', u'Foo v.1 n.1\r\nJan/Mar\r\n20121\r\n\r\n'),
+                             ('pt_issue.mds', u'Sem título de seção'))
+
+    def _assertMembers(self, archive_names, read):
+        self.assertEqual(sorted(archive_names), ['automata.mds', 'issue.mds', 'pt_issue.mds'])
+        self.assertEqual(read('pt_issue.mds'), u'Sem título de seção'.encode('cp1252'))
+
+    def test_deploy_writes_the_zip_to_the_target(self):
+        import zipfile
+
+        target_dir = tempfile.mkdtemp()
+        try:
+            target = os.path.join(target_dir, 'sub', 'bundle.zip')
+            self._makeOne().deploy(target)
+
+            archive = zipfile.ZipFile(target)
+            self._assertMembers(archive.namelist(), archive.read)
+        finally:
+            shutil.rmtree(target_dir)
+
+    def test_iter_chunks_yields_a_zip_member_by_member(self):
+        import zipfile
+        import StringIO
+
+        chunks = list(self._makeOne().iter_chunks())
+
+        # one per member, plus the central directory.
+        self.assertEqual(len(chunks), 4)
+        archive = zipfile.ZipFile(StringIO.StringIO(''.join(chunks)))
+        self._assertMembers(archive.namelist(), archive.read)
+
+    def test_iter_chunks_yields_a_tarball(self):
+        import tarfile
+        import StringIO
+
+        data = ''.join(self._makeOne().iter_chunks(filetype='tar'))
+
+        archive = tarfile.open(fileobj=StringIO.StringIO(data))
+        self._assertMembers(archive.getnames(),
+                            lambda name: archive.extractfile(name).read())
+
+
+class GenerateQueryCountTests(TestCase):
+
+    def setUp(self):
+        from export import markupfile
+
+        self.media_root = tempfile.mkdtemp()
+        self._original_media_root = markupfile.MEDIA_ROOT
+        markupfile.MEDIA_ROOT = self.media_root + '/'
+
+    def tearDown(self):
+        from export import markupfile
+
+        markupfile.MEDIA_ROOT = self._original_media_root
+        shutil.rmtree(self.media_root)
+
+    def _create_issue(self, sections_count):
+        from journalmanager import models
+
+        journal = modelfactories.JournalFactory.create()
+        issue = modelfactories.IssueFactory.create(journal=journal)
+        issue.section.clear()
+
+        languages = [modelfactories.LanguageFactory.create(iso_code=code, name=name)
+                     for code, name in [('en', 'english'), ('pt', 'portuguese')]]
+        for i in range(sections_count):
+            section = modelfactories.SectionFactory.create(journal=journal)
+            for language in languages:
+                section.add_title(u'section %s %s' % (i, language.iso_code), language)
+            issue.section.add(section)
+
+        # read by L10nIssue, but not Issue fields.
+        issue = models.Issue.objects.get(pk=issue.pk)
+        issue.suppl_volume = issue.suppl_number = u''
+        return issue
+
+    def test_generate(self):
+        from export import markupfile
+
+        for sections_count in [1, 30]:
+            issue = self._create_issue(sections_count)
+            journal = issue.journal
+
+            # sections, with their display titles, and study areas.
+            with self.assertNumQueries(2):
+                markupfile.generate(journal, issue)
+
+    def test_sections_and_their_codes_are_aligned(self):
+        import zipfile
+        from export import markupfile
+
+        issue = self._create_issue(3)
+        archive = zipfile.ZipFile(self.media_root + '/' +
+            markupfile.generate(issue.journal, issue).rsplit('/', 1)[-1])
+        rows = archive.read('en_issue.mds').split('\r\n')
+
+        self.assertEqual(rows[2].split(';')[:3],
+                         [u' / '.join([u'section %s en' % i, u'section %s pt' % i])
+                          for i in range(3)])
+        self.assertEqual(rows[3].split(';')[:3],
+                         [section.code for section in issue.section.all()])
+
+    def test_generate_ahead(self):
+        from export import markupfile
+        journal = modelfactories.JournalFactory.create()
+
+        # journal and study areas.
+        with self.assertNumQueries(2):
+            markupfile.generate_ahead(journal.pk, '2013')
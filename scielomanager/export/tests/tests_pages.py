@@ -191,3 +191,188 @@ class ListIssuesForMarkupFilesTests(WebTest):
         ).follow()
 
         self.assertTemplateUsed(response, 'registration/login.html')
+
+
+class MarkupFilesJobTests(WebTest):
+    csrf_checks = False
+
+    def setUp(self):
+        from export import jobs
+
+        self.user = auth.UserF(is_active=True)
+
+        self.collection = modelfactories.CollectionFactory.create()
+        self.collection.add_user(self.user, is_manager=False)
+        self.journal = modelfactories.JournalFactory(
+            collection=self.collection)
+        self.issue = modelfactories.IssueFactory(journal=self.journal)
+
+        self._original = (jobs.markupfile.generate, jobs.markupfile.generate_ahead)
+        jobs.markupfile.generate = lambda journal, issue: '/static/media/export/markupfiles.zip'
+        jobs.markupfile.generate_ahead = lambda journal_id, year: '/static/media/export/ahead.zip'
+
+    def tearDown(self):
+        from export import jobs
+        jobs.markupfile.generate, jobs.markupfile.generate_ahead = self._original
+
+    def test_posting_the_form_redirects_to_the_job(self):
+        from export.models import MarkupFilesJob
+
+        response = self.app.post(
+            reverse('export.markupfiles'),
+            {'journal': self.journal.pk, 'issue': self.issue.pk},
+            user=self.user,
+            status=302
+        )
+        job = MarkupFilesJob.objects.get(user=self.user)
+
+        self.assertTrue(response.location.endswith(
+            reverse('export.markupfiles.job', args=[job.pk])))
+        self.assertEqual(job.issue, self.issue)
+
+    def test_ahead_jobs(self):
+        from export.models import MarkupFilesJob
+
+        self.app.post(
+            reverse('export.markupfiles'),
+            {'journal': self.journal.pk, 'issue': 'ahead:2013'},
+            user=self.user,
+            status=302
+        )
+        job = MarkupFilesJob.objects.get(user=self.user)
+
+        self.assertIsNone(job.issue)
+        self.assertEqual(job.ahead_year, '2013')
+
+    def test_job_page_links_to_the_bundle(self):
+        from export.models import MarkupFilesJob
+
+        self.app.post(
+            reverse('export.markupfiles'),
+            {'journal': self.journal.pk, 'issue': self.issue.pk},
+            user=self.user
+        )
+        job = MarkupFilesJob.objects.get(user=self.user)
+
+        response = self.app.get(
+            reverse('export.markupfiles.job', args=[job.pk]),
+            user=self.user
+        )
+
+        self.assertTemplateUsed(response, 'export/markup_files_job.html')
+        self.assertTrue('/static/media/export/markupfiles.zip' in response.content)
+
+    def test_job_status_is_polled_by_ajax(self):
+        from export.models import MarkupFilesJob
+
+        job = MarkupFilesJob.objects.create(user=self.user,
+            journal=self.journal, issue=self.issue)
+
+        response = self.app.get(
+            reverse('export.markupfiles.job', args=[job.pk]),
+            headers={'x-requested-with': 'XMLHttpRequest'},
+            user=self.user
+        )
+
+        self.assertEqual(json.loads(response.content),
+                         {'status': 'pending', 'bundle_url': '', 'error': ''})
+
+    def test_jobs_are_visible_only_to_their_users(self):
+        from export.models import MarkupFilesJob
+
+        job = MarkupFilesJob.objects.create(user=auth.UserF(is_active=True),
+            journal=self.journal, issue=self.issue)
+
+        response = self.app.get(
+            reverse('export.markupfiles.job', args=[job.pk]),
+            user=self.user,
+            status=404
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+
+class MarkupFilesBatchTests(WebTest):
+    csrf_checks = False
+
+    def setUp(self):
+        from export import jobs
+
+        self.user = auth.UserF(is_active=True)
+
+        self.collection = modelfactories.CollectionFactory.create()
+        self.collection.add_user(self.user, is_manager=False)
+        self.collection.make_default_to_user(self.user)
+        self.journal = modelfactories.JournalFactory(
+            collection=self.collection)
+        self.issues = [modelfactories.IssueFactory(journal=self.journal,
+                                                   publication_year=year)
+                       for year in [2011, 2012]]
+
+        self._original_generate = jobs.markupfile.generate
+        jobs.markupfile.generate = lambda journal, issue: '/static/media/export/markupfiles-%s.zip' % issue.pk
+
+    def tearDown(self):
+        from export import jobs
+        jobs.markupfile.generate = self._original_generate
+
+    def test_a_job_is_created_for_each_issue(self):
+        from export.models import MarkupFilesBatch
+
+        response = self.app.post(
+            reverse('export.markupfiles.batch'),
+            {'year_from': 2012},
+            user=self.user,
+            status=302
+        )
+        markupfiles_batch = MarkupFilesBatch.objects.get(user=self.user)
+
+        self.assertTrue(response.location.endswith(
+            reverse('export.markupfiles.batch.detail', args=[markupfiles_batch.pk])))
+        self.assertEqual([job.issue for job in markupfiles_batch.jobs.all()],
+                         [self.issues[1]])
+
+    def test_manifest_is_served_to_ajax_requests(self):
+        from export.models import MarkupFilesBatch
+
+        self.app.post(reverse('export.markupfiles.batch'), {}, user=self.user)
+        markupfiles_batch = MarkupFilesBatch.objects.get(user=self.user)
+
+        response = self.app.get(
+            reverse('export.markupfiles.batch.detail', args=[markupfiles_batch.pk]),
+            headers={'x-requested-with': 'XMLHttpRequest'},
+            user=self.user
+        )
+        manifest = json.loads(response.content)['issues']
+
+        self.assertEqual([(entry['issue'], entry['status']) for entry in manifest],
+                         [(issue.pk, 'done') for issue in self.issues])
+
+    def test_batch_page(self):
+        from export.models import MarkupFilesBatch
+
+        self.app.post(reverse('export.markupfiles.batch'), {}, user=self.user)
+        markupfiles_batch = MarkupFilesBatch.objects.get(user=self.user)
+
+        response = self.app.get(
+            reverse('export.markupfiles.batch.detail', args=[markupfiles_batch.pk]),
+            user=self.user
+        )
+
+        self.assertTemplateUsed(response, 'export/markup_files_batch_detail.html')
+        self.assertTrue('/static/media/export/markupfiles-%s.zip' % self.issues[0].pk
+                        in response.content)
+
+    def test_batches_are_visible_only_to_their_users(self):
+        from export.models import MarkupFilesBatch
+
+        markupfiles_batch = MarkupFilesBatch.objects.create(
+            user=auth.UserF(is_active=True))
+
+        response = self.app.get(
+            reverse('export.markupfiles.batch.detail', args=[markupfiles_batch.pk]),
+            user=self.user,
+            status=404
+        )
+
+        self.assertEqual(response.status_code, 404)
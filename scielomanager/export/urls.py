@@ -6,4 +6,7 @@ from . import views
 
 urlpatterns = patterns('',
     url(r'^markupfiles/$', views.markup_files, name="export.markupfiles"),
+    url(r'^markupfiles/jobs/(?P<job_id>\d+)/$', views.markup_files_job, name="export.markupfiles.job"),
+    url(r'^markupfiles/batches/$', views.markup_files_batch, name="export.markupfiles.batch"),
+    url(r'^markupfiles/batches/(?P<batch_id>\d+)/$', views.markup_files_batch_detail, name="export.markupfiles.batch.detail"),
 )
@@ -1,29 +1,118 @@
+import json
+
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse
 from django.template.context import RequestContext
-from django.shortcuts import render_to_response
+from django.shortcuts import render_to_response, get_object_or_404
 from django.shortcuts import redirect
 
-from . import forms, markupfile
+from journalmanager.models import Journal
+from . import forms, jobs, batch
+from .models import MarkupFilesJob, MarkupFilesBatch
 
 
 @login_required
 def markup_files(request):
 
     if request.method == 'POST':
+        job = None
 
         if 'ahead' in request.POST['issue']:
             year = request.POST['issue'].split(':')[1]
-            bundle_url = markupfile.generate_ahead(request.POST['journal'], year)
-            return redirect(bundle_url)
+            journal = get_object_or_404(Journal, pk=request.POST['journal'])
+            job = MarkupFilesJob.objects.create(user=request.user,
+                                                journal=journal,
+                                                ahead_year=year)
         else:
             form = forms.MarkupFilesForm(request.POST, user=request.user)
 
             if form.is_valid():
-                bundle_url = markupfile.generate(form.cleaned_data['journal'],
-                                                form.cleaned_data['issue'])
-                return redirect(bundle_url)
+                job = MarkupFilesJob.objects.create(user=request.user,
+                                                    journal=form.cleaned_data['journal'],
+                                                    issue=form.cleaned_data['issue'])
+
+        if job is not None:
+            jobs.submit(job)
+            return redirect('export.markupfiles.job', job.pk)
 
     form = forms.MarkupFilesForm(user=request.user)
     return render_to_response('export/markup_files.html',
                               {'form': form},
                               context_instance=RequestContext(request))
+
+
+@login_required
+def markup_files_job(request, job_id):
+    """
+    Shows the status of a markup files job, and the link to download
+    the bundle once it is done.
+
+    Ajax requests get the status as JSON, for polling.
+    """
+    job = get_object_or_404(MarkupFilesJob, pk=job_id, user=request.user)
+
+    if request.is_ajax():
+        response_data = json.dumps({
+            'status': job.status,
+            'bundle_url': job.bundle_url,
+            'error': job.error,
+        })
+        return HttpResponse(response_data, mimetype="application/json")
+
+    return render_to_response('export/markup_files_job.html',
+                              {'job': job},
+                              context_instance=RequestContext(request))
+
+
+@login_required
+def markup_files_batch(request):
+    """
+    Generates the bundles of all the issues of the selected journals, or
+    of all the user's journals, published in the given range of years.
+    """
+    if request.method == 'POST':
+        form = forms.MarkupFilesBatchForm(request.POST, user=request.user)
+
+        if form.is_valid():
+            issues = batch.select_issues(journals=form.get_journals(),
+                                         year_from=form.cleaned_data['year_from'],
+                                         year_to=form.cleaned_data['year_to'])
+
+            markupfiles_batch = MarkupFilesBatch.objects.create(user=request.user)
+            for issue in issues:
+                job = MarkupFilesJob.objects.create(user=request.user,
+                                                    journal=issue.journal,
+                                                    issue=issue,
+                                                    batch=markupfiles_batch)
+                jobs.submit(job)
+
+            return redirect('export.markupfiles.batch.detail', markupfiles_batch.pk)
+    else:
+        form = forms.MarkupFilesBatchForm(user=request.user)
+
+    return render_to_response('export/markup_files_batch.html',
+                              {'form': form},
+                              context_instance=RequestContext(request))
+
+
+@login_required
+def markup_files_batch_detail(request, batch_id):
+    """
+    Shows the progress of a batch of markup files jobs.
+
+    Ajax requests get the manifest of the batch as JSON.
+    """
+    markupfiles_batch = get_object_or_404(MarkupFilesBatch, pk=batch_id,
+                                          user=request.user)
+    manifest = markupfiles_batch.manifest()
+
+    if request.is_ajax():
+        return HttpResponse(json.dumps({'issues': manifest}),
+                            mimetype="application/json")
+
+    return render_to_response('export/markup_files_batch_detail.html',
+                              {'batch': markupfiles_batch,
+                               'manifest': manifest,
+                               'done': len([entry for entry in manifest
+                                            if entry['status'] in ('done', 'failed')])},
+                              context_instance=RequestContext(request))
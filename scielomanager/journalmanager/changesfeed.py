@@ -0,0 +1,242 @@
+# coding: utf-8
+"""
+Capture and notification of DataChangeEvent records.
+
+Changes to the tracked models are recorded through ``record``. While a
+buffer is active for the current thread (see ``begin``, ``flush`` and
+``buffered``), the changes are collapsed by object and written at once
+with ``bulk_create``. Otherwise they are written right away.
+
+Consumers of the changes feed may block waiting for events newer than
+their cursor. New events publish their sequence number once committed
+(see ``announce`` and ``publish_committed``), waking the waiters of the
+current process right away and the ones of other processes through the
+shared cache, which is checked at every ``CHANGES_FEED_POLL_INTERVAL``
+seconds. No queries are made while waiting.
+
+Waiting holds the thread, and a thread blocked in ``wait_for`` can only
+be woken by other threads, so it is meant for servers that wait
+cooperatively (see ``API_CHANGES_FEED_LONG_POLL``).
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.contrib.contenttypes.models import ContentType
+
+from scielomanager.utils.middlewares.threadlocal import get_current_user
+
+
+LATEST_SEQ_CACHE_KEY = 'journalmanager:changesfeed:latest_seq'
+LATEST_SEQ_LOCK_KEY = 'journalmanager:changesfeed:latest_seq:lock'
+CHANGES_FEED_POLL_INTERVAL = getattr(settings, 'CHANGES_FEED_POLL_INTERVAL', 1)
+
+_condition = threading.Condition()
+_latest_seq = 0
+
+_buffers = threading.local()
+_pending = threading.local()
+
+
+def publish(seq):
+    """
+    Announces that the DataChangeEvent ``seq`` was created.
+    """
+    global _latest_seq
+
+    with _condition:
+        _latest_seq = max(_latest_seq, seq)
+        _condition.notify_all()
+
+    _raise_shared_seq(seq)
+
+
+def _raise_shared_seq(seq, tries=10):
+    """
+    Sets the shared latest seq to ``seq``, unless it is already greater.
+    Concurrent writers are serialized by a lock in the cache itself.
+    """
+    if cache.add(LATEST_SEQ_CACHE_KEY, seq):
+        return None
+
+    for i in range(tries):
+        if cache.add(LATEST_SEQ_LOCK_KEY, 1, 5):
+            try:
+                current = cache.get(LATEST_SEQ_CACHE_KEY)
+                if current is None or current < seq:
+                    cache.set(LATEST_SEQ_CACHE_KEY, seq)
+            finally:
+                cache.delete(LATEST_SEQ_LOCK_KEY)
+            return None
+
+        current = cache.get(LATEST_SEQ_CACHE_KEY)
+        if current is not None and current >= seq:
+            return None
+        time.sleep(0.01)
+
+
+def announce(seq):
+    """
+    Publishes ``seq`` once the current transaction is committed: right
+    away in autocommit mode, or by ``publish_committed`` otherwise.
+    """
+    if transaction.is_managed():
+        _pending.seq = max(getattr(_pending, 'seq', None) or 0, seq)
+    else:
+        publish(seq)
+
+
+def publish_committed():
+    """
+    Publishes the events announced during the transaction just committed.
+    """
+    seq = getattr(_pending, 'seq', None)
+    _pending.seq = None
+
+    if seq:
+        publish(seq)
+
+
+def discard_announced():
+    _pending.seq = None
+
+
+def latest_seq():
+    """
+    Returns the greatest sequence number known to have been published.
+    """
+    return max(_latest_seq, cache.get(LATEST_SEQ_CACHE_KEY) or 0)
+
+
+def wait_for(seq, timeout, poll_interval=CHANGES_FEED_POLL_INTERVAL):
+    """
+    Blocks until an event with sequence number ``seq`` or greater is
+    published, or ``timeout`` seconds have passed.
+
+    Returns ``True`` if the event was published, ``False`` on timeout.
+    """
+    deadline = time.time() + timeout
+
+    while latest_seq() < seq:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+
+        with _condition:
+            if _latest_seq < seq:
+                _condition.wait(min(remaining, poll_interval))
+
+    return True
+
+
+def _collapse(previous, current):
+    """
+    Returns the event type that sums up ``previous`` followed by
+    ``current``, for the same object. ``None`` means nothing to record.
+    """
+    if previous == 'added':
+        return None if current == 'deleted' else 'added'
+
+    return current
+
+
+def _write(events):
+    from journalmanager.models import DataChangeEvent
+
+    if len(events) == 1:
+        # post_save takes care of announcing it.
+        DataChangeEvent(**events[0]).save()
+    elif events:
+        DataChangeEvent.objects.bulk_create(
+            [DataChangeEvent(**event) for event in events])
+        announce(DataChangeEvent.objects.aggregate(Max('pk'))['pk__max'])
+
+
+def _get_buffer():
+    return getattr(_buffers, 'events', None)
+
+
+def begin():
+    """
+    Starts buffering the changes recorded by the current thread.
+    """
+    _buffers.events = OrderedDict()
+
+
+def discard():
+    """
+    Drops the buffered changes, e.g. when the transaction is rolled back.
+    """
+    _buffers.events = None
+
+
+def flush():
+    """
+    Writes the buffered changes, and stops buffering.
+    """
+    events = _get_buffer()
+    _buffers.events = None
+
+    if events:
+        _write(events.values())
+
+
+@contextmanager
+def buffered():
+    """
+    Buffers the changes recorded inside the block, for bulk operations
+    done outside of a request. Joins the current buffer, if any.
+    """
+    if _get_buffer() is not None:
+        yield
+        return
+
+    begin()
+    try:
+        yield
+    except:
+        discard()
+        raise
+    else:
+        flush()
+
+
+def record(instance, event_type, collection_id):
+    """
+    Records that ``instance``, bound to the collection ``collection_id``,
+    was added, updated or deleted.
+    """
+    # changes made outside of requests (imports, scripts) have no user.
+    user = get_current_user()
+    user_id = user.pk if user is not None and user.is_authenticated() else None
+
+    content_type = ContentType.objects.get_for_model(instance)
+    event = {
+        'user_id': user_id,
+        'content_type': content_type,
+        'object_id': instance.pk,
+        'event_type': event_type,
+        'collection_id': collection_id,
+    }
+
+    events = _get_buffer()
+    if events is None:
+        _write([event])
+        return
+
+    key = (content_type.pk, instance.pk)
+    previous = events.pop(key, None)
+    if previous is not None:
+        event['event_type'] = _collapse(previous['event_type'], event_type)
+
+    if event['event_type'] is not None:
+        events[key] = event
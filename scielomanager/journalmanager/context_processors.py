@@ -23,7 +23,7 @@ def show_system_notes(request):
     Add system notes as maintenance events, notes, etc to the context
     """
     def wrap():
-        return maintenance_models.Event.objects.scheduled_events()
+        return maintenance_models.maintenance_state.scheduled_events()
 
     return {'system_notes': wrap}
 
@@ -34,7 +34,7 @@ def show_system_notes_blocking_users(request):
     as maintenance events, notes, etc to the context
     """
     def wrap():
-        return maintenance_models.Event.objects.blocking_users_scheduled_event()
+        return maintenance_models.maintenance_state.blocking_users_scheduled_event()
 
     return {'blocking_users_system_note': wrap}
 
@@ -45,7 +45,7 @@ def on_maintenance(request):
     maintenance events.
     """
     def wrap():
-        return maintenance_models.Event.on_maintenance()
+        return maintenance_models.maintenance_state.on_maintenance()
 
     return {'on_maintenance': wrap}
 
@@ -66,8 +66,15 @@ def show_user_collections(request):
 
 def add_default_collection(request):
     if request.user.is_authenticated():
+        membership = models.UserCollections.get_membership_map(request.user)
+        default_ids = [collection_id for collection_id, (is_default, is_manager)
+                       in membership.items() if is_default]
+
         try:
-            collection = models.Collection.objects.get_default_by_user(request.user)
+            if default_ids:
+                collection = models.Collection.objects.get(pk=default_ids[0])
+            else:
+                collection = models.Collection.objects.get_default_by_user(request.user)
         except models.Collection.DoesNotExist:
             return {}
         else:
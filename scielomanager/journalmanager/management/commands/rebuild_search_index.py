@@ -0,0 +1,21 @@
+"""
+Command to build again the search index of journals, sponsors and
+sections. The index of the existing objects is built by migration 0059.
+"""
+from django.core.management.base import BaseCommand
+
+from journalmanager import models
+from journalmanager import search
+
+
+class Command(BaseCommand):
+    help = 'indexes every journal, sponsor and section for the search'
+
+    def handle(self, *args, **options):
+        for model in [models.Journal, models.Sponsor, models.Section]:
+            count = 0
+            for instance in model.nocacheobjects.all().iterator():
+                search.index(instance)
+                count += 1
+
+            self.stdout.write('%s %s indexed\n' % (count, model._meta.verbose_name_plural))
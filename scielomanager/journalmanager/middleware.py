@@ -0,0 +1,30 @@
+# coding: utf-8
+from django.db import transaction
+
+from journalmanager import changesfeed
+
+
+class DataChangeEventMiddleware(object):
+    """
+    Buffers the DataChangeEvents recorded while handling the request and
+    writes them at once, before the transaction is committed. Must be
+    placed after ``TransactionMiddleware``.
+
+    The transaction is committed here, so that the events are published
+    only when visible to the consumers of the changes feed.
+    """
+    def process_request(self, request):
+        changesfeed.begin()
+
+    def process_response(self, request, response):
+        changesfeed.flush()
+
+        if transaction.is_managed() and transaction.is_dirty():
+            transaction.commit()
+        changesfeed.publish_committed()
+
+        return response
+
+    def process_exception(self, request, exception):
+        changesfeed.discard()
+        changesfeed.discard_announced()
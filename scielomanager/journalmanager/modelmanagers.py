@@ -25,6 +25,7 @@ Custom instance of ``models.query.QuerySet``
   and presentation purposes.
 * ``simple_search`` (optional) performs a simple search query on one or more
   meaningful fields. accepts only 1 string as search the search term.
+  the indexed models are searched through ``journalmanager.search``.
 * ``available`` returns all objects not marked as trash.
 * ``unavailable`` returns all objects marked as trash.
 
@@ -33,6 +34,7 @@ import caching.base
 
 from scielomanager.utils import usercontext
 from scielomanager.utils.modelmanagers import UserObjectQuerySet, UserObjectManager
+from . import search
 
 user_request_context = usercontext.get_finder()
 
@@ -48,7 +50,7 @@ class JournalQuerySet(UserObjectQuerySet):
         return self.filter(title__istartswith=unicode(char))
 
     def simple_search(self, term):
-        return self.filter(title__icontains=unicode(term))
+        return search.filter(self, unicode(term))
 
     def available(self):
         return self.filter(is_trashed=False)
@@ -83,6 +85,9 @@ class SectionQuerySet(UserObjectQuerySet):
         return self.filter(
             journal__collection=get_active_collection())
 
+    def simple_search(self, term):
+        return search.filter(self, unicode(term))
+
     def available(self):
         return self.filter(is_trashed=False)
 
@@ -108,7 +113,7 @@ class SponsorQuerySet(UserObjectQuerySet):
         return self.filter(name__istartswith=unicode(char))
 
     def simple_search(self, term):
-        return self.filter(name__icontains=unicode(term))
+        return search.filter(self, unicode(term))
 
     def available(self):
         return self.filter(is_trashed=False)
@@ -12,20 +12,23 @@ except ImportError:
     from ordereddict import OrderedDict
 
 from django.db import (
+    connection,
     models,
     transaction,
     IntegrityError,
     DatabaseError,
     )
 
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
 from django.contrib.auth.models import User
 from django.utils.translation import ugettext_lazy as _
 from django.utils.translation import ugettext as __
+from django.utils import timezone
 from django.conf import settings
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, pre_delete, post_delete
 from django.dispatch import receiver
 from django.template.defaultfilters import slugify
 from django.core.exceptions import ImproperlyConfigured
@@ -34,18 +37,38 @@ from tastypie.models import create_api_key
 import jsonfield
 
 from scielomanager.utils import base28
+from scielomanager.utils import usercontext
+from scielomanager.utils.middlewares import threadlocal
 from . import modelmanagers
+from . import changesfeed
+from . import search
 
 User.__bases__ = (caching.base.CachingMixin, models.Model)
 User.add_to_class('objects', caching.base.CachingManager())
 
 logger = logging.getLogger(__name__)
 
+MEMBERSHIP_CACHE_KEY = 'journalmanager:usercollections:membership:%s'
+
 EVENT_TYPES = [(ev_type, ev_type) for ev_type in ['added', 'deleted', 'updated']]
 ISSUE_DEFAULT_LICENSE_HELP_TEXT = _(u"If not defined, will be applied the related journal's use license. \
 The SciELO default use license is BY-NC. Please visit: http://ref.scielo.org/jf5ndd (5.2.11. Política de direitos autorais) for more details.")
 
 
+def as_availability(is_available):
+    """
+    Coerces ``is_available``, which may come from a querystring, to a
+    boolean. Values other than ``0`` mean available.
+    """
+    if isinstance(is_available, bool):
+        return is_available
+
+    try:
+        return int(is_available) != 0
+    except (ValueError, TypeError):
+        return True
+
+
 def get_user_collections(user_id):
     """
     Return all the collections of a given user, The returned collections are the collections where the
@@ -81,17 +104,8 @@ class AppCustomManager(caching.base.CachingManager):
         Filter the queryset based on its availability.
         """
         data_queryset = self.get_query_set()
-
-        if not isinstance(is_available, bool):
-            try:
-                if int(is_available) == 0:
-                    is_available = False
-                else:
-                    is_available = True
-            except (ValueError, TypeError):
-                is_available = True
-
-        data_queryset = data_queryset.filter(is_trashed=not is_available)
+        data_queryset = data_queryset.filter(
+            is_trashed=not as_availability(is_available))
 
         return data_queryset
 
@@ -364,6 +378,7 @@ class Collection(caching.base.CachingMixin, models.Model):
                                        user=user,
                                        is_default=is_default,
                                        is_manager=is_manager)
+        usercontext.invalidate()
 
     def remove_user(self, user):
         """
@@ -377,6 +392,7 @@ class Collection(caching.base.CachingMixin, models.Model):
             return None
         else:
             uc.delete()
+            usercontext.invalidate()
 
     def make_default_to_user(self, user):
         """
@@ -387,28 +403,25 @@ class Collection(caching.base.CachingMixin, models.Model):
             collection=self, user=user)
         uc.is_default = True
         uc.save()
+        usercontext.invalidate()
 
     def is_default_to_user(self, user):
         """
         Returns a boolean value depending if the current collection
         is set as default to the given user.
         """
-        try:
-            uc = UserCollections.objects.get(collection=self, user=user)
-            return uc.is_default
-        except UserCollections.DoesNotExist:
-            return False
+        is_default, is_manager = UserCollections.get_membership_map(user).get(
+            self.pk, (False, False))
+        return is_default
 
     def is_managed_by_user(self, user):
         """
         Returns a boolean value depending if the current collection
         is managed by the given user.
         """
-        try:
-            uc = UserCollections.objects.get(collection=self, user=user)
-            return uc.is_manager
-        except UserCollections.DoesNotExist:
-            return False
+        is_default, is_manager = UserCollections.get_membership_map(user).get(
+            self.pk, (False, False))
+        return is_manager
 
 
 class UserCollections(caching.base.CachingMixin, models.Model):
@@ -423,6 +436,42 @@ class UserCollections(caching.base.CachingMixin, models.Model):
     class Meta:
         unique_together = ("user", "collection", )
 
+    @classmethod
+    def get_membership_map(cls, user):
+        """
+        Returns a dict mapping the ids of the collections ``user`` is part
+        of to their ``(is_default, is_manager)`` flags.
+
+        The map is loaded with a single query, and kept in the cache and
+        on the current request until the user memberships change.
+        """
+        key = MEMBERSHIP_CACHE_KEY % user.pk
+
+        request_cache = threadlocal.get_request_cache()
+        if request_cache is not None and key in request_cache:
+            return request_cache[key]
+
+        membership = cache.get(key)
+        if membership is None:
+            membership = dict((collection_id, (is_default, is_manager))
+                for collection_id, is_default, is_manager in cls.nocacheobjects.filter(
+                    user=user).values_list('collection', 'is_default', 'is_manager'))
+            cache.set(key, membership)
+
+        if request_cache is not None:
+            request_cache[key] = membership
+
+        return membership
+
+    @classmethod
+    def invalidate_membership_map(cls, user_id):
+        key = MEMBERSHIP_CACHE_KEY % user_id
+        cache.delete(key)
+
+        request_cache = threadlocal.get_request_cache()
+        if request_cache is not None:
+            request_cache.pop(key, None)
+
 
 class Institution(caching.base.CachingMixin, models.Model):
 
@@ -598,22 +647,59 @@ class Journal(caching.base.CachingMixin, models.Model):
         self.save()
 
     def issues_as_grid(self, is_available=True):
-        objects_all = self.issue_set.available(is_available).order_by(
-            '-publication_year', '-volume')
+        """
+        Returns the issues of the journal grouped by publication year and
+        volume, both in descending order, and sorted by ``order`` inside
+        each volume.
 
-        grid = OrderedDict()
+        The layout of the grid is persisted as a JournalIssuesGrid, so
+        only the issues are fetched when it is up to date. Layouts
+        referring to missing issues, e.g. deleted without signals, are
+        built again.
+        """
+        def fetch(layout):
+            pks = set(pk for year, volumes in layout for volume, pks in volumes for pk in pks)
+            return self.issue_set.in_bulk(pks), pks
+
+        layout = JournalIssuesGrid.get_layout(self, is_available)
+        issues, pks = fetch(layout)
+
+        if len(issues) < len(pks):
+            JournalIssuesGrid.invalidate(self.pk)
+            layout = JournalIssuesGrid.get_layout(self, is_available)
+            issues, pks = fetch(layout)
 
-        for issue in objects_all:
-            year_node = grid.setdefault(issue.publication_year, OrderedDict())
-            volume_node = year_node.setdefault(issue.volume, [])
-            volume_node.append(issue)
+        grid = OrderedDict()
 
-        for year, volume in grid.items():
-            for vol, issues in volume.items():
-                issues.sort(key=lambda x: x.order)
+        for year, volumes in layout:
+            year_node = grid.setdefault(year, OrderedDict())
+            for volume, pks in volumes:
+                year_node[volume] = [issues[pk] for pk in pks if pk in issues]
 
         return grid
 
+    def build_issues_grid_layout(self, is_available=True):
+        """
+        Returns the layout of the issues grid as a list of
+        ``[year, [[volume, [issue pk, ...]], ...]]``.
+        """
+        issues = self.issue_set.available(is_available).order_by(
+            '-publication_year', '-volume', 'order', 'pk').values_list(
+            'pk', 'publication_year', 'volume')
+
+        layout = []
+
+        for pk, year, volume in issues:
+            if not layout or layout[-1][0] != year:
+                layout.append([year, []])
+            volumes = layout[-1][1]
+
+            if not volumes or volumes[-1][0] != volume:
+                volumes.append([volume, []])
+            volumes[-1][1].append(pk)
+
+        return layout
+
     def has_issues(self, issues):
         """
         Returns ``True`` if all the given issues are bound to the journal.
@@ -630,27 +716,51 @@ class Journal(caching.base.CachingMixin, models.Model):
         Make persistent the ordering received as a list of ``pk``,
         to all the issues in a given ``publication_year`` and ``volume``.
 
-        The lenght of ``new_order`` must match with the subset of
-        issues by ``publication_year`` and ``volume``.
+        ``new_order`` must contain exactly the issues by ``publication_year``
+        and ``volume``, otherwise ``ValueError`` is raised.
+
+        The new values are written with a single UPDATE, so ``Issue.save``
+        and its signals are bypassed: the cache invalidation and the
+        DataChangeEvents are done here, once for the whole batch.
         """
         filters = {'publication_year': publication_year}
         if volume:
             filters['volume'] = volume
 
-        issues = self.issue_set.filter(**filters)
+        issues = dict((issue.pk, issue)
+            for issue in Issue.nocacheobjects.filter(journal=self, **filters))
 
-        issues_count = issues.count()
+        new_order = [int(pk) for pk in new_order]
         new_order_count = len(new_order)
+        issues_count = len(issues)
 
         if new_order_count != issues_count:
             raise ValueError('new_order lenght does not match. %s:%s' % (new_order_count, issues_count))
 
-        with transaction.commit_on_success():
-            for i, pk in enumerate(new_order):
-                order = i + 1
-                issue = issues.get(pk=pk)
+        if set(new_order) != set(issues):
+            raise ValueError('new_order must contain the pks of the issues being reordered')
+
+        changed = []
+        for order, pk in enumerate(new_order, start=1):
+            issue = issues[pk]
+            if issue.order != order:
                 issue.order = order
-                issue.save()
+                changed.append(issue)
+
+        if not changed:
+            return None
+
+        with transaction.commit_on_success():
+            with changesfeed.buffered():
+                Issue.bulk_update_order(changed)
+
+                for issue in changed:
+                    changesfeed.record(issue, 'updated', self.collection_id)
+
+            Issue.objects.invalidate(*changed)
+            JournalIssuesGrid.invalidate(self.pk)
+
+        changesfeed.publish_committed()
 
     def is_editor(self, user):
         """
@@ -788,6 +898,9 @@ class Section(caching.base.CachingMixin, models.Model):
     ``legacy_code`` contains the section code used by the old
     title manager. We've decided to store this value just by
     historical reasons, and we don't know if it will last forever.
+
+    ``display_title`` and ``sort_key`` are denormalized from the titles,
+    and updated whenever they change.
     """
     #Custom manager
     objects = SectionCustomManager()
@@ -801,9 +914,28 @@ class Section(caching.base.CachingMixin, models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     is_trashed = models.BooleanField(_('Is trashed?'), default=False, db_index=True)
+    display_title = models.TextField(default='', blank=True, editable=False)
+    sort_key = models.CharField(max_length=256, default='', blank=True, db_index=True, editable=False)
 
     def __unicode__(self):
-        return ' / '.join([sec_title.title for sec_title in self.titles.all().order_by('language')])
+        return self.display_title
+
+    def _build_display_title(self):
+        titles = SectionTitle.nocacheobjects.filter(section=self).order_by(
+            'language').values_list('title', flat=True)
+
+        self.display_title = u' / '.join(titles)
+        self.sort_key = search.fold(self.display_title)[:256]
+
+    def update_display_title(self):
+        """
+        Stores the display title and the sort key of the section, without
+        saving the other fields.
+        """
+        self._build_display_title()
+        Section.nocacheobjects.filter(pk=self.pk).update(
+            display_title=self.display_title, sort_key=self.sort_key)
+        Section.objects.invalidate(self)
 
     @property
     def actual_code(self):
@@ -866,8 +998,12 @@ class Section(caching.base.CachingMixin, models.Model):
         """
         If ``code`` already exists, the section is saved. Else,
         the ``code`` will be generated before the save process is
-        performed.
+        performed. The display title of saved sections is built again
+        from their titles.
         """
+        if self.pk:
+            self._build_display_title()
+
         if self.code:
             super(Section, self).save(*args, **kwargs)
         else:
@@ -988,6 +1124,35 @@ class Issue(caching.base.CachingMixin, models.Model):
     def _get_default_use_license(self):
         return self.journal.use_license
 
+    @classmethod
+    def bulk_update_order(cls, issues):
+        """
+        Writes the ``order`` of all ``issues`` with a single UPDATE.
+
+        Signals are not sent and the cache is not invalidated.
+        """
+        qn = connection.ops.quote_name
+        pk_column = qn(cls._meta.pk.column)
+        updated_field = cls._meta.get_field('updated')
+
+        sql = 'UPDATE %s SET %s = CASE %s %s END, %s = %%s WHERE %s IN (%s)' % (
+            qn(cls._meta.db_table),
+            qn(cls._meta.get_field('order').column),
+            pk_column,
+            ' '.join(['WHEN %s THEN %s'] * len(issues)),
+            qn(updated_field.column),
+            pk_column,
+            ', '.join(['%s'] * len(issues)),
+        )
+
+        params = [value for issue in issues for value in (issue.pk, issue.order)]
+        params.append(updated_field.get_db_prep_save(timezone.now(), connection))
+        params.extend(issue.pk for issue in issues)
+
+        cursor = connection.cursor()
+        cursor.execute(sql, params)
+        transaction.commit_unless_managed()
+
     def save(self, *args, **kwargs):
         self.label = unicode(self)
 
@@ -1005,6 +1170,38 @@ class Issue(caching.base.CachingMixin, models.Model):
         super(Issue, self).save(*args, **kwargs)
 
 
+class JournalIssuesGrid(models.Model):
+    """
+    Persisted layout of ``Journal.issues_as_grid``, for the available
+    or the trashed issues of a journal.
+
+    It is removed whenever an issue of the journal is saved, deleted or
+    reordered, and built again on the next read.
+    """
+    journal = models.ForeignKey(Journal, related_name='issues_grids')
+    is_available = models.BooleanField(default=True)
+    layout = jsonfield.JSONField()
+
+    class Meta:
+        unique_together = ('journal', 'is_available')
+
+    @classmethod
+    def get_layout(cls, journal, is_available=True):
+        is_available = as_availability(is_available)
+
+        try:
+            return cls.objects.get(journal=journal, is_available=is_available).layout
+        except cls.DoesNotExist:
+            layout = journal.build_issues_grid_layout(is_available)
+            cls.objects.get_or_create(journal=journal, is_available=is_available,
+                defaults={'layout': layout})
+            return layout
+
+    @classmethod
+    def invalidate(cls, journal_id):
+        cls.objects.filter(journal=journal_id).delete()
+
+
 class IssueTitle(caching.base.CachingMixin, models.Model):
     objects = caching.base.CachingManager()
     nocacheobjects = models.Manager()
@@ -1036,9 +1233,17 @@ class DataChangeEvent(models.Model):
     """
     Tracks data changes to make possible for consumer apps to know
     what to sync.
+
+    The changes feed is read in ``pk`` order, optionally by collection,
+    and is backed by an index on (collection, id) created in migration
+    0053.
+
+    Events are recorded by signal receivers for the models listed in
+    ``DATA_CHANGE_TRACKED_MODELS``. ``user`` is empty for changes made
+    outside of a request.
     """
     changed_at = models.DateTimeField(auto_now=True)
-    user = models.ForeignKey(User)
+    user = models.ForeignKey(User, null=True, blank=True)
     content_type = models.ForeignKey(ContentType)
     object_id = models.PositiveIntegerField()
     content_object = generic.GenericForeignKey('content_type', 'object_id')
@@ -1046,6 +1251,20 @@ class DataChangeEvent(models.Model):
     collection = models.ForeignKey(Collection)
 
 
+class SearchTerm(models.Model):
+    """
+    Inverted index of the journals, sponsors and sections, maintained by
+    ``journalmanager.search``: one record for each folded word of an
+    object, with the weight of the field it was taken from.
+
+    On PostgreSQL, ``term`` is also indexed by trigrams (migration 0056).
+    """
+    content_type = models.ForeignKey(ContentType)
+    object_id = models.PositiveIntegerField(db_index=True)
+    term = models.CharField(max_length=64, db_index=True)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+
 class PressRelease(caching.base.CachingMixin, models.Model):
     """
     Represents a press-release bound to a Journal.
@@ -1225,4 +1444,107 @@ def journal_pub_status_post_save(sender, instance, created, **kwargs):
     JournalPublicationEvents.objects.create(journal=instance,
         status=instance.pub_status, changed_by=instance.pub_status_changed_by, reason=instance.pub_status_reason)
 
+
+@receiver(post_save, sender=Issue, dispatch_uid='journalmanager.models.issue_grid_post_save')
+@receiver(post_delete, sender=Issue, dispatch_uid='journalmanager.models.issue_grid_post_delete')
+def invalidate_issues_grid(sender, instance, **kwargs):
+    """
+    Drops the persisted issues grid of the journal the issue belongs to.
+    """
+    JournalIssuesGrid.invalidate(instance.journal_id)
+
+
+@receiver(post_save, sender=UserCollections, dispatch_uid='journalmanager.models.usercollections_post_save')
+@receiver(post_delete, sender=UserCollections, dispatch_uid='journalmanager.models.usercollections_post_delete')
+def invalidate_membership_map(sender, instance, **kwargs):
+    """
+    Drops the cached membership map of the user.
+    """
+    UserCollections.invalidate_membership_map(instance.user_id)
+
+
+@receiver(post_save, sender=Journal, dispatch_uid='journalmanager.models.journal_search_post_save')
+@receiver(post_save, sender=Sponsor, dispatch_uid='journalmanager.models.sponsor_search_post_save')
+@receiver(post_save, sender=Section, dispatch_uid='journalmanager.models.section_search_post_save')
+def update_search_index(sender, instance, **kwargs):
+    search.index(instance)
+
+
+@receiver(post_delete, sender=Journal, dispatch_uid='journalmanager.models.journal_search_post_delete')
+@receiver(post_delete, sender=Sponsor, dispatch_uid='journalmanager.models.sponsor_search_post_delete')
+@receiver(post_delete, sender=Section, dispatch_uid='journalmanager.models.section_search_post_delete')
+def remove_from_search_index(sender, instance, **kwargs):
+    search.unindex(instance)
+
+
+@receiver(post_save, sender=SectionTitle, dispatch_uid='journalmanager.models.sectiontitle_search_post_save')
+@receiver(post_delete, sender=SectionTitle, dispatch_uid='journalmanager.models.sectiontitle_search_post_delete')
+def update_section_titles(sender, instance, **kwargs):
+    """
+    Sections are shown, sorted and searched by their titles.
+    """
+    if not Section.nocacheobjects.filter(pk=instance.section_id).exists():
+        return None  # deleted in cascade
+
+    # the section instance bound to the title, if any, is updated too.
+    section = instance.section
+    section.update_display_title()
+    search.index(section)
+
+
+####
+# DataChangeEvent capture for the models consumed by sync clients.
+####
+DATA_CHANGE_TRACKED_MODELS = {
+    # model: callable returning the collection_id of an instance
+    Journal: lambda journal: journal.collection_id,
+    Issue: lambda issue: issue.journal.collection_id,
+    Section: lambda section: section.journal.collection_id,
+    RegularPressRelease: lambda prelease: prelease.issue.journal.collection_id,
+    AheadPressRelease: lambda prelease: prelease.journal.collection_id,
+}
+
+
+def record_data_change_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return None
+
+    changesfeed.record(instance, 'added' if created else 'updated',
+        DATA_CHANGE_TRACKED_MODELS[sender](instance))
+
+
+def fetch_collection_on_delete(sender, instance, **kwargs):
+    """
+    The collection must be known before the related rows are deleted.
+    """
+    instance._data_change_collection_id = DATA_CHANGE_TRACKED_MODELS[sender](instance)
+
+
+def record_data_change_on_delete(sender, instance, **kwargs):
+    collection_id = getattr(instance, '_data_change_collection_id', None)
+
+    # the collection itself may have been deleted in cascade.
+    if collection_id and Collection.nocacheobjects.filter(pk=collection_id).exists():
+        changesfeed.record(instance, 'deleted', collection_id)
+
+
+for tracked_model in DATA_CHANGE_TRACKED_MODELS:
+    uid = tracked_model.__name__.lower()
+    post_save.connect(record_data_change_on_save, sender=tracked_model,
+        dispatch_uid='journalmanager.models.%s_data_change_post_save' % uid)
+    pre_delete.connect(fetch_collection_on_delete, sender=tracked_model,
+        dispatch_uid='journalmanager.models.%s_data_change_pre_delete' % uid)
+    post_delete.connect(record_data_change_on_delete, sender=tracked_model,
+        dispatch_uid='journalmanager.models.%s_data_change_post_delete' % uid)
+
+
+@receiver(post_save, sender=DataChangeEvent, dispatch_uid='journalmanager.models.datachangeevent_post_save')
+def datachangeevent_post_save(sender, instance, created, **kwargs):
+    """
+    Wakes the consumers waiting for new events on the changes feed, once
+    the event is committed.
+    """
+    if created:
+        changesfeed.announce(instance.pk)
+
 models.signals.post_save.connect(create_api_key, sender=User)
@@ -0,0 +1,258 @@
+# coding: utf-8
+"""
+Indexed search of journals, sponsors and sections.
+
+The words of the fields listed at ``SEARCH_FIELDS`` are folded
+(lowercased, without accents) and stored as SearchTerm records whenever
+the objects are saved, building an inverted index. The words of a query
+are matched by prefix, and the objects matching all of them are ranked
+by the weight of the fields they were found in. Exact words weigh more
+than prefixes.
+
+The terms are looked up by the backend set at ``settings.SEARCH_BACKEND``:
+
+* ``InvertedIndexBackend`` (the default) matches the words by prefix,
+  through the b-tree index on ``SearchTerm.term``, on any database;
+* ``PostgresTrigramBackend`` also matches misspelled words by trigram
+  similarity, through the ``pg_trgm`` index created by migration 0056
+  on PostgreSQL when the extension is installed (it is not installed
+  by the migration; see ``settings_local.include-TEMPLATE``).
+"""
+import re
+import unicodedata
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.contrib.contenttypes.models import ContentType
+from django.utils.importlib import import_module
+
+
+SEARCH_BACKEND = getattr(settings, 'SEARCH_BACKEND',
+                         'journalmanager.search.InvertedIndexBackend')
+
+TERM_MAX_LENGTH = 64
+EXACT_MATCH_BONUS = 2
+
+WORD_RE = re.compile(r'\w+(?:-\w+)*', re.UNICODE)
+
+
+def _journal_fields(journal):
+    return [
+        (journal.title, 4),
+        (journal.title_iso, 3),
+        (journal.short_title, 3),
+        (journal.acronym, 3),
+        (journal.print_issn, 2),
+        (journal.eletronic_issn, 2),
+    ]
+
+
+def _sponsor_fields(sponsor):
+    return [
+        (sponsor.name, 4),
+        (sponsor.acronym, 3),
+    ]
+
+
+def _section_fields(section):
+    return [(title, 4) for title in section.titles.values_list('title', flat=True)]
+
+
+# model name: callable returning the ``(text, weight)`` of an instance.
+SEARCH_FIELDS = {
+    'journal': _journal_fields,
+    'sponsor': _sponsor_fields,
+    'section': _section_fields,
+}
+
+
+def fold(text):
+    """
+    Returns ``text`` lowercased and without accents.
+    """
+    decomposed = unicodedata.normalize('NFKD', unicode(text))
+    return u''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text, parts=True):
+    """
+    Returns the folded words of ``text``. Hyphenated words, e.g. ISSNs,
+    are kept whole, and also split in their parts if ``parts`` is ``True``.
+    """
+    words = []
+    for word in WORD_RE.findall(fold(text)):
+        words.append(word)
+        if parts and '-' in word:
+            words.extend(word.split('-'))
+
+    return [word[:TERM_MAX_LENGTH] for word in words]
+
+
+def is_indexed(model):
+    return model._meta.object_name.lower() in SEARCH_FIELDS
+
+
+def build_terms(fields):
+    """
+    Returns the terms of the ``(text, weight)`` pairs of ``fields``,
+    mapped to their greatest weight.
+    """
+    terms = {}
+    for text, weight in fields:
+        if not text:
+            continue
+
+        for word in tokenize(text):
+            terms[word] = max(terms.get(word, 0), weight)
+
+    return terms
+
+
+def index(instance):
+    """
+    Updates the terms of ``instance``. Nothing is written if they are
+    the same.
+    """
+    from .models import SearchTerm
+
+    content_type = ContentType.objects.get_for_model(instance)
+    terms = build_terms(SEARCH_FIELDS[content_type.model](instance))
+
+    indexed = SearchTerm.objects.filter(content_type=content_type, object_id=instance.pk)
+    if dict(indexed.values_list('term', 'weight')) == terms:
+        return None
+
+    indexed.delete()
+    SearchTerm.objects.bulk_create([
+        SearchTerm(content_type=content_type, object_id=instance.pk, term=term, weight=weight)
+        for term, weight in terms.items()])
+
+
+def unindex(instance):
+    from .models import SearchTerm
+
+    SearchTerm.objects.filter(content_type=ContentType.objects.get_for_model(instance),
+                              object_id=instance.pk).delete()
+
+
+class InvertedIndexBackend(object):
+    """
+    Matches the words by prefix.
+    """
+    def lookup(self, terms, word):
+        """
+        Returns the ``terms`` matching ``word``, as a queryset.
+        """
+        return terms.filter(term__startswith=word)
+
+    def score(self, word, term, weight):
+        return weight * EXACT_MATCH_BONUS if term == word else weight
+
+    def match(self, terms, word):
+        """
+        Returns ``{object_id: score}`` of the ``terms`` matching ``word``.
+        """
+        scores = {}
+        for object_id, term, weight in self.lookup(terms, word).values_list(
+                'object_id', 'term', 'weight'):
+            scores[object_id] = max(scores.get(object_id, 0), self.score(word, term, weight))
+
+        return scores
+
+
+class PostgresTrigramBackend(InvertedIndexBackend):
+    """
+    Matches the words by prefix, or by trigram similarity with half of
+    the weight. Requires the ``pg_trgm`` extension.
+    """
+    def lookup(self, terms, word):
+        similar = terms.extra(where=['journalmanager_searchterm.term %% %s'], params=[word])
+
+        return super(PostgresTrigramBackend, self).lookup(terms, word) | similar
+
+    def score(self, word, term, weight):
+        if term.startswith(word):
+            return super(PostgresTrigramBackend, self).score(word, term, weight)
+
+        return weight / 2.0
+
+
+def get_backend(import_path=SEARCH_BACKEND):
+    module, attr = import_path.rsplit('.', 1)
+    try:
+        mod = import_module(module)
+    except ImportError as e:
+        raise ImproperlyConfigured('Error importing module %s: "%s"' %
+                                   (module, e))
+    try:
+        Backend = getattr(mod, attr)
+    except AttributeError:
+        raise ImproperlyConfigured('Module "%s" does not define a "%s" '
+                                   'class.' % (module, attr))
+    return Backend()
+
+
+def _index_of(model):
+    from .models import SearchTerm
+
+    return SearchTerm.objects.filter(content_type=ContentType.objects.get_for_model(model))
+
+
+def filter(queryset, query):
+    """
+    Returns ``queryset`` restricted to the objects matching every word of
+    ``query``. The index is looked up by subqueries, within the query of
+    the objects.
+    """
+    words = set(tokenize(query, parts=False))
+    if not words:
+        return queryset.none()
+
+    backend = get_backend()
+    terms = _index_of(queryset.model)
+    for word in words:
+        queryset = queryset.filter(pk__in=backend.lookup(terms, word).values('object_id'))
+
+    return queryset
+
+
+def rank(queryset, query):
+    """
+    Returns ``[(pk, score)]`` of the objects of ``queryset`` matching
+    every word of ``query``, the best ones first. Only the terms of the
+    matching objects are scored.
+    """
+    words = set(tokenize(query, parts=False))
+    if not words:
+        return []
+
+    backend = get_backend()
+    terms = _index_of(queryset.model).filter(
+        object_id__in=filter(queryset, query).values('pk'))
+
+    scores = None
+    for word in words:
+        matches = backend.match(terms, word)
+        if scores is None:
+            scores = matches
+        else:
+            scores = dict((object_id, score + matches[object_id])
+                          for object_id, score in scores.items() if object_id in matches)
+
+        if not scores:
+            return []
+
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def search(queryset, query):
+    """
+    Returns the objects of ``queryset`` matching ``query``, ranked.
+    """
+    ranked = rank(queryset, query)
+    if not ranked:
+        return []
+
+    objects = dict((obj.pk, obj) for obj in filter(queryset, query))
+
+    return [objects[pk] for pk, score in ranked if pk in objects]
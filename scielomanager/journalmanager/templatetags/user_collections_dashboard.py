@@ -2,15 +2,18 @@ from django import template
 from django.core.urlresolvers import reverse
 from django.utils.translation import ugettext as _
 
+from journalmanager.models import UserCollections
+
 
 register = template.Library()
 
 
 def user_collections_dashboard(collections, user):
     html = ''
+    membership = UserCollections.get_membership_map(user)
 
     for collection in collections:
-        is_default = collection.is_default_to_user(user)
+        is_default, is_manager = membership.get(collection.pk, (False, False))
 
         classname = u'dropdown active' if is_default else u'dropdown'
         name = collection.name
@@ -40,7 +43,7 @@ def user_collections_dashboard(collections, user):
                        activation_label=activation_label,
                        lowercase_name=name.lower()).strip()
 
-        if collection.is_managed_by_user(user):
+        if is_manager:
             html_edit = u"""<li id="edit-{lowercase_name}">
                               <a href="{edit_url}">
                                 <i class="icon-edit"></i> {edit_label}
@@ -0,0 +1,190 @@
+# coding: utf-8
+import time
+import threading
+
+from django.test import TestCase
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache.backends.locmem import LocMemCache
+
+from journalmanager import changesfeed, models
+from journalmanager.middleware import DataChangeEventMiddleware
+from journalmanager.tests import modelfactories
+
+
+class ChangesFeedTests(TestCase):
+
+    def test_created_events_are_published(self):
+        event = modelfactories.DataChangeEventFactory.create()
+        changesfeed.publish_committed()
+
+        self.assertTrue(changesfeed.latest_seq() >= event.pk)
+
+    def test_events_are_published_once_committed(self):
+        seq = changesfeed.latest_seq() + 1
+        changesfeed.announce(seq)
+        self.assertTrue(changesfeed.latest_seq() < seq)
+
+        changesfeed.publish_committed()
+        self.assertEqual(changesfeed.latest_seq(), seq)
+
+    def test_discarded_events_are_not_published(self):
+        seq = changesfeed.latest_seq() + 1
+        changesfeed.announce(seq)
+        changesfeed.discard_announced()
+        changesfeed.publish_committed()
+
+        self.assertTrue(changesfeed.latest_seq() < seq)
+
+    def test_shared_seq_never_goes_back(self):
+        original_cache = changesfeed.cache
+        changesfeed.cache = LocMemCache('changesfeed', {})
+        changesfeed.cache.clear()
+        try:
+            changesfeed.publish(10)
+            changesfeed.publish(5)
+
+            self.assertEqual(changesfeed.cache.get(changesfeed.LATEST_SEQ_CACHE_KEY), 10)
+        finally:
+            changesfeed.cache = original_cache
+
+    def test_wait_for_returns_immediately_for_published_events(self):
+        changesfeed.publish(10)
+        self.assertTrue(changesfeed.wait_for(10, timeout=5))
+
+    def test_wait_for_times_out(self):
+        seq = changesfeed.latest_seq() + 1
+
+        start = time.time()
+        self.assertFalse(changesfeed.wait_for(seq, timeout=0.2, poll_interval=0.05))
+        self.assertTrue(time.time() - start >= 0.2)
+
+    def test_wait_for_is_woken_by_publish(self):
+        seq = changesfeed.latest_seq() + 1
+        publisher = threading.Timer(0.1, changesfeed.publish, args=[seq])
+
+        start = time.time()
+        publisher.start()
+        self.assertTrue(changesfeed.wait_for(seq, timeout=5))
+        self.assertTrue(time.time() - start < 5)
+        publisher.join()
+
+
+class DataChangeEventRecordingTests(TestCase):
+
+    def _events_for(self, obj):
+        return list(models.DataChangeEvent.objects.filter(
+            content_type=ContentType.objects.get_for_model(obj),
+            object_id=obj.pk).values_list('event_type', flat=True))
+
+    def test_creating_a_journal_records_added(self):
+        journal = modelfactories.JournalFactory.create()
+
+        self.assertEqual(self._events_for(journal), ['added'])
+
+    def test_updating_an_issue_records_updated(self):
+        issue = modelfactories.IssueFactory.create()
+        issue.save()
+
+        self.assertEqual(self._events_for(issue), ['added', 'updated'])
+
+    def test_event_is_bound_to_the_objects_collection(self):
+        issue = modelfactories.IssueFactory.create()
+        event = models.DataChangeEvent.objects.get(
+            content_type=ContentType.objects.get_for_model(issue),
+            object_id=issue.pk)
+
+        self.assertEqual(event.collection_id, issue.journal.collection_id)
+        self.assertIsNone(event.user)
+
+    def test_deleting_a_section_records_deleted(self):
+        section = modelfactories.SectionFactory.create()
+        section_pk = section.pk
+        section.delete()
+        section.pk = section_pk
+
+        self.assertEqual(self._events_for(section), ['added', 'deleted'])
+
+    def test_changes_are_collapsed_inside_buffered(self):
+        journal = modelfactories.JournalFactory.create()
+
+        with changesfeed.buffered():
+            journal.save()
+            journal.save()
+
+        self.assertEqual(self._events_for(journal), ['added', 'updated'])
+
+    def test_added_then_deleted_records_nothing(self):
+        journal = modelfactories.JournalFactory.create()
+
+        with changesfeed.buffered():
+            section = modelfactories.SectionFactory.create(journal=journal)
+            section_pk = section.pk
+            section.delete()
+        section.pk = section_pk
+
+        self.assertEqual(self._events_for(section), [])
+
+    def test_buffered_events_are_written_at_once(self):
+        journals = [modelfactories.JournalFactory.create() for i in range(3)]
+        before = models.DataChangeEvent.objects.count()
+
+        with changesfeed.buffered():
+            for journal in journals:
+                changesfeed.record(journal, 'updated', journal.collection_id)
+
+            # bulk insert + max(pk) to publish.
+            with self.assertNumQueries(2):
+                changesfeed.flush()
+        changesfeed.publish_committed()
+
+        self.assertEqual(models.DataChangeEvent.objects.count(), before + 3)
+        self.assertTrue(changesfeed.latest_seq() >=
+                        models.DataChangeEvent.objects.latest('pk').pk)
+
+    def test_buffered_events_are_discarded_on_error(self):
+        journal = modelfactories.JournalFactory.create()
+
+        try:
+            with changesfeed.buffered():
+                journal.save()
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertEqual(self._events_for(journal), ['added'])
+
+
+class DataChangeEventMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.middleware = DataChangeEventMiddleware()
+        self.journal = modelfactories.JournalFactory.create()
+
+    def test_events_are_written_with_the_response(self):
+        response = object()
+
+        self.middleware.process_request(None)
+        self.journal.save()
+        self.assertEqual(models.DataChangeEvent.objects.filter(
+            event_type='updated').count(), 0)
+
+        self.assertIs(self.middleware.process_response(None, response), response)
+        self.assertEqual(models.DataChangeEvent.objects.filter(
+            event_type='updated').count(), 1)
+
+    def test_events_are_published_with_the_response(self):
+        self.middleware.process_request(None)
+        self.journal.save()
+        self.middleware.process_response(None, object())
+
+        self.assertTrue(changesfeed.latest_seq() >=
+                        models.DataChangeEvent.objects.latest('pk').pk)
+
+    def test_events_are_discarded_on_exception(self):
+        self.middleware.process_request(None)
+        self.journal.save()
+        self.middleware.process_exception(None, ValueError())
+        self.middleware.process_response(None, object())
+
+        self.assertEqual(models.DataChangeEvent.objects.filter(
+            event_type='updated').count(), 0)
@@ -7,6 +7,7 @@ from journalmanager import (
     modelmanagers,
 )
 from journalmanager.tests import modelfactories
+from scielomanager.utils import usercontext
 
 
 class JournalManagerTests(TestCase):
@@ -154,7 +155,7 @@ class JournalManagerTests(TestCase):
         user = self._make_user(collection)
 
         journal1 = modelfactories.JournalFactory.create(
-            title=u'ABC 123', collection=collection)
+            title=u'ABC 987', collection=collection)
         journal2 = modelfactories.JournalFactory.create(
             title=u'XYZ', collection=collection)
 
@@ -162,7 +163,7 @@ class JournalManagerTests(TestCase):
             return user.user_collection.all()
 
         user_journals = models.Journal.userobjects.all(
-            get_all_collections=get_user_collections).simple_search('123')
+            get_all_collections=get_user_collections).simple_search('987')
 
         self.assertEqual(user_journals.count(), 1)
         self.assertIn(journal1, user_journals)
@@ -1033,3 +1034,66 @@ class AheadPressReleaseManagerTests(TestCase):
 
         self.assertEqual(user_prs.count(), 1)
         self.assertIn(pr, user_prs)
+
+
+class UserRequestContextFinderTests(TestCase):
+
+    def setUp(self):
+        from django.test.client import RequestFactory
+        from scielomanager.utils.middlewares import threadlocal
+
+        self.collection = modelfactories.CollectionFactory.create()
+        self.user = auth.UserF(is_active=True)
+        self.collection.add_user(self.user, is_default=True)
+
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+        threadlocal.th_localstore._request = self.request
+
+        self.finder = usercontext.UserRequestContextFinder()
+
+    def tearDown(self):
+        from scielomanager.utils.middlewares import threadlocal
+        threadlocal.th_localstore._request = None
+
+    def test_active_collection_is_fetched_once_per_request(self):
+        with self.assertNumQueries(2):
+            for i in range(3):
+                self.assertEqual(
+                    self.finder.get_current_user_active_collection(),
+                    self.collection)
+
+    def test_collections_are_fetched_once_per_request(self):
+        with self.assertNumQueries(1):
+            for i in range(3):
+                self.assertEqual(
+                    list(self.finder.get_current_user_collections()),
+                    [self.collection])
+
+    def test_memoized_values_are_dropped_with_the_request(self):
+        from scielomanager.utils.middlewares import threadlocal
+
+        self.finder.get_current_user_active_collection()
+
+        request = self.request.__class__(self.request.environ)
+        request.user = self.user
+        threadlocal.th_localstore._request = request
+
+        with self.assertNumQueries(2):
+            self.finder.get_current_user_active_collection()
+
+    def test_changing_the_active_collection_invalidates_the_memoized_values(self):
+        collection = modelfactories.CollectionFactory.create()
+        collection.add_user(self.user)
+
+        self.finder.get_current_user_active_collection()
+        collection.make_default_to_user(self.user)
+
+        self.assertEqual(self.finder.get_current_user_active_collection(),
+                         collection)
+
+    def test_values_are_not_memoized_outside_of_requests(self):
+        from scielomanager.utils.middlewares import threadlocal
+        threadlocal.th_localstore._request = None
+
+        self.assertIsNone(self.finder.get_current_user_collections())
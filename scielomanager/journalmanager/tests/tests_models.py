@@ -67,6 +67,37 @@ class SectionTests(MockerTestCase):
         self.assertEqual(section.titles.all()[0].title, 'Original Article')
         self.assertEqual(section.titles.all()[0].language, language)
 
+    def test_display_title_and_sort_key_are_stored(self):
+        from journalmanager.models import Section
+
+        section_title = SectionTitleFactory.create(title=u'Éditorial')
+        stored = Section.nocacheobjects.get(pk=section_title.section.pk)
+
+        self.assertEqual(stored.display_title, u'Éditorial')
+        self.assertEqual(stored.sort_key, u'editorial')
+
+    def test_display_title_follows_the_removed_titles(self):
+        from journalmanager.models import Section
+
+        section_title = SectionTitleFactory.create()
+        section = section_title.section
+        section_title.delete()
+
+        self.assertEqual(unicode(section), u'')
+        self.assertEqual(Section.nocacheobjects.get(pk=section.pk).display_title, u'')
+
+    def test_save_builds_the_display_title_again(self):
+        from journalmanager.models import Section
+
+        section_title = SectionTitleFactory.create()
+        Section.nocacheobjects.filter(pk=section_title.section.pk).update(display_title=u'')
+
+        section = Section.nocacheobjects.get(pk=section_title.section.pk)
+        section.save()
+
+        self.assertEqual(Section.nocacheobjects.get(pk=section.pk).display_title,
+                         u'Artigos Originais')
+
     def test_suggest_code(self):
         gen = self.mocker.mock()
         gen(4)
@@ -410,6 +441,83 @@ class JournalTests(TestCase):
 
         self.assertEqual(grid.values()[0].keys(), expected)
 
+    def test_issues_grid_is_read_from_the_persisted_layout(self):
+        journal = JournalFactory.create()
+        for i in range(5):
+            journal.issue_set.add(IssueFactory.create(volume=9,
+                publication_year=2012))
+
+        expected = journal.issues_as_grid()
+
+        # the persisted layout + the issues.
+        with self.assertNumQueries(2):
+            grid = journal.issues_as_grid()
+
+        self.assertEqual(grid, expected)
+
+    def test_issues_grid_is_invalidated_on_issue_save(self):
+        journal = JournalFactory.create()
+        issue = IssueFactory.create(journal=journal, volume=9,
+            publication_year=2012)
+        journal.issues_as_grid()
+
+        issue.volume = '10'
+        issue.save()
+
+        self.assertEqual(journal.issues_as_grid()[2012].keys(), [u'10'])
+
+    def test_issues_grid_is_invalidated_on_trash_toggle(self):
+        journal = JournalFactory.create()
+        issue = IssueFactory.create(journal=journal, volume=9,
+            publication_year=2012)
+        journal.issues_as_grid()
+        journal.issues_as_grid(is_available=False)
+
+        issue.is_trashed = True
+        issue.save()
+
+        self.assertFalse(journal.issues_as_grid())
+        self.assertEqual(journal.issues_as_grid(is_available=False)[2012]['9'],
+                         [issue])
+
+    def test_issues_grid_is_invalidated_on_issue_delete(self):
+        journal = JournalFactory.create()
+        issue = IssueFactory.create(journal=journal, volume=9,
+            publication_year=2012)
+        journal.issues_as_grid()
+
+        issue.delete()
+
+        self.assertFalse(journal.issues_as_grid())
+
+    def test_issues_grid_is_rebuilt_when_issues_are_missing(self):
+        journal = JournalFactory.create()
+        issue = IssueFactory.create(journal=journal, volume=9,
+            publication_year=2012)
+        journal.issues_as_grid()
+
+        # e.g. an issue deleted without sending signals.
+        from journalmanager import models
+        models.JournalIssuesGrid.objects.filter(journal=journal).update(
+            layout=[[2012, [[u'9', [issue.pk, issue.pk + 1000]]]]])
+
+        self.assertEqual(journal.issues_as_grid()[2012]['9'], [issue])
+        self.assertEqual(models.JournalIssuesGrid.objects.get(
+            journal=journal, is_available=True).layout,
+            [[2012, [[u'9', [issue.pk]]]]])
+
+    def test_issues_grid_is_invalidated_on_reordering(self):
+        journal = JournalFactory.create()
+        issues = [IssueFactory.create(journal=journal, volume=9,
+            publication_year=2012) for i in range(3)]
+        journal.issues_as_grid()
+
+        new_order = [issues[2].pk, issues[0].pk, issues[1].pk]
+        journal.reorder_issues(new_order, volume=9, publication_year=2012)
+
+        self.assertEqual([issue.pk for issue in journal.issues_as_grid()[2012]['9']],
+                         new_order)
+
     def test_journal_has_issues_must_be_true(self):
         journal = JournalFactory.create()
         issues = []
@@ -486,6 +594,50 @@ class JournalTests(TestCase):
                                            volume=9,
                                            publication_year=2012))
 
+    def test_issues_reordering_must_contain_the_same_issues(self):
+        journal = JournalFactory.create()
+        issues = [IssueFactory.create(journal=journal, volume=9,
+            publication_year=2012) for i in range(3)]
+        stranger = IssueFactory.create(volume=9, publication_year=2012)
+
+        expected_order = [issues[0].pk, issues[1].pk, stranger.pk]
+
+        self.assertRaises(ValueError,
+            lambda: journal.reorder_issues(expected_order,
+                                           volume=9,
+                                           publication_year=2012))
+
+    def test_issues_reordering_runs_a_fixed_number_of_queries(self):
+        journal = JournalFactory.create()
+        issues = [IssueFactory.create(journal=journal, volume=9,
+            publication_year=2012) for i in range(10)]
+
+        new_order = [issue.pk for issue in reversed(issues)]
+
+        # select issues, update order, insert events, publish the last
+        # event and drop the issues grid.
+        with self.assertNumQueries(5):
+            journal.reorder_issues(new_order, volume=9, publication_year=2012)
+
+        ordered_issues = [issue.pk for issue in journal.issue_set.order_by('order')]
+        self.assertEqual(new_order, ordered_issues)
+
+    def test_issues_reordering_records_changed_issues_only(self):
+        from django.contrib.contenttypes.models import ContentType
+        from journalmanager.models import DataChangeEvent
+
+        journal = JournalFactory.create()
+        issues = [IssueFactory.create(journal=journal, volume=9,
+            publication_year=2012) for i in range(3)]
+
+        journal.reorder_issues([issues[0].pk, issues[2].pk, issues[1].pk],
+            volume=9, publication_year=2012)
+
+        updated = DataChangeEvent.objects.filter(event_type='updated',
+            content_type=ContentType.objects.get_for_model(issues[0]))
+        self.assertEqual(sorted(event.object_id for event in updated),
+                         [issues[1].pk, issues[2].pk])
+
     def test_scielo_pid_when_print(self):
         journal = JournalFactory.create(scielo_issn=u'print',
                                         print_issn='1234-4321',
@@ -570,6 +722,56 @@ class CollectionTests(TestCase):
         self.assertTrue(collection.is_managed_by_user(user))
 
 
+class UserCollectionsMembershipTests(TestCase):
+
+    def setUp(self):
+        from django.core.cache.backends.locmem import LocMemCache
+        from journalmanager import models
+
+        self._original_cache = models.cache
+        models.cache = LocMemCache('membership', {})
+
+        self.user = auth.UserF()
+        self.collection = CollectionFactory.create()
+        self.collection.add_user(self.user, is_default=True, is_manager=True)
+
+    def tearDown(self):
+        from journalmanager import models
+        models.cache = self._original_cache
+
+    def test_membership_map(self):
+        from journalmanager import models
+        collection = CollectionFactory.create()
+        collection.add_user(self.user)
+
+        self.assertEqual(models.UserCollections.get_membership_map(self.user),
+                         {self.collection.pk: (True, True),
+                          collection.pk: (False, False)})
+
+    def test_membership_map_is_cached(self):
+        from journalmanager import models
+        models.UserCollections.get_membership_map(self.user)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(self.collection.is_default_to_user(self.user))
+            self.assertTrue(self.collection.is_managed_by_user(self.user))
+
+    def test_membership_changes_invalidate_the_map(self):
+        collection = CollectionFactory.create()
+
+        self.assertFalse(collection.is_default_to_user(self.user))
+
+        collection.add_user(self.user)
+        collection.make_default_to_user(self.user)
+
+        self.assertTrue(collection.is_default_to_user(self.user))
+        self.assertFalse(self.collection.is_default_to_user(self.user))
+
+        collection.remove_user(self.user)
+
+        self.assertFalse(collection.is_managed_by_user(self.user))
+
+
 class CollectionManagerTests(TestCase):
 
     def test_get_all_by_user(self):
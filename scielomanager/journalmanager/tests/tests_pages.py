@@ -177,6 +177,23 @@ class SectionsListTests(WebTest):
 
         self.assertTrue('There are no items.' in page.body)
 
+    def test_sections_are_sorted_by_title(self):
+        perm_section_list = _makePermission(perm='list_section',
+                                            model='section',
+                                            app_label='journalmanager')
+        self.user.user_permissions.add(perm_section_list)
+
+        journal = modelfactories.JournalFactory(collection=self.collection)
+        for title in [u'Resenhas', u'artigos', u'Éditorial']:
+            section = modelfactories.SectionFactory(journal=journal)
+            modelfactories.SectionTitleFactory(section=section, title=title)
+
+        page = self.app.get(reverse('section.index', args=[journal.pk]), user=self.user)
+
+        self.assertTrue(page.body.index('artigos') <
+                        page.body.index('Éditorial') <
+                        page.body.index('Resenhas'))
+
 
 class JournalEditorsTests(WebTest):
 
@@ -268,6 +285,17 @@ class JournalsListTests(WebTest):
 
         self.assertTrue('There are no items.' in response.body)
 
+    def test_journals_list_shows_the_first_letters(self):
+        perm_journal_list = _makePermission(perm='list_journal',
+            model='journal', app_label='journalmanager')
+        self.user.user_permissions.add(perm_journal_list)
+        self.collection.make_default_to_user(self.user)
+        modelfactories.JournalFactory.create(title=u'Zoologia', collection=self.collection)
+
+        response = self.app.get(reverse('journal.index'), user=self.user)
+
+        response.mustcontain('letter=Z')
+
     def test_list_journal_permission_is_required(self):
         response = self.app.get(
             reverse('journal.index'), user=self.user).follow()
@@ -0,0 +1,118 @@
+# coding: utf-8
+from django.test import TestCase
+from django.contrib.contenttypes.models import ContentType
+
+from journalmanager import models, search
+from journalmanager.tests import modelfactories
+
+
+class TokenizeTests(TestCase):
+
+    def test_words_are_folded(self):
+        self.assertEqual(search.tokenize(u'Revista de Ciência Agronômica'),
+                         [u'revista', u'de', u'ciencia', u'agronomica'])
+
+    def test_hyphenated_words_are_kept_with_their_parts(self):
+        self.assertEqual(search.tokenize(u'1234-5678'), [u'1234-5678', u'1234', u'5678'])
+        self.assertEqual(search.tokenize(u'1234-5678', parts=False), [u'1234-5678'])
+
+    def test_build_terms_keeps_the_greatest_weight(self):
+        terms = search.build_terms([(u'Arquivos', 4), (u'arquivos brasileiros', 3), (None, 2)])
+
+        self.assertEqual(terms, {u'arquivos': 4, u'brasileiros': 3})
+
+
+class SearchIndexTests(TestCase):
+
+    def _terms(self, instance):
+        return set(models.SearchTerm.objects.filter(
+            content_type=ContentType.objects.get_for_model(instance),
+            object_id=instance.pk).values_list('term', flat=True))
+
+    def test_journals_are_indexed_on_save(self):
+        journal = modelfactories.JournalFactory.create(print_issn=u'1678-4510')
+
+        terms = self._terms(journal)
+        self.assertIn(u'cirurgia', terms)
+        self.assertIn(u'paulo', terms)
+        self.assertIn(u'1678-4510', terms)
+        self.assertIn(journal.acronym.lower(), terms)
+
+        journal.title = u'Revista Nova'
+        journal.save()
+        self.assertIn(u'nova', self._terms(journal))
+
+    def test_terms_are_removed_on_delete(self):
+        sponsor = modelfactories.SponsorFactory.create()
+        self.assertIn(u'fundacao', self._terms(sponsor))
+
+        sponsor.delete()
+        self.assertEqual(self._terms(sponsor), set())
+
+    def test_sections_are_indexed_by_their_titles(self):
+        section = modelfactories.SectionFactory.create()
+        language = modelfactories.LanguageFactory.create(iso_code='en', name='english')
+        section.add_title(u'Original Articles', language=language)
+
+        self.assertEqual(self._terms(section), set([u'original', u'articles']))
+
+        section.titles.all().delete()
+        self.assertEqual(self._terms(section), set())
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.collection = modelfactories.CollectionFactory.create()
+        self.journal1 = modelfactories.JournalFactory.create(
+            title=u'Revista de Saúde Pública', title_iso=u'Rev. Saúde Pública',
+            collection=self.collection)
+        self.journal2 = modelfactories.JournalFactory.create(
+            title=u'Cadernos de Saúde', title_iso=u'Cad. Saúde',
+            collection=self.collection)
+        self.journal3 = modelfactories.JournalFactory.create(
+            title=u'Brazilian Journal of Physics', title_iso=u'Braz. J. Phys.',
+            collection=self.collection)
+
+        self.journals = models.Journal.objects.all()
+
+    def test_accents_are_ignored(self):
+        found = search.search(self.journals, u'SAUDE')
+
+        self.assertEqual(set(found), set([self.journal1, self.journal2]))
+
+    def test_words_match_by_prefix(self):
+        self.assertEqual(search.search(self.journals, u'phys'), [self.journal3])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(search.search(self.journals, u'saude publ'), [self.journal1])
+
+    def test_issns_match(self):
+        found = search.search(self.journals, self.journal2.print_issn)
+
+        self.assertEqual(found, [self.journal2])
+
+    def test_title_matches_rank_first(self):
+        sponsored = modelfactories.JournalFactory.create(
+            title=u'Cadernos', short_title=u'Physics Reports', collection=self.collection)
+
+        self.assertEqual(search.search(self.journals, u'physics'), [self.journal3, sponsored])
+
+    def test_results_are_restricted_to_the_queryset(self):
+        found = search.search(self.journals.exclude(pk=self.journal1.pk), u'saude')
+
+        self.assertEqual(found, [self.journal2])
+
+    def test_empty_queries_match_nothing(self):
+        self.assertEqual(search.search(self.journals, u' - '), [])
+
+    def test_filter(self):
+        found = search.filter(self.journals, u'saude')
+
+        self.assertEqual(set(found), set([self.journal1, self.journal2]))
+
+    def test_filter_looks_up_the_index_in_a_single_query(self):
+        with self.assertNumQueries(1):
+            found = list(search.filter(self.journals, u'saude publ'))
+
+        self.assertEqual(found, [self.journal1])
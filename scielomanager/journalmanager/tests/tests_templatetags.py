@@ -168,3 +168,28 @@ class StampInlineFormsetFieldTests(TestCase):
 
         self.assertIn('<span class="req-field">', out)
 
+
+
+class UserCollectionsDashboardTests(TestCase):
+
+    def test_memberships_are_loaded_with_a_single_query(self):
+        from django_factory_boy import auth
+        from journalmanager.tests.modelfactories import CollectionFactory
+
+        user = auth.UserF(is_active=True)
+        collections = [CollectionFactory.create() for i in range(3)]
+        collections[0].add_user(user, is_default=True)
+        collections[1].add_user(user, is_manager=True)
+        collections[2].add_user(user)
+
+        with self.assertNumQueries(1):
+            out = Template(
+                    "{% load user_collections_dashboard %}"
+                    "{% user_collections_dashboard collections user %}"
+                ).render(Context({
+                    'collections': collections,
+                    'user': user,
+                }))
+
+        self.assertEqual(out.count('class="dropdown active"'), 1)
+        self.assertIn('id="edit-%s"' % collections[1].name.lower(), out)
@@ -95,3 +95,36 @@ class HasChangedTest(TestCase):
         issue = IssueFactory.create()
 
         self.assertRaises(FieldError, lambda: self._makeOne(issue, 'fake_field'))
+
+
+class FirstLetterTest(TestCase):
+    def _makeOne(self, *args, **kwargs):
+        from journalmanager.views import get_first_letter
+        return get_first_letter(*args, **kwargs)
+
+    def test_querysets_are_faceted_by_the_database(self):
+        from journalmanager.models import Journal
+        from .modelfactories import JournalFactory
+
+        JournalFactory.create(title=u'brazilian Journal')
+        JournalFactory.create(title=u'Arquivos')
+        JournalFactory.create(title=u'Anais')
+
+        with self.assertNumQueries(1):
+            letters = self._makeOne(Journal.objects.all())
+
+        self.assertEqual(letters, [u'A', u'B'])
+
+    def test_inherited_fields(self):
+        from journalmanager.models import Sponsor
+        from .modelfactories import SponsorFactory
+
+        SponsorFactory.create(name=u'Zeta')
+        SponsorFactory.create(name=u'Fundação')
+
+        letters = self._makeOne(Sponsor.objects.filter(name__startswith='Z'))
+
+        self.assertEqual(letters, [u'Z'])
+
+    def test_lists_are_faceted_by_unicode(self):
+        self.assertEqual(self._makeOne([u'beta', u'alpha', u'']), [u'A', u'B'])
@@ -9,6 +9,7 @@ except ImportError:
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import IntegrityError
+from django.db import connection
 from django.contrib.auth import forms as auth_forms
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.decorators import permission_required
@@ -30,6 +31,7 @@ from django.forms.models import inlineformset_factory
 from django.conf import settings
 
 from . import models
+from . import search
 from .forms import *
 from scielomanager.utils.pendingform import PendingPostData
 from scielomanager.tools import (
@@ -48,11 +50,38 @@ MSG_FORM_MISSING = _('There are some errors or missing data.')
 MSG_DELETE_PENDED = _('The pended form has been deleted.')
 
 
+# the field each model is listed by, i.e. the beginning of its unicode.
+LETTER_FIELDS = {
+    models.Journal: 'title',
+    models.Sponsor: 'name',
+    models.Collection: 'name',
+    models.Section: 'display_title',
+}
+
+
 def get_first_letter(objects_all):
     """
     Returns a set of first letters from names in `objects_all`
+
+    Querysets of the models at ``LETTER_FIELDS`` are faceted by the
+    database, with a single ``SELECT DISTINCT`` of the first characters.
     """
-    letters_set = set(unicode(letter)[0].upper().strip() for letter in objects_all)
+    field = LETTER_FIELDS.get(getattr(objects_all, 'model', None))
+
+    if field is None:
+        names = (unicode(obj) for obj in objects_all)
+    else:
+        model_field = objects_all.model._meta.get_field_by_name(field)[0]
+        qn = connection.ops.quote_name
+
+        # the filter ensures the join to the table of inherited fields.
+        names = objects_all.filter(**{'%s__isnull' % field: False}).extra(
+            select={'letter': 'SUBSTR(%s.%s, 1, 1)' % (
+                qn(model_field.model._meta.db_table), qn(model_field.column))}
+        ).order_by().values_list('letter', flat=True).distinct()
+
+    letters_set = set(unicode(name)[:1].upper().strip() for name in names)
+    letters_set.discard(u'')
 
     return sorted(list(letters_set))
 
@@ -91,9 +120,8 @@ def list_search(request, model, journal_id):
         objects_all = model.objects.filter(journal=journal_id)
 
         if model is models.Section:
-            # order by a non persistent property
-            objects_all = model.objects.filter(journal=journal_id, is_trashed=False)
-            objects_all = sorted(objects_all, key=lambda x: unicode(x))
+            objects_all = model.objects.filter(
+                journal=journal_id, is_trashed=False).order_by('sort_key')
     else:
         journal = None
         objects_all = model.objects.all_by_user(request.user)
@@ -111,7 +139,9 @@ def list_search(request, model, journal_id):
     if request.GET.get('q'):
         objects_all = model.objects.all_by_user(request.user)
 
-        if issubclass(model, models.Institution):
+        if search.is_indexed(model):
+            objects_all = search.search(objects_all, request.REQUEST['q'])
+        elif issubclass(model, models.Institution):
             objects_all = objects_all.filter(
                 name__icontains=request.REQUEST['q']).order_by('name')
         else:
@@ -125,7 +155,8 @@ def list_search(request, model, journal_id):
         template_name, {
            'objects_%s' % model.__name__.lower(): objects,
            'journal': journal,
-           'letters': get_first_letter(objects_all),
+           # only computed if the letters are shown
+           'letters': curry(get_first_letter, objects_all),
         },
         context_instance=RequestContext(request))
 
@@ -568,14 +599,6 @@ def add_journal(request, journal_id=None):
 
                 if request.POST.get('form_hash', None) and request.POST['form_hash'] != 'None':
                     models.PendedForm.objects.get(form_hash=request.POST['form_hash']).delete()
-
-                # record the event
-                models.DataChangeEvent.objects.create(
-                    user=request.user,
-                    content_object=saved_journal,
-                    collection=models.Collection.objects.get_default_by_user(request.user),
-                    event_type='updated' if journal_id else 'added'
-                )
                 return HttpResponseRedirect(reverse('journal.dash', args=[saved_journal.id]))
             else:
                 messages.error(request, MSG_FORM_MISSING)
@@ -760,14 +783,6 @@ def edit_issue(request, journal_id, issue_id=None):
 
             messages.info(request, MSG_FORM_SAVED)
 
-            # record the event
-            models.DataChangeEvent.objects.create(
-                user=request.user,
-                content_object=saved_issue,
-                collection=models.Collection.objects.get_default_by_user(request.user),
-                event_type='updated'
-            )
-
             return HttpResponseRedirect(reverse('issue.index', args=[journal_id]))
         else:
             messages.error(request, MSG_FORM_MISSING)
@@ -858,14 +873,6 @@ def add_issue(request, issue_type, journal_id, issue_id=None):
 
             messages.info(request, MSG_FORM_SAVED)
 
-            # record the event
-            models.DataChangeEvent.objects.create(
-                user=request.user,
-                content_object=saved_issue,
-                collection=models.Collection.objects.get_default_by_user(request.user),
-                event_type='added'
-            )
-
             return HttpResponseRedirect(reverse('issue.index', args=[journal_id]))
         else:
             messages.error(request, MSG_FORM_MISSING)
@@ -928,12 +935,13 @@ def issue_reorder(request, journal_id):
         journal = get_object_or_404(models.Journal, pk=journal_id)
         issues_set, numbers = _parse_data(request.GET)
 
-        if not journal.has_issues(numbers):
-            return HttpResponse(status=500)
-
         # check if the user has privileges in this journal
-        journal.reorder_issues(numbers,
-            publication_year=issues_set['year'], volume=issues_set['vol'])
+        try:
+            journal.reorder_issues(numbers,
+                publication_year=issues_set['year'], volume=issues_set['vol'])
+        except ValueError:
+            # ``numbers`` are not the issues of the given year and volume.
+            return HttpResponse(status=500)
 
     return HttpResponse(status=200)
 
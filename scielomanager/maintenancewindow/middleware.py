@@ -6,7 +6,7 @@ class MaintenanceMiddleware(object):
 
     def process_request(self, request):
 
-        on_maintenance = models.Event.on_maintenance()
+        on_maintenance = models.maintenance_state.on_maintenance()
 
         if on_maintenance and not request.user.is_staff:
             logout(request)
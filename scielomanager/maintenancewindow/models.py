@@ -1,10 +1,19 @@
+import time
 from datetime import date
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 
 import caching.base
 
 
+MAINTENANCE_STATE_TTL = getattr(settings, 'MAINTENANCE_STATE_TTL', 30)
+
+
 class EventManager(caching.base.CachingManager):
 
     def scheduled_events(self, actual_date=date.today()):
@@ -26,6 +35,7 @@ class EventManager(caching.base.CachingManager):
 
     def set_blocking_users_events_to_false(self):
         self.filter(is_blocking_users=True).update(is_blocking_users=False)
+        maintenance_state.invalidate()
 
 
 class Event(caching.base.CachingMixin, models.Model):
@@ -56,3 +66,60 @@ class Event(caching.base.CachingMixin, models.Model):
         """
 
         return cls.objects.filter(is_blocking_users=True).exists()
+
+
+class MaintenanceState(object):
+    """
+    Process-local snapshot of the events that are relevant to every
+    request: the unfinished ones and the ones blocking users.
+
+    The snapshot is loaded with a single query and kept for ``ttl``
+    seconds. Changes made by the current process drop it right away,
+    changes made by other processes are seen when it expires.
+    """
+    def __init__(self, ttl=MAINTENANCE_STATE_TTL):
+        self.ttl = ttl
+        self._snapshot = None
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _get_events(self):
+        snapshot = self._snapshot
+        if snapshot is None or snapshot[0] <= time.time():
+            events = list(Event.objects.no_cache().filter(
+                Q(is_finished=False) | Q(is_blocking_users=True)))
+            snapshot = self._snapshot = (time.time() + self.ttl, events)
+
+        return snapshot[1]
+
+    def on_maintenance(self):
+        """
+        Same as ``Event.on_maintenance``.
+        """
+        return any(event.is_blocking_users for event in self._get_events())
+
+    def scheduled_events(self, actual_date=None):
+        """
+        Same as ``Event.objects.scheduled_events``, as a list.
+        """
+        actual_date = actual_date or date.today()
+        return [event for event in self._get_events()
+                if not event.is_finished and event.end_at.date() >= actual_date]
+
+    def blocking_users_scheduled_event(self):
+        """
+        Same as ``Event.objects.blocking_users_scheduled_event``.
+        """
+        for event in self._get_events():
+            if event.is_blocking_users:
+                return event
+
+
+maintenance_state = MaintenanceState()
+
+
+@receiver(post_save, sender=Event, dispatch_uid='maintenancewindow.models.event_post_save')
+@receiver(post_delete, sender=Event, dispatch_uid='maintenancewindow.models.event_post_delete')
+def invalidate_maintenance_state(sender, instance, **kwargs):
+    maintenance_state.invalidate()
@@ -1,4 +1,6 @@
 # coding: utf-8
+from datetime import date
+
 from django.test import TestCase
 from maintenancewindow import models
 from .modelfactories import (
@@ -43,3 +45,54 @@ class MaintenancewindowTests(TestCase):
         )
 
         self.assertTrue(len(models.Event.objects.scheduled_events(actual_date="2012-11-11")) > 0)
+
+
+class MaintenanceStateTests(TestCase):
+
+    def setUp(self):
+        self._original_state = models.maintenance_state
+        self.state = models.maintenance_state = models.MaintenanceState(ttl=60)
+
+    def tearDown(self):
+        models.maintenance_state = self._original_state
+
+    def test_snapshot_is_loaded_once(self):
+        EventFactory.create(is_blocking_users=True)
+
+        with self.assertNumQueries(1):
+            for i in range(3):
+                self.assertTrue(self.state.on_maintenance())
+                self.assertEqual(len(self.state.scheduled_events(actual_date=date(2012, 1, 1))), 1)
+                self.assertIsNotNone(self.state.blocking_users_scheduled_event())
+
+    def test_snapshot_is_refreshed_when_events_change(self):
+        self.assertFalse(self.state.on_maintenance())
+
+        event = EventFactory.create(is_blocking_users=True)
+        self.assertTrue(self.state.on_maintenance())
+
+        event.delete()
+        self.assertFalse(self.state.on_maintenance())
+
+    def test_snapshot_is_refreshed_when_blocking_events_are_reset(self):
+        EventFactory.create(is_blocking_users=True)
+        self.assertTrue(self.state.on_maintenance())
+
+        models.Event.objects.set_blocking_users_events_to_false()
+        self.assertFalse(self.state.on_maintenance())
+
+    def test_snapshot_expires(self):
+        self.state.ttl = 0
+        self.state.on_maintenance()
+
+        with self.assertNumQueries(1):
+            self.state.on_maintenance()
+
+    def test_scheduled_events_match_the_manager(self):
+        EventFactory.create(end_at=u'2012-11-12')
+        EventFactory.create(end_at=u'2012-11-12', is_finished=True)
+
+        for actual_date in [date(2012, 11, 11), date(2012, 11, 12), date(2012, 11, 13)]:
+            self.assertEqual(
+                self.state.scheduled_events(actual_date=actual_date),
+                list(models.Event.objects.scheduled_events(actual_date=actual_date)))
@@ -129,6 +129,7 @@ MIDDLEWARE_CLASSES = (
     'django.middleware.csrf.CsrfViewMiddleware',
     'waffle.middleware.WaffleMiddleware',
     'django.middleware.transaction.TransactionMiddleware',
+    'journalmanager.middleware.DataChangeEventMiddleware',
     'django.middleware.locale.LocaleMiddleware',
 )
 
@@ -21,4 +21,7 @@ INSTALLED_APPS += (
 )
 
 ALLOWED_HOSTS = ['*']
+EXPORT_JOBS_EXECUTOR = 'export.jobs.InProcessExecutor'
+# transactions rolled back between tests don't send signals
+MAINTENANCE_STATE_TTL = 0
 API_BALAIO_DEFAULT_TIMEOUT = 20 # in seconds
\ No newline at end of file
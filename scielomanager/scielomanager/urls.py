@@ -6,6 +6,7 @@ from tastypie.api import Api
 
 from journalmanager import views, models
 from api import resources
+from api import views as api_views
 
 admin.autodiscover()
 
@@ -63,6 +64,7 @@ urlpatterns = patterns('',
         views.generic_bulk_action, name='trash.bulk_action'),
 
     #API version 1
+    url(r'^api/v1/bulk/(?P<resource_name>\w+)/$', api_views.bulk_export, name='api.bulk_export'),
     (r'^api/', include(v1_api.urls)),
 
     (r'^export/', include('export.urls')),
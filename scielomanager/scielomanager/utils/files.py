@@ -0,0 +1,37 @@
+# coding: utf-8
+"""
+Helpers to manage files on disk.
+"""
+import os
+import glob
+
+
+def collect_garbage(directory, max_size, pattern='*', keep=()):
+    """
+    Removes the least recently used files matching ``pattern`` from
+    ``directory``, until the remaining ones sum up to ``max_size`` bytes.
+    The paths in ``keep``, e.g. a file just deployed, are never removed.
+
+    Files are ranked by modification time, so reusing a file must
+    refresh it (``os.utime``).
+    """
+    keep = set(os.path.abspath(path) for path in keep)
+
+    files = []
+    for path in glob.glob(os.path.join(directory, pattern)):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue  # removed meanwhile
+        files.append((os.path.abspath(path) in keep, stat.st_mtime, stat.st_size, path))
+
+    files.sort(reverse=True)
+
+    total_size = 0
+    for kept, mtime, size, path in files:
+        total_size += size
+        if total_size > max_size and not kept:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -42,3 +42,23 @@ def get_current_user():
         return getattr(req, 'user', None)
 
 
+def get_request_cache():
+    """
+    Get a dict bound to the current request, to memoize values that
+    are valid during its lifetime. The dict is dropped along with the
+    request object.
+
+    Returns ``None`` outside of a request.
+    """
+    req = get_current_request()
+
+    if req is None:
+        return None
+
+    try:
+        return req._threadlocal_cache
+    except AttributeError:
+        req._threadlocal_cache = {}
+        return req._threadlocal_cache
+
+
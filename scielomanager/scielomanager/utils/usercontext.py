@@ -9,6 +9,46 @@ from django.utils.datastructures import SortedDict
 
 _finders = SortedDict()
 
+CACHE_KEY_PREFIX = 'usercontext'
+
+
+def memoize_on_request(func):
+    """
+    Memoizes the return value of the finder method ``func`` on the
+    current request, per user. Outside of a request ``func`` is always
+    called.
+    """
+    def wrapper(self):
+        cache = threadlocal.get_request_cache()
+        if cache is None:
+            return func(self)
+
+        user = threadlocal.get_current_user()
+        key = (CACHE_KEY_PREFIX, func.__name__, getattr(user, 'pk', None))
+        try:
+            return cache[key]
+        except KeyError:
+            value = cache[key] = func(self)
+            return value
+
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+def invalidate():
+    """
+    Drops the values memoized on the current request, e.g. after the
+    user memberships are changed.
+    """
+    cache = threadlocal.get_request_cache()
+    if cache is None:
+        return None
+
+    for key in cache.keys():
+        if key[0] == CACHE_KEY_PREFIX:
+            del cache[key]
+
 
 class UserRequestContextFinder(object):
     """
@@ -16,17 +56,20 @@ class UserRequestContextFinder(object):
     subset of records the user is authorized to access.
 
     Instances of this class should provide data necessary
-    for the context to be built.
+    for the context to be built. The data is memoized
+    on the current request.
     """
+    @memoize_on_request
     def get_current_user_collections(self):
         """
         Returns a queryset of all collections the current user is part.
+        Its results are fetched only once per request.
         """
         user = threadlocal.get_current_user()
         if user:
             return user.user_collection.all()
 
-
+    @memoize_on_request
     def get_current_user_active_collection(self):
         """
         Returns the active collection of the current user.